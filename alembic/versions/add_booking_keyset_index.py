@@ -0,0 +1,27 @@
+"""Add booking keyset index
+
+Revision ID: add_booking_keyset_index
+Revises: add_booking_query_indexes
+Create Date: 2025-02-19
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = 'add_booking_keyset_index'
+down_revision: Union[str, None] = 'add_booking_query_indexes'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    # Постраничный список активных броней у админа идёт по ключу (дата, начало, id)
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS idx_bookings_active_keyset
+            ON bookings (booking_date, start_time, id)
+            WHERE status = 'active';
+    """)
+
+def downgrade() -> None:
+    op.execute("""
+        DROP INDEX IF EXISTS idx_bookings_active_keyset;
+    """)
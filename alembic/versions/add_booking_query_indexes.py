@@ -0,0 +1,34 @@
+"""Add booking query indexes
+
+Revision ID: add_booking_query_indexes
+Revises: add_booking_span_exclusion
+Create Date: 2025-02-17
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = 'add_booking_query_indexes'
+down_revision: Union[str, None] = 'add_booking_span_exclusion'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    # "Мои брони": активные брони клиента по телефону, отсортированные по дате
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS idx_bookings_active_phone_date
+            ON bookings (client_phone, booking_date)
+            WHERE status = 'active';
+    """)
+
+    # Брони стола на дату: проверка пересечения и фильтр по столу
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS idx_bookings_table_date_start
+            ON bookings (table_id, booking_date, start_time);
+    """)
+
+def downgrade() -> None:
+    op.execute("""
+        DROP INDEX IF EXISTS idx_bookings_table_date_start;
+        DROP INDEX IF EXISTS idx_bookings_active_phone_date;
+    """)
@@ -0,0 +1,33 @@
+"""Add sheet cells to bookings
+
+Revision ID: add_booking_sheet_cells
+Revises: create_blocked_days
+Create Date: 2025-02-12
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = 'add_booking_sheet_cells'
+down_revision: Union[str, None] = 'create_blocked_days'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    # Координаты брони в Google Sheets: отмена очищает их без чтения листа
+    op.execute("""
+        ALTER TABLE bookings
+            ADD COLUMN IF NOT EXISTS sheet_row INTEGER,
+            ADD COLUMN IF NOT EXISTS sheet_start_col INTEGER,
+            ADD COLUMN IF NOT EXISTS sheet_end_col INTEGER,
+            ADD COLUMN IF NOT EXISTS sheet_layout VARCHAR(16);
+    """)
+
+def downgrade() -> None:
+    op.execute("""
+        ALTER TABLE bookings
+            DROP COLUMN IF EXISTS sheet_layout,
+            DROP COLUMN IF EXISTS sheet_end_col,
+            DROP COLUMN IF EXISTS sheet_start_col,
+            DROP COLUMN IF EXISTS sheet_row;
+    """)
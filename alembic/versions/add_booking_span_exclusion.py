@@ -0,0 +1,49 @@
+"""Add booking span with exclusion constraint
+
+Revision ID: add_booking_span_exclusion
+Revises: add_booking_sheet_cells
+Create Date: 2025-02-14
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = 'add_booking_span_exclusion'
+down_revision: Union[str, None] = 'add_booking_sheet_cells'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    # btree_gist нужен, чтобы сравнивать table_id на равенство в GiST-индексе
+    op.execute("""
+        CREATE EXTENSION IF NOT EXISTS btree_gist;
+    """)
+
+    # Интервал брони. Рабочий день клуба заканчивается после полуночи:
+    # время до 06:00 относится к ночи после booking_date
+    op.execute("""
+        ALTER TABLE bookings
+            ADD COLUMN IF NOT EXISTS span TSRANGE GENERATED ALWAYS AS (
+                tsrange(
+                    booking_date + start_time
+                        + CASE WHEN start_time < TIME '06:00' THEN INTERVAL '1 day' ELSE INTERVAL '0' END,
+                    booking_date + end_time
+                        + CASE WHEN end_time <= TIME '06:00' THEN INTERVAL '1 day' ELSE INTERVAL '0' END,
+                    '[)'
+                )
+            ) STORED;
+    """)
+
+    # Две активные брони одного стола не могут пересекаться по времени
+    op.execute("""
+        ALTER TABLE bookings
+            ADD CONSTRAINT bookings_no_overlap
+            EXCLUDE USING gist (table_id WITH =, span WITH &&)
+            WHERE (status = 'active');
+    """)
+
+def downgrade() -> None:
+    op.execute("""
+        ALTER TABLE bookings DROP CONSTRAINT IF EXISTS bookings_no_overlap;
+        ALTER TABLE bookings DROP COLUMN IF EXISTS span;
+    """)
@@ -0,0 +1,29 @@
+"""Create blocked days table
+
+Revision ID: create_blocked_days
+Revises: create_booking_tables
+Create Date: 2025-02-10
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = 'create_blocked_days'
+down_revision: Union[str, None] = 'create_booking_tables'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    # Заблокированные администратором дни, чтобы считать доступность по БД
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS blocked_days (
+            id SERIAL PRIMARY KEY,
+            blocked_date DATE UNIQUE NOT NULL,
+            created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+        );
+    """)
+
+def downgrade() -> None:
+    op.execute("""
+        DROP TABLE IF EXISTS blocked_days;
+    """)
@@ -0,0 +1,116 @@
+import asyncio
+import logging
+import uuid
+from typing import TYPE_CHECKING, Any, Callable, Self
+
+import ormsgpack
+
+# Сервис таблиц импортирует модуль ради ALL_KEYS - клиент Redis ему не нужен
+if TYPE_CHECKING:
+    from redis.asyncio import Redis
+
+logger = logging.getLogger(__name__)
+
+# Ключ, означающий «сбросить всё пространство имён»
+ALL_KEYS = '*'
+
+
+class SharedCache:
+    """L2-кэш в Redis, общий для всех реплик бота.
+
+    Значения хранятся в msgpack с TTL. Реплика, изменившая данные, удаляет
+    ключи из Redis и публикует их в канал; остальные реплики получают
+    сообщение и сбрасывают свои копии в памяти (L1) через колбэки
+    on_invalidate. Свои же сообщения реплика пропускает - её L1 уже
+    обновлён на месте.
+    """
+
+    def __init__(
+        self,
+        redis: 'Redis',
+        namespace: str = 'cache',
+        channel: str = 'cache:invalidate'
+    ) -> None:
+        self.redis = redis
+        self.namespace = namespace
+        self.channel = channel
+        self.node_id = uuid.uuid4().hex
+        self._callbacks: list[Callable[[str], None]] = []
+        self._listen_task: asyncio.Task | None = None
+        self.hits = 0
+        self.misses = 0
+
+    async def start(self) -> Self:
+        pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+        await pubsub.subscribe(self.channel)
+        self._listen_task = asyncio.create_task(self._listen(pubsub))
+        return self
+
+    def on_invalidate(self, callback: Callable[[str], None]) -> None:
+        """Колбэк получает ключ, изменённый другой репликой, или ALL_KEYS"""
+        self._callbacks.append(callback)
+
+    def _name(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    async def get(self, key: str) -> Any | None:
+        value = await self.redis.get(self._name(key))
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return ormsgpack.unpackb(value)
+
+    async def set(self, key: str, value: Any, ttl: float) -> None:
+        await self.redis.set(self._name(key), ormsgpack.packb(value), px=max(1, int(ttl * 1000)))
+
+    async def invalidate(self, *keys: str) -> None:
+        """Удаляет ключи из Redis и сообщает о них остальным репликам одним запросом"""
+        names = []
+        for key in keys:
+            # Ключ с * на конце - шаблон: удаляются все подходящие ключи
+            if key.endswith('*'):
+                names.extend([name async for name in self.redis.scan_iter(match=self._name(key))])
+            else:
+                names.append(self._name(key))
+
+        pipe = self.redis.pipeline(transaction=False)
+        if names:
+            pipe.delete(*names)
+        pipe.publish(self.channel, ormsgpack.packb({'node': self.node_id, 'keys': list(keys)}))
+        await pipe.execute()
+
+    async def _listen(self, pubsub) -> None:
+        while True:
+            try:
+                message = await pubsub.get_message(timeout=None)
+            except asyncio.CancelledError:
+                await pubsub.aclose()
+                raise
+            except Exception as e:
+                logger.error(f"Error listening for cache invalidations: {e}")
+                # Пока подписка не работает, сообщения могли потеряться - сбрасываем L1 целиком
+                self._notify(ALL_KEYS)
+                await asyncio.sleep(1)
+                continue
+            if message is None:
+                continue
+            payload = ormsgpack.unpackb(message['data'])
+            if payload['node'] == self.node_id:
+                continue
+            for key in payload['keys']:
+                self._notify(key)
+
+    def _notify(self, key: str) -> None:
+        for callback in self._callbacks:
+            try:
+                callback(key)
+            except Exception as e:
+                logger.error(f"Error invalidating {key}: {e}")
+
+    def get_stats(self) -> dict[str, int]:
+        return {'hits': self.hits, 'misses': self.misses}
+
+    async def close(self) -> None:
+        if self._listen_task is not None:
+            self._listen_task.cancel()
@@ -0,0 +1,9 @@
+from sqlalchemy import Column, Integer, DateTime, Date
+from app.infrastructure.database.models.base import Base
+
+class BlockedDay(Base):
+    __tablename__ = 'blocked_days'
+    
+    id = Column(Integer, primary_key=True)
+    blocked_date = Column(Date, nullable=False, unique=True)
+    created_at = Column(DateTime(timezone=True), server_default='CURRENT_TIMESTAMP')
@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Time, Date
+from sqlalchemy import Column, Computed, Integer, String, DateTime, ForeignKey, Time, Date
+from sqlalchemy.dialects.postgresql import TSRANGE
 from sqlalchemy.orm import relationship
 from app.infrastructure.database.models.base import Base
 
@@ -15,6 +16,19 @@ class Booking(Base):
     end_time = Column(Time, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default='CURRENT_TIMESTAMP')
     status = Column(String(20), default='active')
+    # Интервал брони, по нему ограничение bookings_no_overlap запрещает пересечения
+    span = Column(TSRANGE, Computed(
+        "tsrange("
+        "booking_date + start_time + CASE WHEN start_time < TIME '06:00' THEN INTERVAL '1 day' ELSE INTERVAL '0' END, "
+        "booking_date + end_time + CASE WHEN end_time <= TIME '06:00' THEN INTERVAL '1 day' ELSE INTERVAL '0' END, "
+        "'[)')",
+        persisted=True
+    ))
+    # Ячейки брони в Google Sheets, чтобы отмена не читала лист
+    sheet_row = Column(Integer)
+    sheet_start_col = Column(Integer)
+    sheet_end_col = Column(Integer)
+    sheet_layout = Column(String(16))
 
     table = relationship("Table", back_populates="bookings")
     client = relationship("Client", back_populates="bookings")
\ No newline at end of file
@@ -7,7 +7,7 @@ class Client(Base):
     
     id = Column(Integer, primary_key=True)
     name = Column(String(100), nullable=False)
-    phone = Column(String(20), nullable=False)
+    phone = Column(String(20), unique=True, nullable=False)
     visit_date = Column(DateTime(timezone=True), nullable=False)
     
     bookings = relationship("Booking", back_populates="client")
@@ -0,0 +1,39 @@
+from datetime import date
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, delete, and_
+from sqlalchemy.dialects.postgresql import insert
+from app.infrastructure.database.models.blocked_day import BlockedDay
+
+class BlockedDayRepository:
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def block_days(self, days: list[date]) -> None:
+        if not days:
+            return
+        query = (
+            insert(BlockedDay)
+            .values([{'blocked_date': day} for day in days])
+            .on_conflict_do_nothing(index_elements=[BlockedDay.blocked_date])
+        )
+        await self.session.execute(query)
+        await self.session.commit()
+
+    async def unblock_days(self, days: list[date]) -> None:
+        if not days:
+            return
+        await self.session.execute(
+            delete(BlockedDay).where(BlockedDay.blocked_date.in_(days))
+        )
+        await self.session.commit()
+
+    async def get_blocked_days(self, date_from: date, date_to: date) -> set[date]:
+        result = await self.session.execute(
+            select(BlockedDay.blocked_date).where(
+                and_(
+                    BlockedDay.blocked_date >= date_from,
+                    BlockedDay.blocked_date <= date_to
+                )
+            )
+        )
+        return set(result.scalars().all())
@@ -1,35 +1,96 @@
+from dataclasses import dataclass
 from datetime import datetime, date, time, timedelta, timezone
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_, update
+from sqlalchemy import Select, Update, select, and_, insert, tuple_, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import selectinload
 from app.infrastructure.database.models.booking import Booking
+from app.infrastructure.database.models.table import Table
 from app.schemas.booking import BookingCreate, BookingFilter, BookingStatus
 
+# SQLSTATE exclusion_violation: сработало ограничение bookings_no_overlap
+EXCLUSION_VIOLATION = '23P01'
+
+
+class BookingConflictError(Exception):
+    """Стол на это время уже занят другой активной бронью"""
+
+
+# Ключ постраничной навигации: (booking_date, start_time, id)
+BookingCursor = tuple[date, time, int]
+
+
+@dataclass(slots=True, frozen=True)
+class BookingListItem:
+    """Бронь для списков и клавиатур: только нужные колонки, без ORM-объекта"""
+    id: int
+    booking_date: date
+    start_time: time
+    end_time: time
+    client_name: str
+    table_id: int
+    table_name: str | None
+
+
+# Колонки BookingListItem в порядке полей; название стола - через JOIN в том же запросе
+LIST_ITEM_COLUMNS = (
+    Booking.id,
+    Booking.booking_date,
+    Booking.start_time,
+    Booking.end_time,
+    Booking.client_name,
+    Booking.table_id,
+    Table.name,
+)
+
+
+@dataclass
+class BookingsPage:
+    bookings: list[BookingListItem]
+    has_prev: bool
+    has_next: bool
+
+
 class BookingRepository:
-    def __init__(self, session: AsyncSession):
+    def __init__(self, session: AsyncSession, autocommit: bool = True):
         self.session = session
+        # Внутри UnitOfWork коммитит только он сам
+        self.autocommit = autocommit
+
+    async def _commit(self) -> None:
+        if self.autocommit:
+            await self.session.commit()
+        else:
+            await self.session.flush()
 
     async def create_booking(self, booking: BookingCreate) -> Booking:
-        db_booking = Booking(
+        # INSERT ... RETURNING вместо add + commit + refresh.
+        # Пересечение проверяет сама БД при вставке, отдельный SELECT не нужен
+        query = insert(Booking).values(
             table_id=booking.table_id,
+            client_id=booking.client_id,
             client_name=booking.client_name,
             client_phone=booking.client_phone,
             booking_date=booking.booking_date,
             start_time=booking.start_time,
             end_time=booking.end_time,
             status=BookingStatus.ACTIVE
-        )
-        self.session.add(db_booking)
-        await self.session.commit()
-        await self.session.refresh(db_booking)
+        ).returning(Booking)
+        try:
+            db_booking = (await self.session.scalars(query)).one()
+            await self._commit()
+        except IntegrityError as e:
+            await self.session.rollback()
+            if getattr(e.orig, 'sqlstate', None) == EXCLUSION_VIOLATION:
+                raise BookingConflictError(
+                    f"Table {booking.table_id} is already booked on {booking.booking_date} "
+                    f"{booking.start_time}-{booking.end_time}"
+                ) from e
+            raise
         return db_booking
 
-    async def get_bookings(self, filters: BookingFilter) -> list[Booking]:
-        query = (
-            select(Booking)
-            .options(selectinload(Booking.table))
-        )
-        
+    @staticmethod
+    def _filter_conditions(filters: BookingFilter) -> list:
         conditions = []
         
         if filters.client_phone:
@@ -46,15 +107,109 @@ class BookingRepository:
             
         if filters.table_id:
             conditions.append(Booking.table_id == filters.table_id)
-            
+
+        return conditions
+
+    # Запросы строятся отдельными методами, чтобы scripts/check_booking_plans.py
+    # проверял планы ровно тех запросов, которые выполняет репозиторий
+
+    @classmethod
+    def bookings_query(cls, filters: BookingFilter) -> Select:
+        query = (
+            select(Booking)
+            .options(selectinload(Booking.table))
+        )
+        
+        conditions = cls._filter_conditions(filters)
         if conditions:
             query = query.where(and_(*conditions))
             
-        query = query.order_by(Booking.booking_date, Booking.start_time)
-        
-        result = await self.session.execute(query)
+        return query.order_by(Booking.booking_date, Booking.start_time)
+
+    async def get_bookings(self, filters: BookingFilter) -> list[Booking]:
+        result = await self.session.execute(self.bookings_query(filters))
         return list(result.scalars().all())
 
+    @classmethod
+    def booking_items_query(cls, filters: BookingFilter) -> Select:
+        return (
+            select(*LIST_ITEM_COLUMNS)
+            .outerjoin(Table, Booking.table_id == Table.id)
+            .where(*cls._filter_conditions(filters))
+            .order_by(Booking.booking_date, Booking.start_time)
+        )
+
+    async def get_booking_items(self, filters: BookingFilter) -> list[BookingListItem]:
+        """То же, что get_bookings, но строками Core select без identity map и связей"""
+        result = await self.session.execute(self.booking_items_query(filters))
+        return [BookingListItem(*row) for row in result]
+
+    @classmethod
+    def bookings_page_query(
+        cls,
+        filters: BookingFilter,
+        after: BookingCursor | None = None,
+        before: BookingCursor | None = None,
+        limit: int = 8
+    ) -> Select:
+        key = tuple_(Booking.booking_date, Booking.start_time, Booking.id)
+        query = (
+            select(*LIST_ITEM_COLUMNS)
+            .outerjoin(Table, Booking.table_id == Table.id)
+            .where(*cls._filter_conditions(filters))
+        )
+        if before is not None:
+            # Предыдущая страница: идём от границы назад и разворачиваем результат
+            query = query.where(key < tuple_(*before)).order_by(
+                Booking.booking_date.desc(), Booking.start_time.desc(), Booking.id.desc()
+            )
+        else:
+            if after is not None:
+                query = query.where(key > tuple_(*after))
+            query = query.order_by(Booking.booking_date, Booking.start_time, Booking.id)
+
+        # Лишняя строка показывает, есть ли ещё страница в этом направлении
+        return query.limit(limit + 1)
+
+    async def get_bookings_page(
+        self,
+        filters: BookingFilter,
+        after: BookingCursor | None = None,
+        before: BookingCursor | None = None,
+        limit: int = 8
+    ) -> BookingsPage:
+        """Страница броней по ключу (booking_date, start_time, id).
+
+        Без OFFSET: каждая страница - поиск по индексу с границы предыдущей,
+        её стоимость не зависит от того, сколько броней осталось позади.
+        """
+        result = await self.session.execute(self.bookings_page_query(filters, after, before, limit))
+        bookings = [BookingListItem(*row) for row in result]
+        has_more = len(bookings) > limit
+        bookings = bookings[:limit]
+        if before is not None:
+            bookings.reverse()
+            return BookingsPage(bookings, has_prev=has_more, has_next=True)
+        return BookingsPage(bookings, has_prev=after is not None, has_next=has_more)
+
+    @staticmethod
+    def active_booking_dates_query(date_from: date, limit: int = 14) -> Select:
+        return (
+            select(Booking.booking_date)
+            .where(
+                Booking.booking_date >= date_from,
+                Booking.status == BookingStatus.ACTIVE
+            )
+            .group_by(Booking.booking_date)
+            .order_by(Booking.booking_date)
+            .limit(limit)
+        )
+
+    async def get_active_booking_dates(self, date_from: date, limit: int = 14) -> list[date]:
+        """Ближайшие даты, на которые есть активные брони"""
+        query = self.active_booking_dates_query(date_from, limit)
+        return list((await self.session.scalars(query)).all())
+
     async def get_booking(self, booking_id: int) -> Booking | None:
         return await self.session.get(Booking, booking_id)
 
@@ -66,18 +221,39 @@ class BookingRepository:
         booking = await self.get_booking(booking_id)
         if booking:
             booking.status = status
-            await self.session.commit()
+            await self._commit()
             await self.session.refresh(booking)
         return booking
 
-    async def check_table_availability(
-        self, 
-        table_id: int, 
+    async def set_sheet_cells(
+        self,
+        booking_id: int,
+        row: int,
+        start_col: int,
+        end_col: int,
+        layout: str
+    ) -> None:
+        """Запоминает ячейки, в которые бронь записана в Google Sheets"""
+        await self.session.execute(
+            update(Booking)
+            .where(Booking.id == booking_id)
+            .values(
+                sheet_row=row,
+                sheet_start_col=start_col,
+                sheet_end_col=end_col,
+                sheet_layout=layout
+            )
+        )
+        await self._commit()
+
+    @staticmethod
+    def table_availability_query(
+        table_id: int,
         booking_date: date,
         start_time: time,
         end_time: time,
         exclude_booking_id: int | None = None
-    ) -> bool:
+    ) -> Select:
         query = select(Booking).where(
             and_(
                 Booking.table_id == table_id,
@@ -90,17 +266,48 @@ class BookingRepository:
         
         if exclude_booking_id:
             query = query.where(Booking.id != exclude_booking_id)
-        
+        return query
+
+    async def check_table_availability(
+        self, 
+        table_id: int, 
+        booking_date: date,
+        start_time: time,
+        end_time: time,
+        exclude_booking_id: int | None = None
+    ) -> bool:
+        query = self.table_availability_query(table_id, booking_date, start_time, end_time, exclude_booking_id)
         result = await self.session.execute(query)
         return result.first() is None 
 
-    async def update_past_bookings_status(self) -> int:
-        # Get current date at 3 AM MSK
-        msk_timezone = timezone(timedelta(hours=3))
-        current_date = datetime.now(msk_timezone).date()
-        
+    @staticmethod
+    def active_booking_times_query(date_from: date, date_to: date) -> Select:
+        return select(
+            Booking.table_id,
+            Booking.booking_date,
+            Booking.start_time,
+            Booking.end_time
+        ).where(
+            and_(
+                Booking.booking_date >= date_from,
+                Booking.booking_date <= date_to,
+                Booking.status == BookingStatus.ACTIVE
+            )
+        )
+
+    async def get_active_booking_times(
+        self,
+        date_from: date,
+        date_to: date
+    ) -> list[tuple[int, date, time, time]]:
+        """Столы и время активных броней за период, без загрузки ORM-объектов"""
+        result = await self.session.execute(self.active_booking_times_query(date_from, date_to))
+        return [tuple(row) for row in result.all()]
+
+    @staticmethod
+    def past_bookings_update(current_date: date) -> Update:
         # Update all active bookings from past dates
-        query = (
+        return (
             update(Booking)
             .where(
                 and_(
@@ -110,8 +317,13 @@ class BookingRepository:
             )
             .values(status=BookingStatus.COMPLETED)
         )
+
+    async def update_past_bookings_status(self) -> int:
+        # Get current date at 3 AM MSK
+        msk_timezone = timezone(timedelta(hours=3))
+        current_date = datetime.now(msk_timezone).date()
         
-        result = await self.session.execute(query)
-        await self.session.commit()
+        result = await self.session.execute(self.past_bookings_update(current_date))
+        await self._commit()
         
         return result.rowcount 
\ No newline at end of file
@@ -1,11 +1,20 @@
 from datetime import datetime
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, update
+from sqlalchemy.dialects.postgresql import insert
 from app.infrastructure.database.models.client import Client
 
 class ClientRepository:
-    def __init__(self, session: AsyncSession):
+    def __init__(self, session: AsyncSession, autocommit: bool = True):
         self.session = session
+        # Внутри UnitOfWork коммитит только он сам
+        self.autocommit = autocommit
+
+    async def _commit(self) -> None:
+        if self.autocommit:
+            await self.session.commit()
+        else:
+            await self.session.flush()
 
     async def create_client(
         self,
@@ -19,9 +28,20 @@ class ClientRepository:
             visit_date=visit_date
         )
         self.session.add(client)
-        await self.session.commit()
+        await self._commit()
         return client
 
+    async def upsert_client(self, name: str, phone: str, visit_date: datetime) -> int:
+        """Создаёт клиента или обновляет дату визита существующего, одним запросом"""
+        query = insert(Client).values(name=name, phone=phone, visit_date=visit_date)
+        query = query.on_conflict_do_update(
+            index_elements=[Client.phone],
+            set_={'visit_date': query.excluded.visit_date}
+        ).returning(Client.id)
+        client_id = (await self.session.execute(query)).scalar_one()
+        await self._commit()
+        return client_id
+
     async def get_client_by_phone(self, phone: str) -> Client | None:
         result = await self.session.execute(
             select(Client).where(Client.phone == phone)
@@ -38,4 +58,4 @@ class ClientRepository:
             .values(visit_date=visit_date)
         )
         await self.session.execute(query)
-        await self.session.commit() 
\ No newline at end of file
+        await self._commit()
\ No newline at end of file
@@ -0,0 +1,26 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.infrastructure.database.repositories.booking_repository import BookingRepository
+from app.infrastructure.database.repositories.client_repository import ClientRepository
+
+
+class UnitOfWork:
+    """Несколько операций репозиториев в одной транзакции.
+
+    Репозитории внутри только отправляют запросы, коммит - один, при выходе
+    из блока async with. При исключении транзакция откатывается целиком.
+    """
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+        self.clients = ClientRepository(session, autocommit=False)
+        self.bookings = BookingRepository(session, autocommit=False)
+
+    async def __aenter__(self) -> 'UnitOfWork':
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            await self.session.commit()
+        else:
+            await self.session.rollback()
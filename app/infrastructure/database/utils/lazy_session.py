@@ -0,0 +1,28 @@
+from typing import Any
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+
+class LazySession:
+    """Заместитель AsyncSession: настоящая сессия создаётся при первом обращении.
+
+    Репозитории работают с ним как с обычной сессией. Если за время апдейта
+    к БД никто не обратился, сессия так и не открывается.
+    """
+
+    def __init__(self, async_session_maker: async_sessionmaker):
+        self._async_session_maker = async_session_maker
+        self._session: AsyncSession | None = None
+
+    @property
+    def opened(self) -> bool:
+        return self._session is not None
+
+    def __getattr__(self, name: str) -> Any:
+        if self._session is None:
+            self._session = self._async_session_maker()
+        return getattr(self._session, name)
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
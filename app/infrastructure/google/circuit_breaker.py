@@ -0,0 +1,70 @@
+import logging
+import time
+from enum import Enum
+
+logger = logging.getLogger(__name__)
+
+
+class SheetsUnavailableError(Exception):
+    """Sheets API считается недоступным, запрос не отправлялся"""
+
+
+class CircuitState(str, Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Размыкается после failure_threshold ошибок подряд.
+
+    Пока цепь разомкнута, запросы не отправляются вовсе. Через reset_timeout
+    пропускается один пробный запрос: успех замыкает цепь, ошибка снова
+    размыкает её.
+    """
+
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CircuitState.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+
+    def allow_request(self) -> bool:
+        if self.state == CircuitState.CLOSED:
+            return True
+        if self.state == CircuitState.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = CircuitState.HALF_OPEN
+        if self.state == CircuitState.HALF_OPEN and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+        return False
+
+    def check(self) -> None:
+        if not self.allow_request():
+            raise SheetsUnavailableError(f"Sheets API circuit is {self.state.value}")
+
+    def record_success(self) -> None:
+        if self.state != CircuitState.CLOSED:
+            logger.info("Sheets API is available again, closing circuit")
+        self.state = CircuitState.CLOSED
+        self.failures = 0
+        self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._probe_in_flight = False
+        if self.state == CircuitState.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != CircuitState.OPEN:
+                logger.warning(f"Sheets API failed {self.failures} times in a row, opening circuit")
+            self.state = CircuitState.OPEN
+            self.opened_at = time.monotonic()
+
+    def release(self) -> None:
+        """Запрос отменён, не дойдя до результата - пробу можно повторить"""
+        self._probe_in_flight = False
+
+    @property
+    def is_open(self) -> bool:
+        return self.state != CircuitState.CLOSED
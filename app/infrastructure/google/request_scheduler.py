@@ -0,0 +1,182 @@
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import TYPE_CHECKING, Awaitable, Callable
+
+from app.infrastructure.google.circuit_breaker import SheetsUnavailableError
+
+if TYPE_CHECKING:
+    from googleapiclient.http import HttpRequest
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+
+def is_transient_error(error: BaseException) -> bool:
+    """Ошибка, после которой запрос к Sheets стоит повторить позже: лист недоступен,
+    квота исчерпана или пропала сеть. Остальные ошибки повтор не исправит"""
+    if isinstance(error, (SheetsUnavailableError, OSError, asyncio.TimeoutError)):
+        return True
+    # Модули клиента к этому моменту загружены: без них запрос не мог быть отправлен
+    from googleapiclient.errors import HttpError
+    from httplib2 import HttpLib2Error
+
+    if isinstance(error, HttpError):
+        return error.resp.status in RETRYABLE_STATUSES
+    return isinstance(error, HttpLib2Error)
+
+
+class RequestKind(str, Enum):
+    READ = "read"
+    WRITE = "write"
+
+
+class TokenBucket:
+    def __init__(self, per_minute: int, burst: int | None = None):
+        self.rate = per_minute / 60
+        self.capacity = burst or per_minute
+        self.tokens = float(self.capacity)
+        self.updated_at = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def try_acquire(self) -> bool:
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def wait_time(self) -> float:
+        self._refill()
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+
+@dataclass
+class _Job:
+    request: 'HttpRequest'
+    kind: RequestKind
+    future: asyncio.Future
+    attempt: int = field(default=0)
+
+
+class SheetsRequestScheduler:
+    """Очередь запросов к Sheets API с учётом квот.
+
+    Чтения и записи расходуют отдельные бакеты токенов, записи (брони и отмены)
+    всегда отправляются раньше ожидающих чтений. На 429 и 5xx запрос
+    возвращается в очередь с экспоненциальной задержкой и джиттером.
+    """
+
+    def __init__(
+        self,
+        execute: Callable[['HttpRequest'], Awaitable[dict]],
+        reads_per_minute: int = 60,
+        writes_per_minute: int = 60,
+        max_retries: int = 5,
+        base_delay: float = 1.0,
+        max_delay: float = 32.0
+    ):
+        self._execute = execute
+        self._buckets = {
+            RequestKind.READ: TokenBucket(reads_per_minute),
+            RequestKind.WRITE: TokenBucket(writes_per_minute),
+        }
+        self._queues: dict[RequestKind, deque[_Job]] = {
+            RequestKind.WRITE: deque(),
+            RequestKind.READ: deque(),
+        }
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._wakeup = asyncio.Event()
+        self._dispatcher: asyncio.Task | None = None
+        self._running: set[asyncio.Task] = set()
+
+    @property
+    def queue_depth(self) -> dict[str, int]:
+        return {kind.value: len(queue) for kind, queue in self._queues.items()}
+
+    async def submit(self, request: 'HttpRequest', kind: RequestKind = RequestKind.READ) -> dict:
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+        job = _Job(request=request, kind=kind, future=asyncio.get_running_loop().create_future())
+        self._enqueue(job)
+        return await job.future
+
+    def _enqueue(self, job: _Job, retry: bool = False) -> None:
+        # Повторы встают в начало очереди, чтобы не нарушать порядок записей
+        if retry:
+            self._queues[job.kind].appendleft(job)
+        else:
+            self._queues[job.kind].append(job)
+        self._wakeup.set()
+
+    async def _dispatch(self) -> None:
+        while True:
+            wait = None
+            # Порядок обхода очередей задаёт приоритет: сначала записи
+            for kind, queue in self._queues.items():
+                while queue and queue[0].future.done():
+                    queue.popleft()  # Вызывающий уже отменил ожидание
+                if not queue:
+                    continue
+                bucket = self._buckets[kind]
+                if bucket.try_acquire():
+                    self._start(queue.popleft())
+                    wait = 0
+                    break
+                wait = bucket.wait_time() if wait is None else min(wait, bucket.wait_time())
+
+            if wait == 0:
+                continue
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=wait)
+            except asyncio.TimeoutError:
+                pass
+
+    def _start(self, job: _Job) -> None:
+        task = asyncio.create_task(self._run(job))
+        self._running.add(task)
+        task.add_done_callback(self._running.discard)
+
+    async def _run(self, job: _Job) -> None:
+        # К моменту первого запроса клиент уже создан, модуль загружен
+        from googleapiclient.errors import HttpError
+
+        try:
+            result = await self._execute(job.request)
+        except HttpError as e:
+            if e.resp.status in RETRYABLE_STATUSES and job.attempt < self.max_retries:
+                job.attempt += 1
+                # Full jitter: случайная задержка до экспоненциальной границы
+                delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** job.attempt))
+                logger.warning(
+                    f"Sheets API returned {e.resp.status} for {job.kind.value} request, "
+                    f"retry {job.attempt}/{self.max_retries} in {delay:.1f}s"
+                )
+                asyncio.get_running_loop().call_later(delay, self._enqueue, job, True)
+                return
+            if not job.future.done():
+                job.future.set_exception(e)
+        except Exception as e:
+            if not job.future.done():
+                job.future.set_exception(e)
+        else:
+            if not job.future.done():
+                job.future.set_result(result)
+
+    def close(self) -> None:
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+        for task in self._running:
+            task.cancel()
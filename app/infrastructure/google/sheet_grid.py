@@ -0,0 +1,197 @@
+import zlib
+from dataclasses import dataclass, replace
+from datetime import date, datetime
+from types import MappingProxyType
+from typing import Iterable, Mapping
+
+from app.schemas.availability import DayAvailability
+
+# Структура листа: первая строка - шапка с интервалами времени,
+# далее с FIRST_DATE_ROW идут блоки по TABLES_COUNT строк на каждую дату.
+# В столбце A - дата (только в первой строке блока), в B - название стола,
+# с C начинаются часовые слоты
+FIRST_DATE_ROW = 3
+TABLES_COUNT = 4
+FIRST_SLOT_COL = 2
+SLOTS_COUNT = 12
+LAST_COL = FIRST_SLOT_COL + SLOTS_COUNT  # Индекс (с 0) последнего столбца со слотами
+
+
+def column_letter(column_number: int) -> str:
+    """Преобразует номер столбца в буквенное обозначение (1 -> A, 2 -> B, etc.)"""
+    result = ""
+    while column_number > 0:
+        column_number -= 1
+        result = chr(65 + (column_number % 26)) + result
+        column_number //= 26
+    return result
+
+
+def split_time_slot(time_slot: str) -> tuple[str, str]:
+    """Разбивает интервал вида '18:00-19:00' на время начала и окончания"""
+    if '-' in time_slot:
+        start, end = time_slot.split('-')[:2]
+        return start.strip(), end.strip()
+    return time_slot.strip(), time_slot.strip()
+
+
+def date_key(date_str: str, date_format: str = '%d.%m.%y') -> tuple[int, int]:
+    parsed = datetime.strptime(date_str, date_format)
+    return parsed.day, parsed.month
+
+
+def parse_date_cell(row: list[str], year: int) -> date | None:
+    """Дата из столбца A первой строки блока, None - если это не дата"""
+    date_cell = row[0].strip() if row else ''
+    if not date_cell:
+        return None
+    try:
+        return datetime.strptime(date_cell, '%d.%m').date().replace(year=year)
+    except ValueError:
+        return None
+
+
+def locate_dates(column_values: list[list[str]]) -> dict[tuple[int, int], int]:
+    """Индексы первых строк блоков дат по столбцу A, прочитанному с первой строки листа"""
+    year = datetime.now().year
+    rows: dict[tuple[int, int], int] = {}
+    for row_idx in range(FIRST_DATE_ROW, len(column_values), TABLES_COUNT):
+        day = parse_date_cell(column_values[row_idx], year)
+        if day is not None:
+            rows.setdefault((day.day, day.month), row_idx)
+    return rows
+
+
+def block_fingerprint(layout: str, key: tuple[int, int], row_idx: int) -> str:
+    """Отпечаток блока даты: шапка, дата в столбце A и строка, с которой блок начинается.
+    Меняется, если блок переехал или в нём теперь другая дата"""
+    return f"{zlib.crc32(f'{layout}|{key[0]:02d}.{key[1]:02d}|{row_idx}'.encode()):08x}"
+
+
+@dataclass(frozen=True, slots=True)
+class DateRows:
+    day: date
+    row_idx: int  # Индекс (с 0) строки первого стола этой даты
+    availability: DayAvailability
+
+
+@dataclass(frozen=True, slots=True)
+class SheetCells:
+    """Ячейки одной брони в листе: строка и столбцы в нумерации A1 (с 1)"""
+    row: int
+    start_col: int
+    end_col: int
+    layout: str  # Отпечаток блока даты, в котором ячейки были вычислены
+
+    @property
+    def range_name(self) -> str:
+        return f"{column_letter(self.start_col)}{self.row}:{column_letter(self.end_col)}{self.row}"
+
+    @property
+    def cells_count(self) -> int:
+        return self.end_col - self.start_col + 1
+
+
+@dataclass(frozen=True, slots=True)
+class SheetGrid:
+    """Разобранный снимок листа бронирований, строится один раз на каждую загрузку"""
+    start_times: tuple[str, ...]
+    end_times: tuple[str, ...]
+    start_slots: Mapping[str, int]
+    end_slots: Mapping[str, int]
+    dates: Mapping[tuple[int, int], DateRows]
+
+    @classmethod
+    def from_values(cls, values: list[list[str]], year: int | None = None) -> 'SheetGrid':
+        header = values[0] if values else []
+        blocks = (
+            (row_idx, values[row_idx:row_idx + TABLES_COUNT])
+            for row_idx in range(FIRST_DATE_ROW, len(values), TABLES_COUNT)
+        )
+        return cls.from_blocks(header, blocks, year)
+
+    @classmethod
+    def from_blocks(
+        cls,
+        header_row: list[str],
+        blocks: Iterable[tuple[int, list[list[str]]]],
+        year: int | None = None
+    ) -> 'SheetGrid':
+        """Снимок из шапки и отдельных блоков дат: (индекс первой строки блока, его строки)"""
+        year = year or datetime.now().year
+        header = header_row[FIRST_SLOT_COL:FIRST_SLOT_COL + SLOTS_COUNT]
+        slots = [split_time_slot(time_slot) for time_slot in header]
+        start_times = tuple(start for start, _ in slots)
+        end_times = tuple(end for _, end in slots)
+
+        start_slots: dict[str, int] = {}
+        end_slots: dict[str, int] = {}
+        for idx, (start, end) in enumerate(slots):
+            start_slots.setdefault(start, idx)
+            end_slots.setdefault(end, idx)
+
+        dates: dict[tuple[int, int], DateRows] = {}
+        for row_idx, block in blocks:
+            day = parse_date_cell(block[0] if block else [], year)
+            if day is None:
+                continue
+
+            busy = []
+            for table_idx in range(TABLES_COUNT):
+                row = block[table_idx] if table_idx < len(block) else []
+                cells = row[FIRST_SLOT_COL:FIRST_SLOT_COL + len(slots)]
+                busy.append(
+                    [cell.strip() != '' for cell in cells] + [False] * (len(slots) - len(cells))
+                )
+            dates.setdefault((day.day, day.month), DateRows(day, row_idx, DayAvailability.from_busy(busy)))
+
+        return cls(
+            start_times=start_times,
+            end_times=end_times,
+            start_slots=MappingProxyType(start_slots),
+            end_slots=MappingProxyType(end_slots),
+            dates=MappingProxyType(dates),
+        )
+
+    def find_date(self, date_str: str, date_format: str = '%d.%m.%y') -> DateRows | None:
+        try:
+            return self.dates.get(date_key(date_str, date_format))
+        except ValueError:
+            return None
+
+    @property
+    def layout(self) -> str:
+        """Отпечаток шапки: меняется, если слоты времени переставили или переименовали"""
+        return f"{zlib.crc32('|'.join(self.start_times + self.end_times).encode()):08x}"
+
+    def cells(self, rows: DateRows, table_id: int, start_slot: int, end_slot: int) -> SheetCells:
+        """Ячейки стола table_id со слота start_slot по end_slot включительно"""
+        return SheetCells(
+            row=rows.row_idx + table_id,  # table_id начинается с 1, строки в A1 - тоже
+            start_col=FIRST_SLOT_COL + start_slot + 1,
+            end_col=FIRST_SLOT_COL + end_slot + 1,
+            layout=block_fingerprint(self.layout, (rows.day.day, rows.day.month), rows.row_idx)
+        )
+
+    def slots_range(self, rows: DateRows, table_id: int, start_slot: int, end_slot: int) -> str:
+        """A1-диапазон ячеек стола table_id со слота start_slot по end_slot включительно"""
+        return self.cells(rows, table_id, start_slot, end_slot).range_name
+
+    def _with_rows(self, rows: DateRows) -> 'SheetGrid':
+        dates = dict(self.dates)
+        dates[(rows.day.day, rows.day.month)] = rows
+        return replace(self, dates=MappingProxyType(dates))
+
+    def with_slots(self, date_str: str, table_id: int, start_slot: int, end_slot: int, busy: bool) -> 'SheetGrid':
+        """Копия снимка с занятыми (или освобождёнными) ячейками одной брони"""
+        rows = self.find_date(date_str)
+        if rows is None:
+            return self
+        availability = rows.availability.with_slots(table_id - 1, start_slot, end_slot, busy)
+        return self._with_rows(replace(rows, availability=availability))
+
+    def with_day(self, date_str: str, busy: bool) -> 'SheetGrid':
+        rows = self.find_date(date_str)
+        if rows is None:
+            return self
+        return self._with_rows(replace(rows, availability=rows.availability.with_day(busy)))
@@ -1,194 +1,665 @@
+import asyncio
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
+from functools import partial
+from typing import TYPE_CHECKING, Awaitable, Callable, Collection, Hashable
 import logging
 
+import ormsgpack
+
+from app.infrastructure.cache.cache.shared_cache import ALL_KEYS
+from app.infrastructure.google.circuit_breaker import CircuitBreaker, SheetsUnavailableError
+from app.infrastructure.google.request_scheduler import RequestKind, SheetsRequestScheduler
+from app.infrastructure.google.sheet_grid import (
+    LAST_COL,
+    TABLES_COUNT,
+    SheetCells,
+    SheetGrid,
+    block_fingerprint,
+    column_letter,
+    date_key,
+    locate_dates,
+)
+
+# Стек googleapiclient импортируется долго, поэтому модули Google
+# подгружаются только при инициализации клиента в пуле потоков
+if TYPE_CHECKING:
+    from app.infrastructure.cache.cache.shared_cache import SharedCache
+    from google.auth.credentials import Credentials
+    from google_auth_httplib2 import AuthorizedHttp
+    from googleapiclient.http import HttpRequest
+
 logger = logging.getLogger(__name__)
 
+LAST_COLUMN = column_letter(LAST_COL + 1)
+# Ключи кэша снимков: None - весь лист, (день, месяц) - блок одной даты
+GridKey = tuple[int, int] | None
+LOCATOR_KEY = 'locator'
+SCOPES = ['https://www.googleapis.com/auth/spreadsheets']
+
 class GoogleSheetsService:
-    def __init__(self, spreadsheet_id: str, credentials: Credentials):
+    def __init__(
+        self,
+        spreadsheet_id: str,
+        credentials: 'Credentials | None' = None,
+        credentials_file: str | None = None,
+        max_workers: int = 8,
+        cache_ttl: float = 5.0,
+        cache_stale_ttl: float = 30.0,
+        reads_per_minute: int = 60,
+        writes_per_minute: int = 60,
+        max_retries: int = 5,
+        locator_ttl: float = 300.0,
+        snapshot_path: str | None = None,
+        failure_threshold: int = 3,
+        circuit_reset_timeout: float = 30.0,
+        shared_cache: 'SharedCache | None' = None
+    ):
         self.spreadsheet_id = spreadsheet_id
-        self.service = build('sheets', 'v4', credentials=credentials)
-        self.sheet = self.service.spreadsheets()
+        self.credentials = credentials
+        self.credentials_file = credentials_file
+        # Клиент создаётся в фоне (см. start), запросы ждут его готовности
+        self.sheet = None
+        self._init_task: asyncio.Task | None = None
+        # googleapiclient работает синхронно, а httplib2.Http не потокобезопасен,
+        # поэтому запросы выполняются в ограниченном пуле потоков,
+        # у каждого потока - свой транспорт
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='sheets')
+        self._local = threading.local()
+        # Все запросы проходят через планировщик квот: записи вперёд чтений
+        self._scheduler = SheetsRequestScheduler(
+            execute=self._run_request,
+            reads_per_minute=reads_per_minute,
+            writes_per_minute=writes_per_minute,
+            max_retries=max_retries
+        )
+
+        # L1-кэш снимков: в течение cache_ttl данные считаются свежими,
+        # ещё cache_stale_ttl отдаются устаревшие данные с обновлением в фоне.
+        # Кэшируется как весь лист, так и отдельные даты
+        self.cache_ttl = cache_ttl
+        self.cache_stale_ttl = cache_stale_ttl
+        self._grids: dict[GridKey, tuple[SheetGrid, float]] = {}
+        self._generation = 0
+        self._refresh_tasks: dict[GridKey, asyncio.Task] = {}
+
+        # Одновременные чтения одного и того же диапазона ждут один общий запрос
+        self._inflight: dict[Hashable, tuple[asyncio.Task, int]] = {}
+        self.fetch_count = 0
+        self.coalesced_count = 0
+
+        # Локатор дат: (день, месяц) -> индекс первой строки блока.
+        # Строится по одному столбцу A и меняется только при перестройке листа
+        self.locator_ttl = locator_ttl
+        self._date_rows: dict[tuple[int, int], int] = {}
+        self._date_rows_at = 0.0
+        # Отпечаток шапки последнего загруженного снимка
+        self._layout: str | None = None
+
+        # Последний удачно загруженный лист сохраняется на диск. После рестарта
+        # он сразу отдаётся как устаревший, а пока Sheets недоступен (цепь
+        # разомкнута) - только на чтение, записи отклоняются без запроса
+        self.snapshot_path = snapshot_path
+        self._fallback: SheetGrid | None = None
+        self._breaker = CircuitBreaker(failure_threshold, circuit_reset_timeout)
+        self._load_persisted_snapshot()
+
+        # L2-кэш снимков в Redis, общий для реплик: лист читает из API одна из них,
+        # остальные берут снимок из Redis. Изменения листа рассылаются через pub/sub
+        self.shared_cache = shared_cache
+        self._shared_prefix = f"sheets:{spreadsheet_id}:"
+        self._invalidation_tasks: set[asyncio.Task] = set()
+        if shared_cache is not None:
+            shared_cache.on_invalidate(self._on_shared_invalidate)
+
+    def _build_client(self):
+        from googleapiclient.discovery import build
+
+        if self.credentials is None:
+            from google.oauth2.service_account import Credentials
+            self.credentials = Credentials.from_service_account_file(self.credentials_file, scopes=SCOPES)
+        # Discovery-документ берётся из поставки googleapiclient, без запроса в сеть
+        service = build(
+            'sheets', 'v4',
+            credentials=self.credentials,
+            static_discovery=True,
+            cache_discovery=False
+        )
+        return service.spreadsheets()
+
+    async def _init_client(self) -> None:
+        started_at = time.monotonic()
+        loop = asyncio.get_running_loop()
+        self.sheet = await loop.run_in_executor(self._executor, self._build_client)
+        logger.info(f"Google Sheets client ready in {time.monotonic() - started_at:.2f}s")
+
+    def start(self) -> None:
+        """Запускает инициализацию клиента в фоне, не дожидаясь её"""
+        if self._init_task is None:
+            self._init_task = asyncio.create_task(self._init_client())
+
+    @property
+    def is_ready(self) -> bool:
+        return self.sheet is not None
+
+    async def _get_sheet(self):
+        if self.sheet is not None:
+            return self.sheet
+        self.start()
+        task = self._init_task
+        try:
+            await asyncio.shield(task)
+        except Exception:
+            # Следующий запрос попробует инициализировать клиент заново
+            if self._init_task is task:
+                self._init_task = None
+            raise
+        return self.sheet
+
+    def _get_http(self) -> 'AuthorizedHttp':
+        http = getattr(self._local, 'http', None)
+        if http is None:
+            import httplib2
+            from google_auth_httplib2 import AuthorizedHttp
 
-    async def get_sheet_data(self) -> list:
-        result = self.sheet.values().get(
+            http = AuthorizedHttp(self.credentials, http=httplib2.Http())
+            self._local.http = http
+        return http
+
+    async def _run_request(self, request: 'HttpRequest') -> dict:
+        """Выполняет запрос к API в пуле потоков, не блокируя event loop"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor,
+            lambda: request.execute(http=self._get_http())
+        )
+
+    async def _execute(self, request: 'HttpRequest', kind: RequestKind = RequestKind.READ) -> dict:
+        self._breaker.check()
+        try:
+            result = await self._scheduler.submit(request, kind)
+        except asyncio.CancelledError:
+            self._breaker.release()
+            raise
+        except Exception:
+            self._breaker.record_failure()
+            raise
+        self._breaker.record_success()
+        return result
+
+    @property
+    def is_degraded(self) -> bool:
+        """Sheets недоступен, чтения обслуживаются из сохранённого снимка"""
+        return self._breaker.is_open
+
+    def _load_persisted_snapshot(self) -> None:
+        if not self.snapshot_path or not os.path.exists(self.snapshot_path):
+            return
+        try:
+            with open(self.snapshot_path, 'rb') as f:
+                data = ormsgpack.unpackb(f.read())
+            if data.get('spreadsheet_id') != self.spreadsheet_id:
+                return
+            grid = SheetGrid.from_values(data['values'])
+        except Exception as e:
+            logger.error(f"Error loading sheet snapshot from {self.snapshot_path}: {e}")
+            return
+
+        self._fallback = grid
+        self._layout = grid.layout
+        # Снимок сразу считается устаревшим: первое чтение отдаст его и обновит в фоне
+        self._grids[None] = (grid, time.monotonic() - self.cache_ttl)
+        self._set_locator({key: rows.row_idx for key, rows in grid.dates.items()})
+        self._date_rows_at -= self.locator_ttl
+        saved_at = datetime.fromtimestamp(data.get('saved_at', 0))
+        logger.info(f"Loaded sheet snapshot saved at {saved_at:%d.%m.%y %H:%M:%S}")
+
+    def _persist_snapshot(self, values: list) -> None:
+        tmp_path = None
+        try:
+            directory = os.path.dirname(self.snapshot_path) or '.'
+            os.makedirs(directory, exist_ok=True)
+            # Своё имя временного файла у каждой записи: воркеры на одной машине пишут снимок одновременно
+            fd, tmp_path = tempfile.mkstemp(
+                dir=directory,
+                prefix=f"{os.path.basename(self.snapshot_path)}.",
+                suffix='.tmp'
+            )
+            with os.fdopen(fd, 'wb') as f:
+                f.write(ormsgpack.packb({
+                    'spreadsheet_id': self.spreadsheet_id,
+                    'saved_at': time.time(),
+                    'values': values
+                }))
+            # Замена атомарна: при сбое на диске останется предыдущий снимок
+            os.replace(tmp_path, self.snapshot_path)
+        except Exception as e:
+            logger.error(f"Error saving sheet snapshot to {self.snapshot_path}: {e}")
+            if tmp_path is not None and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def get_queue_depth(self) -> dict[str, int]:
+        """Количество запросов, ожидающих квоты, по типам"""
+        return self._scheduler.queue_depth
+
+    def close(self) -> None:
+        if self._init_task is not None:
+            self._init_task.cancel()
+        for task in self._refresh_tasks.values():
+            task.cancel()
+        self._scheduler.close()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    async def _fetch_sheet_data(self) -> list:
+        sheet = await self._get_sheet()
+        result = await self._execute(sheet.values().get(
             spreadsheetId=self.spreadsheet_id,
-            range='A1:O39'  # Увеличиваем диапазон для новой структуры
-        ).execute()
+            range=f'A1:{LAST_COLUMN}'  # Без последней строки: лист может расти вниз
+        ))
         return result.get('values', [])
 
-    def get_first_time(self, time_str: str) -> str:
-        if '-' in time_str:
-            return time_str.split('-')[0].strip()
-        return time_str.strip()
-        
+    def _store(self, key: GridKey, grid: SheetGrid, generation: int) -> None:
+        self._layout = grid.layout
+        # Если во время загрузки кэш был сброшен записью, результат уже может быть неактуален
+        if generation == self._generation:
+            self._grids[key] = (grid, time.monotonic())
+
+    def _set_locator(self, date_rows: dict[tuple[int, int], int]) -> None:
+        self._date_rows = date_rows
+        self._date_rows_at = time.monotonic()
+
+    def _shared_name(self, key: GridKey) -> str:
+        return self._shared_prefix + ('all' if key is None else f"{key[0]}.{key[1]}")
 
-    def get_last_time(self, time_str: str) -> str:
-        if '-' in time_str:
-            return time_str.split('-')[1].strip()
-        return time_str.strip()
+    async def _shared_get(self, key: GridKey):
+        if self.shared_cache is None:
+            return None
+        try:
+            return await self.shared_cache.get(self._shared_name(key))
+        except Exception as e:
+            logger.warning(f"Error reading shared sheet snapshot {key}: {e}")
+            return None
+
+    async def _shared_set(self, key: GridKey, value, generation: int) -> None:
+        # Снимок, загрузка которого началась до записи, в общий кэш не попадает
+        if self.shared_cache is None or generation != self._generation:
+            return
+        try:
+            await self.shared_cache.set(self._shared_name(key), value, ttl=self.cache_ttl)
+        except Exception as e:
+            logger.warning(f"Error saving shared sheet snapshot {key}: {e}")
+
+    def _publish_invalidation(self, *names: str) -> None:
+        if self.shared_cache is None:
+            return
+        task = asyncio.create_task(self.shared_cache.invalidate(*names))
+        self._invalidation_tasks.add(task)
+        task.add_done_callback(self._on_invalidation_done)
+
+    def _on_invalidation_done(self, task: asyncio.Task) -> None:
+        self._invalidation_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Error publishing sheet snapshot invalidation: {task.exception()}")
+
+    def _on_shared_invalidate(self, name: str) -> None:
+        """Другая реплика изменила лист: сбрасываем свои снимки затронутых ключей"""
+        if name in (ALL_KEYS, f"{self._shared_prefix}*"):
+            self._grids.clear()
+        elif name.startswith(self._shared_prefix):
+            suffix = name[len(self._shared_prefix):]
+            key = None if suffix == 'all' else tuple(int(part) for part in suffix.split('.'))
+            self._grids.pop(key, None)
+        else:
+            return
+        # Загрузка, начатая до чужой записи, не должна положить в кэш старые данные
+        self._generation += 1
+
+    async def _load_sheet(self, generation: int) -> SheetGrid:
+        values = await self._shared_get(None)
+        if values is None:
+            self.fetch_count += 1
+            values = await self._fetch_sheet_data()
+            await self._shared_set(None, values, generation)
+        grid = SheetGrid.from_values(values)
+        # Полная загрузка заодно обновляет локатор дат
+        self._set_locator({key: rows.row_idx for key, rows in grid.dates.items()})
+        self._store(None, grid, generation)
+        self._fallback = grid
+        if self.snapshot_path:
+            self._executor.submit(self._persist_snapshot, values)
+        return grid
+
+    async def _load_locator(self, generation: int) -> None:
+        self.fetch_count += 1
+        sheet = await self._get_sheet()
+        result = await self._execute(sheet.values().get(
+            spreadsheetId=self.spreadsheet_id,
+            range='A:A'
+        ))
+        self._set_locator(locate_dates(result.get('values', [])))
+
+    async def _find_date_row(self, key: tuple[int, int]) -> int | None:
+        age = time.monotonic() - self._date_rows_at
+        # Неизвестную дату ищем заново, но не чаще, чем раз в cache_ttl
+        if age >= self.locator_ttl or (key not in self._date_rows and age >= self.cache_ttl):
+            await self._single_flight(LOCATOR_KEY, self._load_locator)
+        return self._date_rows.get(key)
+
+    async def _load_date(self, key: tuple[int, int], generation: int) -> SheetGrid:
+        shared = await self._shared_get(key)
+        if shared is not None:
+            grid = SheetGrid.from_blocks(shared['header'], [(shared['row_idx'], shared['rows'])])
+            if key in grid.dates:
+                self._store(key, grid, generation)
+                return grid
+
+        row_idx = await self._find_date_row(key)
+        if row_idx is None:
+            return SheetGrid.from_values([])
+
+        # Шапка и четыре строки даты - одним запросом
+        self.fetch_count += 1
+        sheet = await self._get_sheet()
+        result = await self._execute(sheet.values().batchGet(
+            spreadsheetId=self.spreadsheet_id,
+            ranges=[
+                f'A1:{LAST_COLUMN}1',
+                f'A{row_idx + 1}:{LAST_COLUMN}{row_idx + TABLES_COUNT}'
+            ]
+        ))
+        header_range, rows_range = result.get('valueRanges', [{}, {}])
+        header = header_range.get('values', [[]])[0]
+        rows = rows_range.get('values', [])
+        grid = SheetGrid.from_blocks(header, [(row_idx, rows)])
+        if key not in grid.dates:
+            # Лист перестроили и дата переехала: читаем его целиком, это обновит и локатор
+            logger.info(f"Date {key} moved from row {row_idx + 1}, reloading the whole sheet")
+            return await self._refresh(None)
+
+        self._store(key, grid, generation)
+        await self._shared_set(key, {'header': header, 'row_idx': row_idx, 'rows': rows}, generation)
+        return grid
+
+    def _on_inflight_done(self, key: Hashable, task: asyncio.Task) -> None:
+        inflight = self._inflight.get(key)
+        if inflight is not None and inflight[0] is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            # Ошибку получат ожидающие, здесь только помечаем её как обработанную
+            task.exception()
+
+    async def _single_flight(self, key: Hashable, load: Callable[[int], Awaitable]):
+        # Присоединяемся к уже идущей загрузке, если она начата после последней записи
+        inflight = self._inflight.get(key)
+        if inflight is not None and inflight[1] == self._generation:
+            self.coalesced_count += 1
+            return await asyncio.shield(inflight[0])
+
+        task = asyncio.create_task(load(self._generation))
+        self._inflight[key] = (task, self._generation)
+        task.add_done_callback(partial(self._on_inflight_done, key))
+        return await asyncio.shield(task)
+
+    async def _refresh(self, key: GridKey) -> SheetGrid:
+        if key is None:
+            return await self._single_flight(None, self._load_sheet)
+        return await self._single_flight(key, partial(self._load_date, key))
+
+    def get_read_stats(self) -> dict[str, int]:
+        """Сколько раз лист реально загружался и сколько чтений присоединились к уже идущей загрузке"""
+        return {'fetches': self.fetch_count, 'coalesced': self.coalesced_count}
+
+    async def _background_refresh(self, key: GridKey) -> None:
+        try:
+            await self._refresh(key)
+        except SheetsUnavailableError:
+            pass
+        except Exception as e:
+            logger.error(f"Error refreshing sheet snapshot {key}: {e}")
+        finally:
+            self._refresh_tasks.pop(key, None)
+
+    def invalidate_cache(self) -> None:
+        """Сбрасывает все снимки, следующее чтение пойдёт в API"""
+        self._grids.clear()
+        self._generation += 1
+        self._publish_invalidation(f"{self._shared_prefix}*")
+
+    def _patch(self, date_str: str, change: Callable[[SheetGrid], SheetGrid]) -> None:
+        """Применяет изменение к снимку всего листа и к снимку даты date_str"""
+        keys: list[GridKey] = [None]
+        try:
+            keys.append(date_key(date_str))
+        except ValueError:
+            pass
+        for key in keys:
+            cached = self._grids.get(key)
+            if cached is not None:
+                self._grids[key] = (change(cached[0]), cached[1])
+        if self._fallback is not None:
+            self._fallback = change(self._fallback)
+        # Загрузка, начатая до изменения, не должна его затереть
+        self._generation += 1
+        # Остальные реплики перечитают изменённые снимки
+        self._publish_invalidation(*(self._shared_name(key) for key in keys))
+
+    def mark_booking_cells(
+        self,
+        date_str: str,
+        start_time: str,
+        end_time: str,
+        table_id: int,
+        busy: bool
+    ) -> None:
+        """Применяет бронь (или её отмену) к снимкам в памяти, не перечитывая лист"""
+        cached = self._grids.get(None)
+        try:
+            cached = self._grids.get(date_key(date_str), cached)
+        except ValueError:
+            pass
+        grid = cached[0] if cached is not None else self._fallback
+        if grid is None:
+            return
+        start_slot = grid.start_slots.get(start_time)
+        end_slot = grid.end_slots.get(end_time)
+        if start_slot is None or end_slot is None:
+            self.invalidate_cache()
+            return
+        self._patch(date_str, lambda grid: grid.with_slots(date_str, table_id, start_slot, end_slot, busy))
+
+    async def _get_cached(self, key: GridKey) -> SheetGrid:
+        cached = self._grids.get(key)
+        if cached is not None:
+            grid, loaded_at = cached
+            age = time.monotonic() - loaded_at
+            if age < self.cache_ttl:
+                return grid
+            if age < self.cache_ttl + self.cache_stale_ttl:
+                if key not in self._refresh_tasks:
+                    self._refresh_tasks[key] = asyncio.create_task(self._background_refresh(key))
+                return grid
+        try:
+            return await self._refresh(key)
+        except Exception as e:
+            # Sheets недоступен: отдаём последний известный снимок, пока цепь не замкнётся
+            fallback = cached[0] if cached is not None else self._fallback
+            if fallback is None:
+                raise
+            if not isinstance(e, SheetsUnavailableError):
+                logger.warning(f"Error reading sheet, serving last known snapshot: {e}")
+            return fallback
+
+    async def get_grid(self) -> SheetGrid:
+        """Снимок всего листа"""
+        return await self._get_cached(None)
+
+    async def get_date_grid(self, date_str: str) -> SheetGrid:
+        """Снимок, в котором есть дата date_str: весь лист, если он свежий, иначе только эта дата"""
+        cached = self._grids.get(None)
+        if cached is not None and time.monotonic() - cached[1] < self.cache_ttl:
+            return cached[0]
+        try:
+            key = date_key(date_str)
+        except ValueError:
+            return SheetGrid.from_values([])
+        return await self._get_cached(key)
+
+    async def get_all_dates(self) -> list:
+        grid = await self.get_grid()
+        return [
+            {'date': rows.day.strftime('%d.%m.%y'), 'weekday': rows.day.strftime('%A')}
+            for rows in grid.dates.values()
+        ]
 
     async def get_available_dates(self) -> list:
-        data = await self.get_sheet_data()
-        available_dates = []
-        
-        if not data or len(data) < 3:  # Минимум нужны строки: время + 3 стола
-            return available_dates
-            
-        # Получаем даты из первого столбца (пропускаем первые 3 строки с временем)
-        for row_idx in range(3, len(data), 4):  # Шаг 4, так как каждая дата занимает 4 строки (по числу столов)
-            date_cell = data[row_idx][0] if len(data[row_idx]) > 0 else None
-            
-            if not date_cell or not date_cell.strip():  # Пропускаем пустые ячейки
-                continue
-                
-            try:
-                # Парсим дату
-                date = datetime.strptime(date_cell, '%d.%m')
-                date = date.replace(year=datetime.now().year)
-                
-                # Проверяем наличие свободных слотов для этой даты
-                has_free_slots = False
-                for table_idx in range(4):  # Проверяем все 4 стола для этой даты
-                    current_row = data[row_idx + table_idx]
-                    if len(current_row) < 3:
-                        has_free_slots = True
-                        break
-                    # Проверяем ячейки времени (начиная с индекса 1, пропуская название стола)
-                    for time_idx in range(1, len(current_row)):
-                        if current_row[time_idx].strip() == '' or len(current_row) < 14:
-                            has_free_slots = True
-                            break
-                    if has_free_slots:
-                        break
-                
-                if has_free_slots:
-                    available_dates.append({
-                        'date': date.strftime('%d.%m.%y'),
-                        'weekday': date.strftime('%A')
-                    })
-                    
-            except (ValueError, AttributeError) as e:
-                logger.error(f"Error parsing date {date_cell}: {e}")
-                continue
-                
-        return available_dates
-
-    async def get_available_times(self, selected_date: str, table_preference: str = 'random') -> list:
-        data = await self.get_sheet_data()
-        available_times = []
-        
-        # Получаем строку с временем (первая строка)
-        time_slots = [self.get_first_time(time_slot) for time_slot in data[0][2:14]]  # Пропускаем первые две ячейки
-        print(time_slots)
-        
-        # Ищем индекс строки с выбранной датой
-        date_row_idx = None
-        for idx in range(3, len(data), 4):
-            selected_date = selected_date.split('.')[0] + '.' + selected_date.split('.')[1]
-            if data[idx][0].strip() == selected_date:
-                date_row_idx = idx
-                break
-            
-        if date_row_idx is None:
-            return available_times
-            
-        # Проверяем доступность каждого временного слота
-        for time_idx, time_slot in enumerate(time_slots, start=2):
-            if table_preference == 'random':
-                # Проверяем все столы
-                has_free_tables = False
-                for table_idx in range(4):
-                    current_row = data[date_row_idx + table_idx]
-                    if len(current_row) <= time_idx or current_row[time_idx].strip() == '':
-                        has_free_tables = True
-                        break
-                if has_free_tables:
-                    available_times.append(time_slot)
-            else:
-                # Проверяем только выбранный стол
-                table_idx = int(table_preference) - 1
-                current_row = data[date_row_idx + table_idx]
-                if len(current_row) <= time_idx or current_row[time_idx].strip() == '':
-                    available_times.append(time_slot)
-                
-        return available_times
-    
-
-    async def get_best_table_and_end_times(self, date_str: str, start_time: str) -> tuple[int, list[str]]:
-        data = await self.get_sheet_data()
-        
-        # Находим индекс строки с нужной датой
-        target_date = datetime.strptime(date_str, '%d.%m.%y')
-        target_row_idx = None
-        
-        for idx in range(3, len(data), 4):  # Начинаем с 4-й строки, шаг 4 (каждая дата = 4 строки)
-            try:
-                date_cell = data[idx][0]  # Дата в первом столбце
-                if date_cell:
-                    row_date = datetime.strptime(date_cell, '%d.%m')
-                    if (row_date.day == target_date.day and 
-                        row_date.month == target_date.month):
-                        target_row_idx = idx
-                        break
-            except (ValueError, IndexError):
-                continue
-        
-        if target_row_idx is None:
-            return None, []
+        grid = await self.get_grid()
+        return [
+            {'date': rows.day.strftime('%d.%m.%y'), 'weekday': rows.day.strftime('%A')}
+            for rows in grid.dates.values()
+            if rows.availability.has_free_slots()
+        ]
 
-        # Находим индекс колонки с начальным временем
-        time_slots = [self.get_first_time(time_slot) for time_slot in data[0][2:14]]  # Пропускаем первую ячейку (пустая или "Время")
-        time_slots_end = [self.get_last_time(time_slot) for time_slot in data[0][2:14]]
-        target_col_idx = None
-        
-        for idx, time_slot in enumerate(time_slots, start=2):
-            if time_slot == start_time:
-                target_col_idx = idx
-                break
-
-        print(f"target_col_idx: {target_col_idx}")
-        if target_col_idx is None:
-            return None, []
+    async def get_available_times(
+        self,
+        selected_date: str,
+        table_preference: str = 'random',
+        held: Collection[tuple[int, str]] = ()
+    ) -> list:
+        grid = await self.get_date_grid(selected_date)
+        rows = grid.find_date(selected_date)
+        if rows is None:
+            return []
+        availability = rows.availability.without_held(held, grid.start_slots)
+
+        if table_preference == 'random':
+            tables = range(TABLES_COUNT)
+        else:
+            tables = [int(table_preference) - 1]
+
+        return [grid.start_times[slot] for slot in availability.free_slots(tables)]
 
-        available_tables = []  # список кортежей (номер_стола, количество_доступных_часов)
-        
-        # Проверяем каждый стол для выбранной даты
-        for table_idx in range(4):
-            current_row_idx = target_row_idx + table_idx
-            print(f"current_row_idx: {current_row_idx}")
-            # Проверяем, свободен ли стол в начальное время
-            is_table_free = True 
-            if current_row_idx < len(data):
-                if target_col_idx < len(data[current_row_idx]):
-                    if data[current_row_idx][target_col_idx].strip() != '':
-                        is_table_free = False
-            if is_table_free:
-                consecutive_hours = 0
-                # Проверяем последующие временные слоты
-                for col_idx in range(target_col_idx, len(time_slots) + 2):
-                    if (len(data[current_row_idx]) <= col_idx or data[current_row_idx][col_idx] == ''):
-                        consecutive_hours += 1
-                    else:
-                        break
-                
-                available_tables.append((table_idx+1, consecutive_hours))
-        
-        if not available_tables:
+    async def get_best_table_and_end_times(
+        self,
+        date_str: str,
+        start_time: str,
+        held: Collection[tuple[int, str]] = ()
+    ) -> tuple[int, list[str]]:
+        grid = await self.get_date_grid(date_str)
+        rows = grid.find_date(date_str)
+        start_slot = grid.start_slots.get(start_time)
+        if rows is None or start_slot is None:
             return None, []
-        
-        print(f"consecutive_hours: {consecutive_hours}")
+
         # Выбираем стол с максимальным временем бронирования
-        best_table, max_hours = max(available_tables, key=lambda x: x[1])
-        # Формируем список доступных времен окончания для выбранного стола
-        available_end_times = []
-        for i in range(0, max_hours):
-            if target_col_idx -2 + i < len(time_slots):
-                available_end_times.append(time_slots_end[target_col_idx + i - 2])
-        
-        return best_table, available_end_times 
+        best = rows.availability.without_held(held, grid.start_slots).best_table(start_slot)
+        if best is None:
+            return None, []
+
+        table_idx, max_hours = best
+        return table_idx + 1, list(grid.end_times[start_slot:start_slot + max_hours])
+
+    async def get_available_end_times_for_table(
+        self,
+        date_str: str,
+        start_time: str,
+        table_id: int,
+        held: Collection[tuple[int, str]] = ()
+    ) -> list[str]:
+        grid = await self.get_date_grid(date_str)
+        rows = grid.find_date(date_str)
+        start_slot = grid.start_slots.get(start_time)
+        if rows is None or start_slot is None:
+            return []
+
+        availability = rows.availability.without_held(held, grid.start_slots)
+        free_hours = availability.free_run(table_id - 1, start_slot)
+        return list(grid.end_times[start_slot:start_slot + free_hours])
+
+    async def _batch_update(self, data: list[tuple[str, list[list[str]]]]) -> None:
+        """Записывает все диапазоны одной логической операции за один запрос"""
+        try:
+            sheet = await self._get_sheet()
+            await self._execute(sheet.values().batchUpdate(
+                spreadsheetId=self.spreadsheet_id,
+                body={
+                    'valueInputOption': 'USER_ENTERED',
+                    'includeValuesInResponse': False,
+                    'data': [
+                        {'range': range_name, 'values': values}
+                        for range_name, values in data
+                    ]
+                }
+            ), RequestKind.WRITE)
+        except SheetsUnavailableError:
+            # Запрос не отправлялся, снимок остаётся верным
+            raise
+        except Exception:
+            # Запись могла частично дойти до листа, снимку больше доверять нельзя
+            self.invalidate_cache()
+            raise
 
+    async def _locate_booking(
+        self,
+        date_str: str,
+        start_time: str,
+        end_time: str,
+        table_id: int
+    ) -> SheetCells | None:
+        grid = await self.get_date_grid(date_str)
+        rows = grid.find_date(date_str)
+        start_slot = grid.start_slots.get(start_time)
+        end_slot = grid.end_slots.get(end_time)
+        if rows is None or start_slot is None or end_slot is None:
+            return None
+        return grid.cells(rows, table_id, start_slot, end_slot)
+
+    def _cells_are_current(self, date_str: str, table_id: int, cells: SheetCells) -> bool:
+        """Сверяет сохранённые ячейки со свежим локатором дат, без запросов к API.
+        Блоки дат в листе переиспользуются, поэтому устаревшему локатору
+        (в том числе загруженному из снимка на диске) не доверяем"""
+        if self._layout is None or time.monotonic() - self._date_rows_at >= self.locator_ttl:
+            return False
+        try:
+            key = date_key(date_str)
+        except ValueError:
+            return False
+        row_idx = self._date_rows.get(key)
+        return (
+            row_idx is not None
+            and cells.row == row_idx + table_id
+            and cells.layout == block_fingerprint(self._layout, key, row_idx)
+        )
+
+    async def write_booking(
+        self,
+        date_str: str,
+        start_time: str,
+        end_time: str,
+        table_id: int,
+        client_name: str,
+        client_phone: str
+    ) -> SheetCells | None:
+        """Записывает бронь и возвращает её ячейки, чтобы отмена обошлась без чтения листа.
+
+        None - бронь в листе записать некуда (нет даты или времени). Ошибки
+        Sheets API пробрасываются: воркер синхронизации повторит запись позже.
+        """
+        cells = await self._locate_booking(date_str, start_time, end_time, table_id)
+        if cells is None:
+            return None
+
+        # Формируем значение для ячейки (имя и телефон)
+        cell_value = f"{client_name}\n{client_phone}"
+
+        # Обновляем ячейки, сохраняя форматирование
+        await self._batch_update([(cells.range_name, [[cell_value] * cells.cells_count])])
+        self.mark_booking_cells(date_str, start_time, end_time, table_id, busy=True)
+
+        return cells
 
     async def update_booking_in_sheets(
         self, 
@@ -200,272 +671,87 @@ class GoogleSheetsService:
         client_phone: str
     ) -> bool:
         try:
-            data = await self.get_sheet_data()
-            
-            # Находим индекс строки с нужной датой
-            target_date = datetime.strptime(date_str, '%d.%m.%y')
-            target_row_idx = None
-            
-            for idx in range(3, len(data), 4):
-                try:
-                    date_cell = data[idx][0]
-                    if date_cell:
-                        row_date = datetime.strptime(date_cell, '%d.%m')
-                        if (row_date.day == target_date.day and 
-                            row_date.month == target_date.month):
-                            target_row_idx = idx
-                            break
-                except (ValueError, IndexError):
-                    continue
-            
-            if target_row_idx is None:
-                return False
-
-            # Находим индексы колонок для начального и конечного времени
-            time_slots = [self.get_first_time(time_slot) for time_slot in data[0][2:14]]
-            time_slots_end = [self.get_last_time(time_slot) for time_slot in data[0][2:14]]
-            start_col_idx = None
-            end_col_idx = None
-            
-            for idx, (start, end) in enumerate(zip(time_slots, time_slots_end), start=3):
-                if start == start_time:
-                    start_col_idx = idx
-                if end == end_time:
-                    end_col_idx = idx
-
-            if start_col_idx is None or end_col_idx is None:
-                return False
-
-            # Формируем значение для ячейки (имя и телефон)
-            cell_value = f"{client_name}\n{client_phone}"
-            
-            # Определяем диапазон ячеек для обновления
-            row_idx = target_row_idx + (table_id - 1)  # -1 так как table_id начинается с 1
-            range_start = f"{self._column_letter(start_col_idx)}{row_idx + 1}"
-            range_end = f"{self._column_letter(end_col_idx)}{row_idx + 1}"
-            range_name = f"{range_start}:{range_end}"
-
-            # Подготавливаем данные для обновления
-            values = [[cell_value] * (end_col_idx - start_col_idx + 1)]  # Убираем +1 из расчета количества ячеек
-            
-            # Обновляем ячейки, сохраняя форматирование
-            self.sheet.values().update(
-                spreadsheetId=self.spreadsheet_id,
-                range=range_name,
-                valueInputOption='USER_ENTERED',
-                includeValuesInResponse=True,
-                body={'values': values}
-            ).execute()
-
-            return True
-            
+            cells = await self.write_booking(date_str, start_time, end_time, table_id, client_name, client_phone)
         except Exception as e:
             logger.error(f"Error updating booking in sheets: {e}")
             return False
+        return cells is not None
 
-    def _column_letter(self, column_number: int) -> str:
-        """Преобразует номер столбца в буквенное обозначение (1 -> A, 2 -> B, etc.)"""
-        result = ""
-        while column_number > 0:
-            column_number -= 1
-            result = chr(65 + (column_number % 26)) + result
-            column_number //= 26
-        return result
+    async def clear_booking(
+        self,
+        date_str: str,
+        start_time: str,
+        end_time: str,
+        table_id: int,
+        cells: SheetCells | None = None
+    ) -> bool:
+        """Очищает ячейки брони. False - очищать нечего, ошибки Sheets API пробрасываются"""
+        if cells is None or not self._cells_are_current(date_str, table_id, cells):
+            # Координат нет, лист перестроили или локатор устарел - ищем ячейки заново
+            cells = await self._locate_booking(date_str, start_time, end_time, table_id)
+            if cells is None:
+                return False
+
+        # Используем пустые значения для очистки ячеек
+        await self._batch_update([(cells.range_name, [[''] * cells.cells_count])])
+        self.mark_booking_cells(date_str, start_time, end_time, table_id, busy=False)
+        return True
 
     async def clear_booking_in_sheets(
         self, 
         date_str: str, 
         start_time: str, 
         end_time: str, 
-        table_id: int
+        table_id: int,
+        cells: SheetCells | None = None
     ) -> bool:
         try:
-            data = await self.get_sheet_data()
-            
-            # Находим индекс строки с нужной датой
-            target_date = datetime.strptime(date_str, '%d.%m.%y')
-            target_row_idx = None
-            
-            for idx in range(3, len(data), 4):
-                try:
-                    date_cell = data[idx][0]
-                    if date_cell:
-                        row_date = datetime.strptime(date_cell, '%d.%m')
-                        if (row_date.day == target_date.day and 
-                            row_date.month == target_date.month):
-                            target_row_idx = idx + (table_id - 1)
-                            break
-                except (ValueError, IndexError):
-                    continue
-            
-            if target_row_idx is None:
-                return False
-
-            # Находим индексы колонок для начального и конечного времени
-            time_slots = [self.get_first_time(slot) for slot in data[0][2:14]]
-            time_slots_end = [self.get_last_time(slot) for slot in data[0][2:14]]
-            start_col_idx = None
-            end_col_idx = None
-            
-            # Изменяем логику поиска индексов
-            for idx, (start, end) in enumerate(zip(time_slots, time_slots_end), start=3):
-                if start == start_time:
-                    start_col_idx = idx
-                if end == end_time:  # Убираем elif для независимой проверки
-                    end_col_idx = idx
-                
-            if start_col_idx is None or end_col_idx is None:
-                return False
-            
-            # Очищаем ячейки
-            range_name = f"{self._column_letter(start_col_idx)}{target_row_idx + 1}:{self._column_letter(end_col_idx)}{target_row_idx + 1}"
-            
-            # Используем пустые значения для очистки ячеек
-            self.sheet.values().update(
-                spreadsheetId=self.spreadsheet_id,
-                range=range_name,
-                valueInputOption='USER_ENTERED',
-                includeValuesInResponse=True,
-                body={'values': [['']*((end_col_idx - start_col_idx) + 1)]}
-            ).execute()
-            
-            return True
-            
+            return await self.clear_booking(date_str, start_time, end_time, table_id, cells)
         except Exception as e:
             logger.error(f"Error clearing booking in sheets: {e}")
             return False
 
+    async def _fill_days(self, date_strs: list[str], value: str) -> bool:
+        # Для одной даты достаточно её блока, для нескольких дешевле прочитать весь лист
+        if len(date_strs) == 1:
+            grid = await self.get_date_grid(date_strs[0])
+        else:
+            grid = await self.get_grid()
+        days_rows = [grid.find_date(date_str) for date_str in date_strs]
+        if not days_rows or None in days_rows:
+            return False
+
+        # Заполняем все ячейки для всех столов на эти дни одним запросом
+        last_slot = len(grid.start_times) - 1
+        await self._batch_update([
+            (grid.slots_range(rows, table_id, 0, last_slot), [[value] * len(grid.start_times)])
+            for rows in days_rows
+            for table_id in range(1, TABLES_COUNT + 1)
+        ])
+
+        # Снимки могли обновиться, пока шла запись - применяем изменение к текущим
+        for date_str in date_strs:
+            self._patch(date_str, lambda grid, date_str=date_str: grid.with_day(date_str, busy=value != ''))
+        return True
+
     async def block_day_in_sheets(self, date_str: str) -> bool:
-        try:
-            data = await self.get_sheet_data()
-            
-            # Находим индекс строки с нужной датой
-            target_date = datetime.strptime(date_str, '%d.%m.%y')
-            target_row_idx = None
-            
-            for idx in range(3, len(data), 4):
-                try:
-                    date_cell = data[idx][0]
-                    if date_cell:
-                        row_date = datetime.strptime(date_cell, '%d.%m')
-                        if (row_date.day == target_date.day and 
-                            row_date.month == target_date.month):
-                            target_row_idx = idx
-                            break
-                except (ValueError, IndexError):
-                    continue
-            
-            if target_row_idx is None:
-                return False
+        return await self.block_days_in_sheets([date_str])
 
-            # Заполняем все ячейки для всех столов на этот день
-            for table_idx in range(4):
-                row_idx = target_row_idx + table_idx
-                range_name = f"C{row_idx + 1}:O{row_idx + 1}"  # От C до O (все временные слоты)
-                
-                # Используем "BLOCKED" для всех ячеек
-                self.sheet.values().update(
-                    spreadsheetId=self.spreadsheet_id,
-                    range=range_name,
-                    valueInputOption='USER_ENTERED',
-                    includeValuesInResponse=True,
-                    body={'values': [['BLOCKED'] * 12]}  # 12 временных слотов
-                ).execute()
-            
-            return True
-            
+    async def unblock_day_in_sheets(self, date_str: str) -> bool:
+        return await self.unblock_days_in_sheets([date_str])
+
+    async def block_days_in_sheets(self, date_strs: list[str]) -> bool:
+        try:
+            # Используем "BLOCKED" для всех ячеек
+            return await self._fill_days(date_strs, 'BLOCKED')
         except Exception as e:
-            logger.error(f"Error blocking day in sheets: {e}")
+            logger.error(f"Error blocking days {date_strs} in sheets: {e}")
             return False
 
-    async def unblock_day_in_sheets(self, date_str: str) -> bool:
+    async def unblock_days_in_sheets(self, date_strs: list[str]) -> bool:
         try:
-            data = await self.get_sheet_data()
-            
-            # Находим индекс строки с нужной датой
-            target_date = datetime.strptime(date_str, '%d.%m.%y')
-            target_row_idx = None
-            
-            for idx in range(3, len(data), 4):
-                try:
-                    date_cell = data[idx][0]
-                    if date_cell:
-                        row_date = datetime.strptime(date_cell, '%d.%m')
-                        if (row_date.day == target_date.day and 
-                            row_date.month == target_date.month):
-                            target_row_idx = idx
-                            break
-                except (ValueError, IndexError):
-                    continue
-            
-            if target_row_idx is None:
-                return False
-
-            # Очищаем все ячейки для всех столов на этот день
-            for table_idx in range(4):
-                row_idx = target_row_idx + table_idx
-                range_name = f"C{row_idx + 1}:O{row_idx + 1}"  # От C до O (все временные слоты)
-                
-                # Используем пустые значения для очистки ячеек
-                self.sheet.values().update(
-                    spreadsheetId=self.spreadsheet_id,
-                    range=range_name,
-                    valueInputOption='USER_ENTERED',
-                    includeValuesInResponse=True,
-                    body={'values': [['']*12]}  # 12 пустых временных слотов
-                ).execute()
-            
-            return True
-            
+            # Используем пустые значения для очистки ячеек
+            return await self._fill_days(date_strs, '')
         except Exception as e:
-            logger.error(f"Error unblocking day in sheets: {e}")
+            logger.error(f"Error unblocking days {date_strs} in sheets: {e}")
             return False
-
-    async def get_available_end_times_for_table(self, date_str: str, start_time: str, table_id: int) -> list[str]:
-        data = await self.get_sheet_data()
-        
-        # Ищем строку для выбранной даты и стола
-        target_date = datetime.strptime(date_str, '%d.%m.%y')
-        target_row_idx = None
-        
-        for idx in range(3, len(data), 4):
-            try:
-                date_cell = data[idx][0]
-                if date_cell:
-                    row_date = datetime.strptime(date_cell, '%d.%m')
-                    if (row_date.day == target_date.day and 
-                        row_date.month == target_date.month):
-                        target_row_idx = idx + (table_id - 1)  # Корректируем для конкретного стола
-                        break
-            except (ValueError, IndexError):
-                continue
-            
-        if target_row_idx is None:
-            return []
-
-        # Ищем колонку времени начала
-        time_slots = [self.get_first_time(time_slot) for time_slot in data[0][2:14]]
-        time_slots_end = [self.get_last_time(time_slot) for time_slot in data[0][2:14]]
-        start_col_idx = None
-        
-        for idx, time_slot in enumerate(time_slots, start=2):
-            if time_slot == start_time:
-                start_col_idx = idx
-                break
-            
-        if start_col_idx is None:
-            return []
-
-        # Проверяем последовательные доступные слоты
-        available_end_times = []
-        current_row = data[target_row_idx]
-        
-        for col_idx in range(start_col_idx, len(time_slots) + 2):
-            if col_idx >= len(current_row) or current_row[col_idx].strip() == '':
-                print(f"col_idx: {col_idx}, len(current_row): {len(current_row)}, current_row: {current_row}")
-                if col_idx - 2 < len(time_slots):
-                    available_end_times.append(time_slots_end[col_idx - 2])
-            else:
-                break
-            
-        return available_end_times
@@ -1,4 +1,9 @@
-from typing import Any, Optional, Self
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Callable, Collection, Optional, Self
 
 import ormsgpack
 from aiogram.filters.state import StateType
@@ -11,76 +16,380 @@ from aiogram.fsm.storage.base import (
 )
 
 from nats.aio.client import Client
+from nats.aio.msg import Msg
+from nats.errors import TimeoutError as NatsTimeoutError
 from nats.js import JetStreamContext
-from nats.js.api import KeyValueConfig
-from nats.js.errors import NotFoundError
+from nats.js.api import DeliverPolicy, KeyValueConfig
+from nats.js.errors import BadRequestError, KeyWrongLastSequenceError, NotFoundError
 from nats.js.kv import KeyValue
 
+logger = logging.getLogger(__name__)
+
+# Раскладки хранилища: два бакета (состояние и данные отдельно) или одна запись на ключ
+SPLIT_LAYOUT = 'split'
+MERGED_LAYOUT = 'merged'
+
+# Ключ локального кэша: (бакет, ключ в бакете)
+CacheKey = tuple[str, str]
+
+
+def _timestamp(created: datetime | int | None) -> float | None:
+    """Время записи из KV: datetime из метаданных сообщения или наносекунды с эпохи"""
+    if created is None:
+        return None
+    if isinstance(created, datetime):
+        return created.timestamp()
+    return created / 1e9
+
 
 class NatsStorage(BaseStorage):
     def __init__(
-        self, 
-        nc: Client, 
-        js: JetStreamContext, 
-        key_builder: Optional[KeyBuilder] = None, 
+        self,
+        nc: Client,
+        js: JetStreamContext,
+        key_builder: Optional[KeyBuilder] = None,
         fsm_states_bucket: str = 'fsm_states_aiogram',
-        fsm_data_bucket: str = 'fsm_data_aiogram'
+        fsm_data_bucket: str = 'fsm_data_aiogram',
+        layout: str = SPLIT_LAYOUT,
+        fsm_bucket: str = 'fsm_aiogram',
+        record_ttl: float = 1.0,
+        local_cache: bool = False,
+        cache_size: int = 10_000,
+        max_retries: int = 5,
+        history: int = 1,
+        states_ttl: float | None = None,
+        data_ttl: float | None = None,
+        fsm_ttl: float | None = None,
+        scan_timeout: float = 2.0
     ) -> None:
-        
+
         if key_builder is None:
             key_builder = DefaultKeyBuilder()
         self.nc = nc
         self.js = js
         self.fsm_states_bucket = fsm_states_bucket
         self.fsm_data_bucket = fsm_data_bucket
+        self.layout = layout
+        self.fsm_bucket = fsm_bucket
+        self.record_ttl = record_ttl
+        self.local_cache = local_cache
+        self.cache_size = cache_size
+        self.max_retries = max_retries
+        self.history = history
+        self.scan_timeout = scan_timeout
+        # Сколько секунд ключ живёт после последней записи; None - бессрочно
+        self.bucket_ttls = {
+            fsm_states_bucket: states_ttl,
+            fsm_data_bucket: data_ttl,
+            fsm_bucket: fsm_ttl,
+        }
         self._key_builder = key_builder
-        
+        # Прочитанные и записанные значения: ключ -> (ревизия, значение, до какого момента верить)
+        self._cache: OrderedDict[CacheKey, tuple[int | None, Any, float]] = OrderedDict()
+        # Последние ревизии из watch и время их записи: чтение, ответ на которое
+        # пришёл позже чужой записи, не должно положить в кэш устаревшее значение
+        self._seen: OrderedDict[CacheKey, tuple[int, float | None]] = OrderedDict()
+        # Бакеты, за которыми сейчас следит watch - только им кэш верит без срока
+        self._watching: set[str] = set()
+        self._watch_tasks: list[asyncio.Task] = []
+
     async def create_storage(self) -> Self:
-        self.kv_states = await self._get_kv_states()
-        self.kv_data = await self._get_kv_data()
+        if self.layout == MERGED_LAYOUT:
+            self.kv_fsm = await self._get_kv_fsm()
+        else:
+            self.kv_states = await self._get_kv_states()
+            self.kv_data = await self._get_kv_data()
+
+        if self.local_cache:
+            for bucket, kv in self._buckets().items():
+                self._watch_tasks.append(asyncio.create_task(self._watch(bucket, kv)))
         return self
 
+    def _buckets(self) -> dict[str, KeyValue]:
+        if self.layout == MERGED_LAYOUT:
+            return {self.fsm_bucket: self.kv_fsm}
+        return {self.fsm_states_bucket: self.kv_states, self.fsm_data_bucket: self.kv_data}
+
     async def _get_kv_states(self) -> KeyValue:
-        return await self.js.create_key_value(
-            config=KeyValueConfig(
-                bucket=self.fsm_states_bucket,
-                history=5,
-                storage='file'
-            )
-        )
-    
+        return await self._get_kv(self.fsm_states_bucket)
+
     async def _get_kv_data(self) -> KeyValue:
-        return await self.js.create_key_value(
-            config=KeyValueConfig(
-                bucket=self.fsm_data_bucket,
-                history=5,
-                storage='file'
+        return await self._get_kv(self.fsm_data_bucket)
+
+    async def _get_kv_fsm(self) -> KeyValue:
+        return await self._get_kv(self.fsm_bucket)
+
+    async def _get_kv(self, bucket: str) -> KeyValue:
+        ttl = self.bucket_ttls[bucket]
+        try:
+            return await self.js.create_key_value(
+                config=KeyValueConfig(
+                    bucket=bucket,
+                    history=self.history,
+                    ttl=ttl,
+                    storage='file'
+                )
             )
-        )
+        except BadRequestError:
+            pass
+
+        # Бакет создан раньше с другими history или TTL - меняем настройки стрима под ним.
+        # Лишние ревизии сервер удаляет сразу после уменьшения history
+        info = await self.js.stream_info(f"KV_{bucket}")
+        config = info.config
+        config.max_msgs_per_subject = self.history
+        config.max_age = ttl or 0
+        if ttl:
+            config.duplicate_window = min(config.duplicate_window or ttl, ttl)
+        await self.js.update_stream(config)
+        logger.info(f"FSM bucket {bucket} reconfigured: history={self.history}, ttl={ttl}")
+        return await self.js.key_value(bucket)
 
     async def set_state(self, key: StorageKey, state: StateType = None) -> None:
         state = state.state if isinstance(state, State) else state
-        await self.kv_states.put(
-            self._key_builder.build(key), ormsgpack.packb(state or None)
-        )
+        if self.layout == MERGED_LAYOUT:
+            await self._modify(key, lambda record: {**record, 'state': state or None})
+            return
+        name = self._key_builder.build(key)
+        written_at = time.time()
+        revision = await self.kv_states.put(name, ormsgpack.packb(state or None))
+        self._remember((self.fsm_states_bucket, name), revision, state or None, written_at)
 
     async def get_state(self, key: StorageKey) -> Optional[str]:
-        try:
-            entry = await self.kv_states.get(self._key_builder.build(key))
-            data = ormsgpack.unpackb(entry.value)
-        except NotFoundError:
-            return None
-        return data
+        if self.layout == MERGED_LAYOUT:
+            _, record = await self._get_record(self._key_builder.build(key))
+            return record.get('state')
+        _, state = await self._read(self.fsm_states_bucket, self.kv_states, self._key_builder.build(key), None)
+        return state
 
     async def set_data(self, key: StorageKey, data: dict[str, Any]) -> None:
-        await self.kv_data.put(self._key_builder.build(key), ormsgpack.packb(data))
+        if self.layout == MERGED_LAYOUT:
+            await self._modify(key, lambda record: {**record, 'data': data})
+            return
+        name = self._key_builder.build(key)
+        written_at = time.time()
+        revision = await self.kv_data.put(name, ormsgpack.packb(data))
+        self._remember((self.fsm_data_bucket, name), revision, dict(data), written_at)
 
     async def get_data(self, key: StorageKey) -> dict[str, Any]:
+        if self.layout == MERGED_LAYOUT:
+            _, record = await self._get_record(self._key_builder.build(key))
+            return dict(record.get('data') or {})
+        _, data = await self._read(self.fsm_data_bucket, self.kv_data, self._key_builder.build(key), {})
+        return dict(data)
+
+    async def update_data(self, key: StorageKey, data: dict[str, Any]) -> dict[str, Any]:
+        if self.layout != MERGED_LAYOUT:
+            return await super().update_data(key, data)
+        # Чтение и запись одной записи вместо get_data + set_data
+        record = await self._modify(
+            key, lambda record: {**record, 'data': {**(record.get('data') or {}), **data}}
+        )
+        return dict(record['data'])
+
+    async def _get_record(self, name: str) -> tuple[int | None, dict]:
+        """Запись merged-раскладки: состояние и данные приходят одним запросом"""
+        return await self._read(self.fsm_bucket, self.kv_fsm, name, {})
+
+    async def _read(self, bucket: str, kv: KeyValue, name: str, default: Any) -> tuple[int | None, Any]:
+        """Значение ключа из локального кэша или из KV.
+
+        Без watch merged-запись помнится record_ttl, чтобы несколько
+        обращений к FSM за один апдейт читали KV один раз: записи в ней
+        проверяются по ревизии, и устаревшая копия не затрёт чужое
+        изменение. Пока watch следит за бакетом, кэш верен до истечения
+        ключа по TTL бакета - изменения с других узлов вытесняют записи из него.
+        """
+        cache_key = (bucket, name)
+        cached = self._cache.get(cache_key)
+        if cached is not None and cached[2] > time.monotonic():
+            self._cache.move_to_end(cache_key)
+            return cached[0], cached[1]
         try:
-            entry = await self.kv_data.get(self._key_builder.build(key))
-            return ormsgpack.unpackb(entry.value)
+            entry = await kv.get(name)
         except NotFoundError:
-            return {}
- 
+            revision, value, written_at = None, default, None
+        else:
+            revision = entry.revision
+            value = ormsgpack.unpackb(entry.value) if entry.value else default
+            written_at = self._written_at(cache_key, revision, entry.created)
+        self._remember(cache_key, revision, value, written_at)
+        return revision, value
+
+    def _written_at(self, cache_key: CacheKey, revision: int, created: datetime | int | None) -> float | None:
+        """Время записи ревизии: из самой записи или из watch, который её уже видел"""
+        if created is not None:
+            return _timestamp(created)
+        seen = self._seen.get(cache_key)
+        if seen is not None and seen[0] == revision:
+            return seen[1]
+        return None
+
+    def _cache_ttl(self, bucket: str, revision: int | None, written_at: float | None) -> float:
+        if bucket in self._watching:
+            bucket_ttl = self.bucket_ttls[bucket]
+            # Отсутствующий ключ истечь не может, а его создание придёт из watch
+            if not bucket_ttl or revision is None:
+                return float('inf')
+            # Истечение по TTL бакета в watch не приходит - кэш живёт не дольше
+            # самого ключа, а TTL ключа отсчитывается от его последней записи
+            if written_at is not None:
+                return bucket_ttl - (time.time() - written_at)
+            # Когда ключ записан, неизвестно - верим ему столько же, сколько без watch
+        return self.record_ttl if self.layout == MERGED_LAYOUT else 0.0
+
+    def _remember(
+        self,
+        cache_key: CacheKey,
+        revision: int | None,
+        value: Any,
+        written_at: float | None = None
+    ) -> None:
+        ttl = self._cache_ttl(cache_key[0], revision, written_at)
+        seen = self._seen.get(cache_key)
+        if ttl <= 0 or (seen is not None and (revision or 0) < seen[0]):
+            self._cache.pop(cache_key, None)
+            return
+        self._cache[cache_key] = (revision, value, time.monotonic() + ttl)
+        self._cache.move_to_end(cache_key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    async def _modify(self, key: StorageKey, change: Callable[[dict], dict]) -> dict:
+        name = self._key_builder.build(key)
+        cache_key = (self.fsm_bucket, name)
+        for _ in range(self.max_retries):
+            revision, record = await self._get_record(name)
+            record = change(record)
+            payload = ormsgpack.packb(record)
+            written_at = time.time()
+            try:
+                if revision is None:
+                    revision = await self.kv_fsm.create(name, payload)
+                else:
+                    revision = await self.kv_fsm.update(name, payload, last=revision)
+            except KeyWrongLastSequenceError:
+                # Запись изменили после нашего чтения - перечитываем и применяем изменение заново
+                self._cache.pop(cache_key, None)
+                continue
+            self._remember(cache_key, revision, record, written_at)
+            return record
+        raise RuntimeError(f"FSM record {name} is changing too often, gave up after {self.max_retries} attempts")
+
+    async def _watch(self, bucket: str, kv: KeyValue) -> None:
+        """Вытесняет из кэша ключи бакета, изменённые другими узлами"""
+        while True:
+            watcher = None
+            try:
+                # Только метаданные: для инвалидации хватает ключа и ревизии
+                watcher = await kv.watchall(meta_only=True)
+                self._watching.add(bucket)
+                while True:
+                    entry = await watcher.updates(timeout=None)
+                    if entry is not None:
+                        self._invalidate((bucket, entry.key), entry.revision, _timestamp(entry.created))
+            except asyncio.CancelledError:
+                if watcher is not None:
+                    await watcher.stop()
+                raise
+            except Exception as e:
+                logger.error(f"Error watching FSM bucket {bucket}: {e}")
+                # Пока watch не восстановлен, изменения других узлов не видны - кэшу бакета не верим
+                self._watching.discard(bucket)
+                for cache_key in [cache_key for cache_key in self._cache if cache_key[0] == bucket]:
+                    del self._cache[cache_key]
+                await asyncio.sleep(1)
+
+    def _invalidate(self, cache_key: CacheKey, revision: int, written_at: float | None = None) -> None:
+        seen = self._seen.get(cache_key)
+        if seen is None or seen[0] < revision:
+            self._seen[cache_key] = (revision, written_at)
+        self._seen.move_to_end(cache_key)
+        while len(self._seen) > self.cache_size:
+            self._seen.popitem(last=False)
+
+        cached = self._cache.get(cache_key)
+        # Своя запись возвращается из watch с той же ревизией, что уже в кэше
+        if cached is not None and (cached[0] or 0) < revision:
+            del self._cache[cache_key]
+
+    async def _scan(self, bucket: str) -> AsyncIterator[Msg]:
+        """Последние сообщения всех ключей бакета - вместе с временем записи"""
+        sub = await self.js.subscribe(
+            f"$KV.{bucket}.>",
+            ordered_consumer=True,
+            deliver_policy=DeliverPolicy.LAST_PER_SUBJECT
+        )
+        try:
+            while True:
+                try:
+                    msg = await sub.next_msg(timeout=self.scan_timeout)
+                except NatsTimeoutError:
+                    return  # Бакет пуст
+                yield msg
+                if msg.metadata.num_pending == 0:
+                    return
+        finally:
+            await sub.unsubscribe()
+
+    async def purge_abandoned(self, states: Collection[str], idle: float) -> int:
+        """Сбрасывает состояние ключей, которые больше idle секунд стоят в одном из states.
+
+        Удаление проверяется по ревизии: если пользователь успел сделать
+        следующий шаг, его ключ не трогается. Данные (имя, телефон) остаются.
+        """
+        bucket = self.fsm_bucket if self.layout == MERGED_LAYOUT else self.fsm_states_bucket
+        kv = self._buckets()[bucket]
+        prefix = f"$KV.{bucket}."
+        now = datetime.now(timezone.utc)
+        purged = 0
+
+        async for msg in self._scan(bucket):
+            if (msg.headers or {}).get('KV-Operation') in ('DEL', 'PURGE') or not msg.data:
+                continue
+            if (now - msg.metadata.timestamp).total_seconds() < idle:
+                continue
+            value = ormsgpack.unpackb(msg.data)
+            state = value.get('state') if self.layout == MERGED_LAYOUT else value
+            if state not in states:
+                continue
+
+            name = msg.subject[len(prefix):]
+            revision = msg.metadata.sequence.stream
+            try:
+                if self.layout == MERGED_LAYOUT:
+                    await kv.update(name, ormsgpack.packb({**value, 'state': None}), last=revision)
+                else:
+                    await kv.delete(name, last=revision)
+            except KeyWrongLastSequenceError:
+                continue
+            self._cache.pop((bucket, name), None)
+            purged += 1
+
+        if purged:
+            logger.info(f"Reset {purged} FSM states idle for more than {idle:.0f}s in {bucket}")
+        return purged
+
+    async def stats(self) -> dict[str, dict[str, Any]]:
+        """Число ключей и объём каждого бакета FSM и заполненность локального кэша"""
+        result = {}
+        for bucket, kv in self._buckets().items():
+            status = await kv.status()
+            result[bucket] = {
+                # При history=1 на ключ приходится одно сообщение (значение или метка удаления)
+                'keys': status.values,
+                'bytes': status.stream_info.state.bytes,
+                'history': status.history,
+                'ttl': status.ttl,
+            }
+        result['local_cache'] = {
+            'keys': len(self._cache),
+            'max_keys': self.cache_size,
+            'watching': sorted(self._watching),
+        }
+        return result
+
     async def close(self) -> None:
-        await self.nc.close()
\ No newline at end of file
+        for task in self._watch_tasks:
+            task.cancel()
+        await self.nc.close()
@@ -0,0 +1,144 @@
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+import ormsgpack
+from aiogram.filters.state import StateType
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import (
+    BaseStorage,
+    DefaultKeyBuilder,
+    KeyBuilder,
+    StorageKey,
+)
+from redis.asyncio import Redis
+
+# Запись данных, если с момента чтения версия ключа не менялась. Возвращает новую версию или -1
+UPDATE_DATA_SCRIPT = """
+local version = redis.call('HGET', KEYS[1], 'v') or ''
+if version ~= ARGV[1] then
+    return -1
+end
+redis.call('HSET', KEYS[1], 'data', ARGV[2])
+local new_version = redis.call('HINCRBY', KEYS[1], 'v', 1)
+if tonumber(ARGV[3]) > 0 then
+    redis.call('PEXPIRE', KEYS[1], ARGV[3])
+end
+return new_version
+"""
+
+
+class RedisStorage(BaseStorage):
+    """Хранилище FSM в Redis: состояние и данные - поля одного хеша.
+
+    get_state и get_data читают оба поля одним HMGET, и несколько обращений
+    к FSM за один апдейт обходятся одним запросом: запись помнится
+    record_ttl. Запись состояния или данных - одна транзакция (MULTI/EXEC),
+    update_data - один вызов скрипта, который сверяет версию ключа и не
+    даёт устаревшей копии затереть чужое изменение.
+    """
+
+    def __init__(
+        self,
+        redis: Redis,
+        key_builder: Optional[KeyBuilder] = None,
+        ttl: float | None = None,
+        record_ttl: float = 1.0,
+        cache_size: int = 10_000,
+        max_retries: int = 5
+    ) -> None:
+        if key_builder is None:
+            key_builder = DefaultKeyBuilder()
+        self.redis = redis
+        self.ttl = ttl
+        self.record_ttl = record_ttl
+        self.cache_size = cache_size
+        self.max_retries = max_retries
+        self._key_builder = key_builder
+        self._update_data = redis.register_script(UPDATE_DATA_SCRIPT)
+        # Последние прочитанные записи: ключ -> (версия, состояние, данные, до какого момента верить)
+        self._records: OrderedDict[str, tuple[bytes, Optional[str], dict, float]] = OrderedDict()
+
+    @property
+    def _ttl_ms(self) -> int:
+        return int(self.ttl * 1000) if self.ttl else 0
+
+    async def _get_record(self, name: str) -> tuple[bytes, Optional[str], dict]:
+        remembered = self._records.get(name)
+        if remembered is not None and remembered[3] > time.monotonic():
+            return remembered[0], remembered[1], remembered[2]
+        state, data, version = await self.redis.hmget(name, 'state', 'data', 'v')
+        record = (
+            version or b'',
+            ormsgpack.unpackb(state) if state else None,
+            ormsgpack.unpackb(data) if data else {}
+        )
+        self._remember(name, *record)
+        return record
+
+    def _remember(self, name: str, version: bytes, state: Optional[str], data: dict) -> None:
+        self._records[name] = (version, state, data, time.monotonic() + self.record_ttl)
+        self._records.move_to_end(name)
+        while len(self._records) > self.cache_size:
+            self._records.popitem(last=False)
+
+    async def _write(self, name: str, field: str, value: Any) -> int:
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.hset(name, field, ormsgpack.packb(value))
+        pipe.hincrby(name, 'v', 1)
+        if self._ttl_ms:
+            pipe.pexpire(name, self._ttl_ms)
+        results = await pipe.execute()
+        return results[1]
+
+    def _after_write(self, name: str, version: int, field: str, value: Any) -> None:
+        remembered = self._records.pop(name, None)
+        # Вторая половина записи осталась прежней, только если между чтением и записью никто не писал
+        if remembered is None or remembered[3] <= time.monotonic() or int(remembered[0] or 0) != version - 1:
+            return
+        _, state, data, _ = remembered
+        if field == 'state':
+            state = value
+        else:
+            data = value
+        self._remember(name, str(version).encode(), state, data)
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        state = state.state if isinstance(state, State) else state
+        name = self._key_builder.build(key)
+        version = await self._write(name, 'state', state or None)
+        self._after_write(name, version, 'state', state or None)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        _, state, _ = await self._get_record(self._key_builder.build(key))
+        return state
+
+    async def set_data(self, key: StorageKey, data: dict[str, Any]) -> None:
+        name = self._key_builder.build(key)
+        version = await self._write(name, 'data', data)
+        self._after_write(name, version, 'data', dict(data))
+
+    async def get_data(self, key: StorageKey) -> dict[str, Any]:
+        _, _, data = await self._get_record(self._key_builder.build(key))
+        return dict(data)
+
+    async def update_data(self, key: StorageKey, data: dict[str, Any]) -> dict[str, Any]:
+        name = self._key_builder.build(key)
+        for _ in range(self.max_retries):
+            version, state, current = await self._get_record(name)
+            updated = {**current, **data}
+            new_version = await self._update_data(
+                keys=[name],
+                args=[version, ormsgpack.packb(updated), self._ttl_ms],
+                client=self.redis
+            )
+            if new_version == -1:
+                # Ключ изменили после нашего чтения - перечитываем и применяем изменение заново
+                self._records.pop(name, None)
+                continue
+            self._remember(name, str(new_version).encode(), state, updated)
+            return dict(updated)
+        raise RuntimeError(f"FSM record {name} is changing too often, gave up after {self.max_retries} attempts")
+
+    async def close(self) -> None:
+        await self.redis.aclose()
@@ -0,0 +1,146 @@
+import asyncio
+import logging
+import time
+from typing import Self
+
+import ormsgpack
+from nats.js import JetStreamContext
+from nats.js.api import KeyValueConfig
+from nats.js.errors import KeyWrongLastSequenceError, NotFoundError
+from nats.js.kv import KeyValue
+
+logger = logging.getLogger(__name__)
+
+
+class SlotHoldService:
+    """Временное удержание ячеек (дата, стол, время начала), пока пользователь оформляет бронь.
+
+    Ячейка захватывается атомарно через kv.create, удержание само истекает
+    через hold_ttl: у бакета history=1 и TTL, поэтому у каждого ключа одно
+    сообщение, которое живёт hold_ttl с последней записи. Чтобы фильтр
+    доступности не ходил в NATS, бакет зеркалируется в память через watch.
+    """
+
+    def __init__(
+        self,
+        js: JetStreamContext,
+        bucket: str = 'slot_holds',
+        hold_ttl: float = 300.0
+    ) -> None:
+        self.js = js
+        self.bucket = bucket
+        self.hold_ttl = hold_ttl
+        # Ключ -> (ревизия, значение удержания)
+        self._holds: dict[str, tuple[int, dict]] = {}
+        self._watch_task: asyncio.Task | None = None
+
+    async def create(self) -> Self:
+        self.kv = await self._get_kv_holds()
+        watcher = await self.kv.watchall()
+        self._watch_task = asyncio.create_task(self._watch(watcher))
+        return self
+
+    async def _get_kv_holds(self) -> KeyValue:
+        return await self.js.create_key_value(
+            config=KeyValueConfig(
+                bucket=self.bucket,
+                history=1,
+                ttl=self.hold_ttl,
+                storage='memory'
+            )
+        )
+
+    async def _watch(self, watcher) -> None:
+        while True:
+            try:
+                entry = await watcher.updates(timeout=None)
+            except asyncio.CancelledError:
+                await watcher.stop()
+                raise
+            except Exception as e:
+                logger.error(f"Error watching slot holds: {e}")
+                await asyncio.sleep(1)
+                continue
+            if entry is None:
+                continue  # Начальные значения загружены
+            current = self._holds.get(entry.key)
+            if current and current[0] > entry.revision:
+                continue  # Своя запись уже учтена, watch отстаёт
+            if entry.operation in ('DEL', 'PURGE') or not entry.value:
+                self._holds.pop(entry.key, None)
+            else:
+                self._holds[entry.key] = (entry.revision, ormsgpack.unpackb(entry.value))
+
+    @staticmethod
+    def _key(date_str: str, table_id: int, start_time: str) -> str:
+        return f"{date_str}.{table_id}.{start_time.replace(':', '')}"
+
+    def held_by_others(self, date_str: str, user_id: int) -> set[tuple[int, str]]:
+        """Ячейки (стол, время начала) на дату, удержанные другими пользователями"""
+        now = time.time()
+        return {
+            (hold['table_id'], hold['start_time'])
+            for _, hold in self._holds.values()
+            if hold['date'] == date_str and hold['user_id'] != user_id and hold['expires_at'] > now
+        }
+
+    async def _hold_cell(self, key: str, value: dict) -> bool:
+        payload = ormsgpack.packb(value)
+        try:
+            revision = await self.kv.create(key, payload)
+        except KeyWrongLastSequenceError:
+            pass
+        else:
+            # Зеркало обновится через watch позже - release должен видеть удержание сразу
+            self._holds[key] = (revision, value)
+            return True
+
+        # Ключ уже есть: продлеваем своё удержание или перехватываем истёкшее
+        try:
+            entry = await self.kv.get(key)
+        except NotFoundError:
+            return False
+        current = ormsgpack.unpackb(entry.value) if entry.value else None
+        if current and current['user_id'] != value['user_id'] and current['expires_at'] > time.time():
+            return False
+        try:
+            revision = await self.kv.update(key, payload, last=entry.revision)
+        except KeyWrongLastSequenceError:
+            return False
+        self._holds[key] = (revision, value)
+        return True
+
+    async def hold(self, date_str: str, table_id: int, start_times: list[str], user_id: int) -> bool:
+        """Удерживает ячейки стола за пользователем; False - если хоть одна занята другим"""
+        expires_at = time.time() + self.hold_ttl
+        acquired = []
+        for start_time in start_times:
+            key = self._key(date_str, table_id, start_time)
+            value = {
+                'user_id': user_id,
+                'date': date_str,
+                'table_id': table_id,
+                'start_time': start_time,
+                'expires_at': expires_at
+            }
+            if not await self._hold_cell(key, value):
+                await self._delete(acquired)
+                return False
+            acquired.append(key)
+        return True
+
+    async def release(self, user_id: int) -> None:
+        """Снимает все удержания пользователя"""
+        await self._delete([key for key, (_, hold) in self._holds.items() if hold['user_id'] == user_id])
+
+    async def _delete(self, keys: list[str]) -> None:
+        for key in keys:
+            self._holds.pop(key, None)
+            try:
+                await self.kv.delete(key)
+            except Exception as e:
+                logger.error(f"Error releasing slot hold {key}: {e}")
+
+    async def close(self) -> None:
+        if self._watch_task:
+            self._watch_task.cancel()
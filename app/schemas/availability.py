@@ -0,0 +1,75 @@
+from dataclasses import dataclass
+from typing import Collection, Mapping
+
+
+def trailing_ones(value: int) -> int:
+    """Количество единичных младших битов подряд"""
+    return (value ^ (value + 1)).bit_length() - 1
+
+
+@dataclass(frozen=True, slots=True)
+class DayAvailability:
+    """Свободные слоты одной даты: по маске на стол, бит i - свободен ли слот i"""
+    slots_count: int
+    free_masks: tuple[int, ...]
+
+    @classmethod
+    def from_busy(cls, busy: list[list[bool]]) -> 'DayAvailability':
+        slots_count = len(busy[0]) if busy else 0
+        return cls(
+            slots_count=slots_count,
+            free_masks=tuple(
+                sum(1 << slot for slot, is_busy in enumerate(table) if not is_busy)
+                for table in busy
+            )
+        )
+
+    def is_free(self, table_idx: int, slot: int) -> bool:
+        return bool(self.free_masks[table_idx] >> slot & 1)
+
+    def free_run(self, table_idx: int, slot: int) -> int:
+        """Количество свободных слотов подряд, начиная со slot"""
+        return trailing_ones(self.free_masks[table_idx] >> slot)
+
+    def free_mask(self, tables: list[int] | range | None = None) -> int:
+        """Слоты, в которые свободен хотя бы один из столов"""
+        mask = 0
+        for table_idx in tables if tables is not None else range(len(self.free_masks)):
+            mask |= self.free_masks[table_idx]
+        return mask
+
+    def free_slots(self, tables: list[int] | range | None = None) -> list[int]:
+        mask = self.free_mask(tables)
+        return [slot for slot in range(self.slots_count) if mask >> slot & 1]
+
+    def has_free_slots(self) -> bool:
+        return self.free_mask() != 0
+
+    def best_table(self, slot: int) -> tuple[int, int] | None:
+        """Стол с самым длинным свободным интервалом от slot: (индекс стола, длина)"""
+        best = None
+        for table_idx in range(len(self.free_masks)):
+            run = self.free_run(table_idx, slot)
+            if run and (best is None or run > best[1]):
+                best = (table_idx, run)
+        return best
+
+    def with_slots(self, table_idx: int, start_slot: int, end_slot: int, busy: bool) -> 'DayAvailability':
+        """Копия с занятыми (или освобождёнными) слотами стола с start_slot по end_slot"""
+        bits = ((1 << (end_slot - start_slot + 1)) - 1) << start_slot
+        masks = list(self.free_masks)
+        masks[table_idx] = masks[table_idx] & ~bits if busy else masks[table_idx] | bits
+        return DayAvailability(self.slots_count, tuple(masks))
+
+    def with_day(self, busy: bool) -> 'DayAvailability':
+        full = 0 if busy else (1 << self.slots_count) - 1
+        return DayAvailability(self.slots_count, (full,) * len(self.free_masks))
+
+    def without_held(self, held: Collection[tuple[int, str]], start_slots: Mapping[str, int]) -> 'DayAvailability':
+        """Копия, в которой удержанные другими пользователями ячейки (стол, время начала) заняты"""
+        masks = list(self.free_masks)
+        for table_id, start_time in held:
+            slot = start_slots.get(start_time)
+            if slot is not None and 1 <= table_id <= len(masks):
+                masks[table_id - 1] &= ~(1 << slot)
+        return DayAvailability(self.slots_count, tuple(masks))
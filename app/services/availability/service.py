@@ -0,0 +1,143 @@
+import logging
+from datetime import date, datetime, time, timedelta
+from typing import Collection
+
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.infrastructure.database.repositories.blocked_day_repository import BlockedDayRepository
+from app.infrastructure.database.repositories.booking_repository import BookingRepository
+from app.infrastructure.google.sheet_grid import SLOTS_COUNT, TABLES_COUNT
+from app.infrastructure.google.sheets_service import GoogleSheetsService
+from app.schemas.availability import DayAvailability
+
+logger = logging.getLogger(__name__)
+
+MINUTES_IN_DAY = 24 * 60
+
+
+def _minutes(value: time) -> int:
+    return value.hour * 60 + value.minute
+
+
+class DbAvailabilityService:
+    """Доступность столов по таблице bookings и blocked_days.
+
+    Методы возвращают те же структуры, что и GoogleSheetsService,
+    поэтому хендлеры могут работать с любым из источников.
+    """
+
+    def __init__(
+        self,
+        async_session_maker: async_sessionmaker,
+        first_slot: str = '14:00',
+        slots_count: int = SLOTS_COUNT,
+        slot_minutes: int = 60,
+        tables_count: int = TABLES_COUNT,
+        days_ahead: int = 14
+    ):
+        self.async_session_maker = async_session_maker
+        self.slot_minutes = slot_minutes
+        self.tables_count = tables_count
+        self.days_ahead = days_ahead
+
+        self._first_slot = _minutes(datetime.strptime(first_slot, '%H:%M').time())
+        self.start_times = tuple(self._slot_time(slot) for slot in range(slots_count))
+        self.end_times = tuple(self._slot_time(slot + 1) for slot in range(slots_count))
+        self.start_slots = {start: slot for slot, start in enumerate(self.start_times)}
+
+    def _slot_time(self, slot: int) -> str:
+        minutes = (self._first_slot + slot * self.slot_minutes) % MINUTES_IN_DAY
+        return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+    def _offset(self, value: time) -> int:
+        """Минуты от начала первого слота рабочего дня (слоты после полуночи - в том же дне)"""
+        return (_minutes(value) - self._first_slot) % MINUTES_IN_DAY
+
+    def _booking_slots(self, start_time: time, end_time: time) -> range:
+        start = self._offset(start_time)
+        end = self._offset(end_time)
+        if end <= start:
+            end += MINUTES_IN_DAY
+        first = start // self.slot_minutes
+        last = -(-end // self.slot_minutes)  # Округление вверх
+        return range(first, min(last, len(self.start_times)))
+
+    async def _load_days(self, date_from: date, date_to: date) -> dict[date, DayAvailability]:
+        async with self.async_session_maker() as session:
+            bookings = await BookingRepository(session).get_active_booking_times(date_from, date_to)
+            blocked = await BlockedDayRepository(session).get_blocked_days(date_from, date_to)
+
+        days = {}
+        day = date_from
+        while day <= date_to:
+            is_blocked = day in blocked
+            days[day] = [[is_blocked] * len(self.start_times) for _ in range(self.tables_count)]
+            day += timedelta(days=1)
+
+        for table_id, booking_date, start_time, end_time in bookings:
+            if not 1 <= table_id <= self.tables_count:
+                continue
+            busy = days[booking_date][table_id - 1]
+            for slot in self._booking_slots(start_time, end_time):
+                busy[slot] = True
+        return {day: DayAvailability.from_busy(busy) for day, busy in days.items()}
+
+    async def _load_day(self, date_str: str) -> DayAvailability:
+        day = datetime.strptime(date_str, '%d.%m.%y').date()
+        return (await self._load_days(day, day))[day]
+
+    async def get_available_dates(self) -> list:
+        today = datetime.now().date()
+        days = await self._load_days(today, today + timedelta(days=self.days_ahead - 1))
+        return [
+            {'date': day.strftime('%d.%m.%y'), 'weekday': day.strftime('%A')}
+            for day, availability in days.items()
+            if availability.has_free_slots()
+        ]
+
+    async def get_available_times(
+        self,
+        selected_date: str,
+        table_preference: str = 'random',
+        held: Collection[tuple[int, str]] = ()
+    ) -> list:
+        availability = (await self._load_day(selected_date)).without_held(held, self.start_slots)
+        tables = None if table_preference == 'random' else [int(table_preference) - 1]
+        return [self.start_times[slot] for slot in availability.free_slots(tables)]
+
+    async def get_best_table_and_end_times(
+        self,
+        date_str: str,
+        start_time: str,
+        held: Collection[tuple[int, str]] = ()
+    ) -> tuple[int, list[str]]:
+        start_slot = self.start_slots.get(start_time)
+        if start_slot is None:
+            return None, []
+
+        availability = (await self._load_day(date_str)).without_held(held, self.start_slots)
+        best = availability.best_table(start_slot)
+        if best is None:
+            return None, []
+
+        table_idx, max_hours = best
+        return table_idx + 1, list(self.end_times[start_slot:start_slot + max_hours])
+
+    async def get_available_end_times_for_table(
+        self,
+        date_str: str,
+        start_time: str,
+        table_id: int,
+        held: Collection[tuple[int, str]] = ()
+    ) -> list[str]:
+        start_slot = self.start_slots.get(start_time)
+        if start_slot is None:
+            return []
+
+        availability = (await self._load_day(date_str)).without_held(held, self.start_slots)
+        free_hours = availability.free_run(table_id - 1, start_slot)
+        return list(self.end_times[start_slot:start_slot + free_hours])
+
+
+# Любой из источников доступности, которые хендлеры получают как availability_service
+AvailabilityService = GoogleSheetsService | DbAvailabilityService
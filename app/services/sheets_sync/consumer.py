@@ -0,0 +1,219 @@
+import asyncio
+import logging
+from collections import OrderedDict
+
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.infrastructure.database.repositories.booking_repository import BookingRepository
+from app.infrastructure.google.request_scheduler import is_transient_error
+from app.infrastructure.google.sheet_grid import SheetCells
+from app.infrastructure.google.sheets_service import GoogleSheetsService
+from app.services.sheets_sync.models.sync_events import SheetsSyncEvent
+from app.services.sheets_sync.models.actions import SheetsSyncAction
+from nats.aio.client import Client
+from nats.aio.msg import Msg
+from nats.js import JetStreamContext
+
+logger = logging.getLogger(__name__)
+
+# Сколько строк листа (дата, стол) помнить последнюю применённую позицию
+MAX_TRACKED_ROWS = 10_000
+
+
+class SheetsSyncConsumer():
+    def __init__(
+        self,
+        nc: Client,
+        js: JetStreamContext,
+        sheets_service: GoogleSheetsService,
+        subject: str,
+        stream: str,
+        durable_name: str,
+        flush_interval: float = 1.0,
+        max_batch: int = 100,
+        retry_delay: float = 5.0,
+        max_deliver: int = 10,
+        max_retry_delay: float = 60.0,
+        async_session_maker: async_sessionmaker | None = None
+    ) -> None:
+        self.nc = nc
+        self.js = js
+        self.sheets_service = sheets_service
+        self.subject = subject
+        self.stream = stream
+        self.durable_name = durable_name
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.retry_delay = retry_delay
+        self.max_deliver = max_deliver
+        self.max_retry_delay = max_retry_delay
+        self.async_session_maker = async_session_maker
+        self.stream_sub = None
+        self._pending: list[tuple[SheetsSyncEvent, Msg]] = []
+        self._flush_requested = asyncio.Event()
+        self._flush_task: asyncio.Task | None = None
+        # События одной строки листа (дата, стол) применяются строго по порядку
+        # стрима: их ячейки могут пересекаться. Для строки помнится последняя
+        # применённая позиция - повторная доставка старого события её не затрёт -
+        # и позиции, возвращённые в стрим, пока они не применены
+        self._applied_seq: OrderedDict[tuple[str, int], int] = OrderedDict()
+        self._outstanding: dict[tuple[str, int], set[int]] = {}
+        # Возвраты в стрим, которые не считаются попытками: событие ждало
+        # более раннее событие строки или Sheets были недоступны
+        self._free_naks: dict[int, int] = {}
+
+    async def start(self) -> None:
+        self.stream_sub = await self.js.subscribe(
+            subject=self.subject,
+            stream=self.stream,
+            cb=self.on_message,
+            durable=self.durable_name,
+            manual_ack=True
+        )
+        self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def on_message(self, msg: Msg):
+        if msg.headers.get('Sheets-Sync-Type') not in {action.value for action in SheetsSyncAction}:
+            raise Exception('Unknown Msg Type')
+
+        self._pending.append((SheetsSyncEvent.from_payload(msg.data), msg))
+        if len(self._pending) >= self.max_batch:
+            self._flush_requested.set()
+
+    async def _flush_loop(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_requested.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_requested.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.exception(f"Error flushing sheets sync batch: {e}")
+
+    async def flush(self) -> None:
+        pending, self._pending = self._pending, []
+        if not pending:
+            return
+
+        rows: dict[tuple[str, int], list[tuple[SheetsSyncEvent, Msg]]] = {}
+        for event, msg in sorted(pending, key=lambda item: item[1].metadata.sequence.stream):
+            rows.setdefault(event.row_key, []).append((event, msg))
+
+        for row_key, events in rows.items():
+            await self._flush_row(row_key, events)
+
+    async def _flush_row(self, row_key: tuple[str, int], events: list[tuple[SheetsSyncEvent, Msg]]) -> None:
+        outstanding = self._outstanding.setdefault(row_key, set())
+        # Из событий с одними и теми же ячейками применяется только последнее:
+        # оно всё равно перезапишет их целиком
+        latest = {event.cells_key: msg for event, msg in events}
+        stopped = False
+        for event, msg in events:
+            seq = msg.metadata.sequence.stream
+            if latest[event.cells_key] is not msg:
+                outstanding.discard(seq)
+                self._free_naks.pop(seq, None)
+                await msg.ack()
+                continue
+
+            if seq not in outstanding and seq <= self._applied_seq.get(row_key, 0):
+                # Повторная доставка уже применённого события
+                self._free_naks.pop(seq, None)
+                await msg.ack()
+                continue
+
+            # Пока более раннее событие строки не применено, следующие ждут его
+            if stopped or any(other < seq for other in outstanding):
+                outstanding.add(seq)
+                self._free_naks[seq] = self._free_naks.get(seq, 0) + 1
+                await msg.nak(delay=self.retry_delay)
+                continue
+
+            try:
+                applied = await self._apply(event)
+            except Exception as e:
+                if not is_transient_error(e):
+                    logger.exception(f"Error syncing {event} to sheets: {e}")
+                    applied = False
+                else:
+                    # Sheets недоступны - событие ждёт, попытка не считается
+                    free_naks = self._free_naks.get(seq, 0)
+                    delay = min(self.max_retry_delay, self.retry_delay * 2 ** min(free_naks, 16))
+                    logger.warning(f"Sheets unavailable, retrying {event} in {delay:.0f}s: {e}")
+                    stopped = True
+                    outstanding.add(seq)
+                    self._free_naks[seq] = free_naks + 1
+                    await msg.nak(delay=delay)
+                    continue
+
+            if applied:
+                outstanding.discard(seq)
+                self._free_naks.pop(seq, None)
+                self._set_applied(row_key, seq)
+                await msg.ack()
+                continue
+
+            attempts = msg.metadata.num_delivered - self._free_naks.get(seq, 0)
+            if attempts >= self.max_deliver:
+                logger.error(f"Giving up syncing {event} to sheets after {attempts} attempts")
+                outstanding.discard(seq)
+                self._free_naks.pop(seq, None)
+                await msg.term()
+                continue
+
+            stopped = True
+            outstanding.add(seq)
+            await msg.nak(delay=self.retry_delay)
+
+        if not outstanding:
+            del self._outstanding[row_key]
+
+    def _set_applied(self, row_key: tuple[str, int], seq: int) -> None:
+        self._applied_seq[row_key] = max(seq, self._applied_seq.get(row_key, 0))
+        self._applied_seq.move_to_end(row_key)
+        while len(self._applied_seq) > MAX_TRACKED_ROWS:
+            self._applied_seq.popitem(last=False)
+
+    async def _apply(self, event: SheetsSyncEvent) -> bool:
+        # Обе операции идемпотентны: ячейки перезаписываются целиком. False -
+        # события некуда применить (нет даты или времени в листе), ошибки
+        # Sheets API пробрасываются
+        if event.action == SheetsSyncAction.BOOK:
+            cells = await self.sheets_service.write_booking(
+                date_str=event.date_str,
+                start_time=event.start_time,
+                end_time=event.end_time,
+                table_id=event.table_id,
+                client_name=event.client_name,
+                client_phone=event.client_phone
+            )
+            if cells is not None and event.booking_id and self.async_session_maker is not None:
+                await self._save_cells(event.booking_id, cells)
+            return cells is not None
+        return await self.sheets_service.clear_booking(
+            date_str=event.date_str,
+            start_time=event.start_time,
+            end_time=event.end_time,
+            table_id=event.table_id,
+            cells=event.cells
+        )
+
+    async def _save_cells(self, booking_id: int, cells: SheetCells) -> None:
+        # Ячейки в листе уже записаны, без координат отмена просто найдёт их поиском
+        try:
+            async with self.async_session_maker() as session:
+                await BookingRepository(session).set_sheet_cells(
+                    booking_id, cells.row, cells.start_col, cells.end_col, cells.layout
+                )
+        except Exception as e:
+            logger.error(f"Error saving sheet cells for booking {booking_id}: {e}")
+
+    async def unsubscribe(self) -> None:
+        if self._flush_task:
+            self._flush_task.cancel()
+        if self.stream_sub:
+            await self.flush()
+            await self.stream_sub.unsubscribe()
+            logger.info('Consumer unsubscribed')
@@ -0,0 +1,6 @@
+from enum import Enum
+
+
+class SheetsSyncAction(str, Enum):
+    BOOK = "book"
+    CANCEL = "cancel"
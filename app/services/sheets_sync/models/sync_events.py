@@ -0,0 +1,72 @@
+from dataclasses import asdict, dataclass
+
+import ormsgpack
+
+from app.infrastructure.google.sheet_grid import SheetCells
+from app.services.sheets_sync.models.actions import SheetsSyncAction
+
+
+@dataclass
+class SheetsSyncEvent:
+    action: SheetsSyncAction
+    date_str: str
+    start_time: str
+    end_time: str
+    table_id: int
+    client_name: str = ''
+    client_phone: str = ''
+    booking_id: int | None = None
+    # Сохранённые ячейки брони: отмена по ним пишет в лист без чтения
+    sheet_row: int | None = None
+    sheet_start_col: int | None = None
+    sheet_end_col: int | None = None
+    sheet_layout: str | None = None
+
+    @classmethod
+    def cancel(cls, booking) -> 'SheetsSyncEvent':
+        """Событие отмены брони из БД вместе с её сохранёнными ячейками"""
+        return cls(
+            action=SheetsSyncAction.CANCEL,
+            date_str=booking.booking_date.strftime('%d.%m.%y'),
+            start_time=booking.start_time.strftime('%H:%M'),
+            end_time=booking.end_time.strftime('%H:%M'),
+            table_id=booking.table_id,
+            booking_id=booking.id,
+            sheet_row=booking.sheet_row,
+            sheet_start_col=booking.sheet_start_col,
+            sheet_end_col=booking.sheet_end_col,
+            sheet_layout=booking.sheet_layout
+        )
+
+    @property
+    def cells(self) -> SheetCells | None:
+        if self.sheet_row is None or self.sheet_start_col is None or self.sheet_end_col is None:
+            return None
+        return SheetCells(self.sheet_row, self.sheet_start_col, self.sheet_end_col, self.sheet_layout or '')
+
+    @property
+    def row_key(self) -> tuple[str, int]:
+        """Строка листа: дата и стол"""
+        return self.date_str, self.table_id
+
+    @property
+    def cells_key(self) -> tuple[str, int, str, str]:
+        """Ключ ячеек листа, которые затрагивает событие"""
+        return self.date_str, self.table_id, self.start_time, self.end_time
+
+    @property
+    def msg_id(self) -> str:
+        """Идентификатор для дедупликации повторных публикаций в JetStream"""
+        return (
+            f"{self.action.value}:{self.booking_id or ''}:{self.date_str}:"
+            f"{self.table_id}:{self.start_time}-{self.end_time}"
+        )
+
+    def to_payload(self) -> bytes:
+        return ormsgpack.packb(asdict(self))
+
+    @classmethod
+    def from_payload(cls, payload: bytes):
+        data = ormsgpack.unpackb(payload)
+        data['action'] = SheetsSyncAction(data['action'])
+        return cls(**data)
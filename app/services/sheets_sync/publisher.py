@@ -0,0 +1,14 @@
+from app.services.sheets_sync.models.sync_events import SheetsSyncEvent
+from nats.js.client import JetStreamContext
+
+
+async def publish_sheets_sync(
+    js: JetStreamContext,
+    event: SheetsSyncEvent,
+    subject: str
+) -> None:
+    headers = {
+        'Sheets-Sync-Type': event.action.value,
+        'Nats-Msg-Id': event.msg_id,
+    }
+    await js.publish(subject=subject, payload=event.to_payload(), headers=headers)
@@ -0,0 +1,34 @@
+import logging
+
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.infrastructure.google.sheets_service import GoogleSheetsService
+from app.services.sheets_sync.consumer import SheetsSyncConsumer
+
+from nats.aio.client import Client
+from nats.js.client import JetStreamContext
+
+logger = logging.getLogger(__name__)
+
+
+async def start_sheets_sync_consumer(
+    nc: Client,
+    js: JetStreamContext,
+    sheets_service: GoogleSheetsService,
+    subject: str,
+    stream: str,
+    durable_name: str,
+    async_session_maker: async_sessionmaker | None = None
+) -> SheetsSyncConsumer:
+    consumer = SheetsSyncConsumer(
+        nc=nc,
+        js=js,
+        sheets_service=sheets_service,
+        subject=subject,
+        stream=stream,
+        durable_name=durable_name,
+        async_session_maker=async_session_maker
+    )
+    logger.info('Start sheets sync consumer')
+    await consumer.start()
+    return consumer
@@ -0,0 +1,86 @@
+import asyncio
+import logging
+
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+from nats.aio.client import Client
+from nats.aio.msg import Msg
+from nats.js import JetStreamContext
+from nats.js.api import ConsumerConfig
+
+logger = logging.getLogger(__name__)
+
+
+class UpdateWorkerConsumer():
+    """Обрабатывает апдейты своей партиции через dp.feed_update.
+
+    max_ack_pending=1: следующий апдейт партиции приходит только после
+    подтверждения предыдущего, поэтому апдейты одного чата не обгоняют
+    друг друга даже при повторной доставке. Пока апдейт обрабатывается,
+    воркер продлевает ack_wait через in_progress: долгий хендлер (запросы
+    к Sheets) не приводит к повторной доставке, а апдейт упавшего воркера
+    доставляется снова через ack_wait.
+    """
+
+    def __init__(
+        self,
+        nc: Client,
+        js: JetStreamContext,
+        dp: Dispatcher,
+        bot: Bot,
+        subject: str,
+        stream: str,
+        durable_name: str,
+        ack_wait: float = 120.0,
+        max_deliver: int = 5
+    ) -> None:
+        self.nc = nc
+        self.js = js
+        self.dp = dp
+        self.bot = bot
+        self.subject = subject
+        self.stream = stream
+        self.durable_name = durable_name
+        self.ack_wait = ack_wait
+        self.max_deliver = max_deliver
+        self.stream_sub = None
+
+    async def start(self) -> None:
+        self.stream_sub = await self.js.subscribe(
+            subject=self.subject,
+            stream=self.stream,
+            cb=self.on_message,
+            durable=self.durable_name,
+            manual_ack=True,
+            config=ConsumerConfig(
+                max_ack_pending=1,
+                ack_wait=self.ack_wait,
+                max_deliver=self.max_deliver
+            )
+        )
+
+    async def on_message(self, msg: Msg):
+        update = Update.model_validate_json(msg.data, context={'bot': self.bot})
+        heartbeat = asyncio.create_task(self._keep_in_progress(msg))
+        try:
+            await self.dp.feed_update(self.bot, update)
+        except Exception as e:
+            # Как при поллинге: ошибка хендлера не останавливает очередь чата
+            logger.exception(f"Error processing update {update.update_id}: {e}")
+        finally:
+            heartbeat.cancel()
+        await msg.ack()
+
+    async def _keep_in_progress(self, msg: Msg) -> None:
+        # Сообщаем серверу, что апдейт ещё обрабатывается, заметно раньше ack_wait
+        while True:
+            await asyncio.sleep(self.ack_wait / 3)
+            try:
+                await msg.in_progress()
+            except Exception as e:
+                logger.warning(f"Error extending ack wait: {e}")
+
+    async def unsubscribe(self) -> None:
+        if self.stream_sub:
+            await self.stream_sub.unsubscribe()
+            logger.info('Consumer unsubscribed')
@@ -0,0 +1,66 @@
+import asyncio
+import logging
+
+from aiogram import Bot
+from nats.js import JetStreamContext
+
+from app.services.update_router.utils.partition import partition_subject
+
+logger = logging.getLogger(__name__)
+
+
+class UpdateIngress():
+    """Получает апдейты из Telegram и раскладывает их по партициям в JetStream.
+
+    Сам апдейты не обрабатывает: партиция выбирается по id чата, каждую
+    читает ровно один воркер. Offset сдвигается только после подтверждения
+    публикации, а повторная публикация после рестарта отбрасывается стримом
+    по Nats-Msg-Id.
+    """
+
+    def __init__(
+        self,
+        bot: Bot,
+        js: JetStreamContext,
+        subject: str,
+        partitions: int,
+        polling_timeout: int = 30,
+        retry_delay: float = 5.0
+    ) -> None:
+        self.bot = bot
+        self.js = js
+        self.subject = subject
+        self.partitions = partitions
+        self.polling_timeout = polling_timeout
+        self.retry_delay = retry_delay
+        self.offset: int | None = None
+
+    async def run(self) -> None:
+        logger.info(f"Start update ingress for {self.partitions} partitions")
+        while True:
+            try:
+                updates = await self.bot.get_updates(offset=self.offset, timeout=self.polling_timeout)
+            except Exception as e:
+                logger.error(f"Error getting updates: {e}")
+                await asyncio.sleep(self.retry_delay)
+                continue
+
+            for update in updates:
+                await self.publish(update)
+                self.offset = update.update_id + 1
+
+    async def publish(self, update) -> None:
+        subject = partition_subject(self.subject, update, self.partitions)
+        payload = update.model_dump_json(exclude_unset=True).encode()
+        while True:
+            try:
+                await self.js.publish(
+                    subject=subject,
+                    payload=payload,
+                    headers={'Nats-Msg-Id': str(update.update_id)}
+                )
+                return
+            except Exception as e:
+                # Без публикации offset не сдвигается - апдейт не теряется
+                logger.error(f"Error publishing update {update.update_id} to {subject}: {e}")
+                await asyncio.sleep(self.retry_delay)
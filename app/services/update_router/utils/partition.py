@@ -0,0 +1,18 @@
+from aiogram.types import CallbackQuery, Update
+
+
+def partition_key(update: Update) -> int:
+    """Id чата апдейта (или пользователя, если чата нет) - по нему выбирается партиция"""
+    event = update.event
+    chat = getattr(event, 'chat', None)
+    if chat is None and isinstance(event, CallbackQuery) and event.message:
+        chat = event.message.chat
+    if chat is not None:
+        return chat.id
+    user = getattr(event, 'from_user', None)
+    return user.id if user else update.update_id
+
+
+def partition_subject(prefix: str, update: Update, partitions: int) -> str:
+    # Все апдейты одного чата попадают в один сабджект и обрабатываются одним воркером по порядку
+    return f"{prefix}.{partition_key(update) % partitions}"
@@ -0,0 +1,37 @@
+import logging
+
+from aiogram import Bot, Dispatcher
+
+from app.services.update_router.consumer import UpdateWorkerConsumer
+
+from nats.aio.client import Client
+from nats.js.client import JetStreamContext
+
+logger = logging.getLogger(__name__)
+
+
+async def start_update_worker(
+    nc: Client,
+    js: JetStreamContext,
+    dp: Dispatcher,
+    bot: Bot,
+    subject: str,
+    stream: str,
+    worker_id: int,
+    ack_wait: float = 120.0,
+    max_deliver: int = 5
+) -> UpdateWorkerConsumer:
+    consumer = UpdateWorkerConsumer(
+        nc=nc,
+        js=js,
+        dp=dp,
+        bot=bot,
+        subject=f"{subject}.{worker_id}",
+        stream=stream,
+        durable_name=f"update_worker_{worker_id}",
+        ack_wait=ack_wait,
+        max_deliver=max_deliver
+    )
+    logger.info(f'Start update worker for partition {worker_id}')
+    await consumer.start()
+    return consumer
@@ -5,7 +5,8 @@ from aiogram.types import CallbackQuery, Message
 from datetime import datetime, timedelta
 
 from app.tgbot.handlers.navigation import back_to_main
-from app.tgbot.utils.booking import get_available_dates
+from app.tgbot.utils.booking import get_available_dates, sync_booking_to_sheets
+from app.tgbot.utils.pagination import decode_cursor, encode_cursor
 from config.config import settings
 from logging import getLogger
 
@@ -14,12 +15,18 @@ from app.tgbot.states.booking import BookingStates
 from app.tgbot.keyboards.booking import (
     get_admin_menu_inline_keyboard, 
     get_all_bookings_keyboard, 
+    get_bookings_date_filter_keyboard,
+    get_bookings_table_filter_keyboard,
     get_dates_keyboard,
     get_back_to_admin_menu_keyboard
 )
 from app.infrastructure.database.repositories.booking_repository import BookingRepository
+from app.infrastructure.database.repositories.blocked_day_repository import BlockedDayRepository
 from app.infrastructure.google.sheets_service import GoogleSheetsService
+from app.services.availability.service import AvailabilityService
 from app.schemas.booking import BookingFilter, BookingStatus
+from app.services.sheets_sync.models.sync_events import SheetsSyncEvent
+from nats.js.client import JetStreamContext
 
 admin_router = Router()
 logger = getLogger(__name__)
@@ -30,9 +37,9 @@ admin_router.message.filter(IsAdmin())
 async def handle_block_day(
     callback: CallbackQuery,
     state: FSMContext,
-    sheets_service: GoogleSheetsService
+    availability_service: AvailabilityService
 ):
-    available_dates = await get_available_dates(sheets_service)
+    available_dates = await get_available_dates(availability_service)
     await state.set_state(BookingStates.waiting_for_block_day)
     await callback.message.edit_text(
         "Выберите день для блокировки:",
@@ -43,7 +50,8 @@ async def handle_block_day(
 async def process_block_day(
     callback: CallbackQuery,
     state: FSMContext,
-    sheets_service: GoogleSheetsService
+    sheets_service: GoogleSheetsService,
+    blocked_day_repository: BlockedDayRepository
 ):
     if callback.data == "back_to_main":
         await back_to_main(callback, state)
@@ -51,8 +59,11 @@ async def process_block_day(
 
     selected_date = callback.data.replace('date_', '')
     
-    # Блокируем все слоты на выбранный день
+    # Блокируем все слоты на выбранный день. Сначала лист: если он недоступен,
+    # день не должен оказаться заблокированным только в базе
     success = await sheets_service.block_day_in_sheets(selected_date)
+    if success:
+        await blocked_day_repository.block_days([datetime.strptime(selected_date, '%d.%m.%y').date()])
     
     if success:
         await callback.message.edit_text(
@@ -65,21 +76,36 @@ async def process_block_day(
             reply_markup=get_admin_menu_inline_keyboard()
         )
 
-@admin_router.callback_query(lambda c: c.data == "manage_bookings")
-async def handle_manage_bookings(
+async def show_bookings_page(
     callback: CallbackQuery,
     state: FSMContext,
-    booking_repository: BookingRepository
+    booking_repository: BookingRepository,
+    after: str | None = None,
+    before: str | None = None
 ):
-    # Получаем все активные брони
+    """Одна страница активных броней с учётом фильтров из состояния"""
+    data = await state.get_data()
+    filter_date = data.get('bookings_filter_date')
+    filter_table = data.get('bookings_filter_table')
+    
     filters = BookingFilter(
         date_from=datetime.now().date(),
-        status=BookingStatus.ACTIVE
+        status=BookingStatus.ACTIVE,
+        table_id=filter_table
     )
+    if filter_date:
+        day = datetime.strptime(filter_date, '%d.%m.%y').date()
+        filters.date_from = filters.date_to = day
     
-    bookings = await booking_repository.get_bookings(filters)
+    page = await booking_repository.get_bookings_page(
+        filters,
+        after=decode_cursor(after) if after else None,
+        before=decode_cursor(before) if before else None,
+        limit=settings.admin.get('BOOKINGS_PAGE_SIZE', 8)
+    )
+    filters_active = bool(filter_date or filter_table)
     
-    if not bookings:
+    if not page.bookings and not filters_active:
         await callback.message.edit_text(
             "Нет активных броней.",
             reply_markup=get_admin_menu_inline_keyboard()
@@ -87,11 +113,103 @@ async def handle_manage_bookings(
         return
     
     await state.set_state(BookingStates.admin_manage_bookings)
+    
+    title = "Все активные брони"
+    if filter_date:
+        title += f" на {filter_date}"
+    if filter_table:
+        title += f", стол {filter_table}"
+    text = f"{title}:\nВыберите бронь для отмены:" if page.bookings else f"{title}:\nБроней не найдено."
+    
     await callback.message.edit_text(
-        "Все активные брони:\nВыберите бронь для отмены:",
-        reply_markup=get_all_bookings_keyboard(bookings)
+        text,
+        reply_markup=get_all_bookings_keyboard(
+            page.bookings,
+            prev_cursor=encode_cursor(page.bookings[0]) if page.has_prev else None,
+            next_cursor=encode_cursor(page.bookings[-1]) if page.has_next else None,
+            filters_active=filters_active
+        )
     )
 
+@admin_router.callback_query(lambda c: c.data == "manage_bookings")
+async def handle_manage_bookings(
+    callback: CallbackQuery,
+    state: FSMContext,
+    booking_repository: BookingRepository
+):
+    await state.update_data(bookings_filter_date=None, bookings_filter_table=None)
+    await show_bookings_page(callback, state, booking_repository)
+
+@admin_router.callback_query(
+    BookingStates.admin_manage_bookings,
+    lambda c: c.data.startswith("admin_page:")
+)
+async def handle_bookings_page(
+    callback: CallbackQuery,
+    state: FSMContext,
+    booking_repository: BookingRepository
+):
+    direction, _, cursor = callback.data.replace('admin_page:', '').partition(':')
+    if direction == 'next':
+        await show_bookings_page(callback, state, booking_repository, after=cursor)
+    elif direction == 'prev':
+        await show_bookings_page(callback, state, booking_repository, before=cursor)
+    else:
+        await show_bookings_page(callback, state, booking_repository)
+
+@admin_router.callback_query(
+    BookingStates.admin_manage_bookings,
+    lambda c: c.data.startswith("admin_filter:")
+)
+async def handle_bookings_filter(
+    callback: CallbackQuery,
+    state: FSMContext,
+    booking_repository: BookingRepository
+):
+    action = callback.data.replace('admin_filter:', '')
+    
+    if action == 'date':
+        dates = await booking_repository.get_active_booking_dates(
+            datetime.now().date(),
+            limit=settings.availability.get('DAYS_AHEAD', 14)
+        )
+        await callback.message.edit_text(
+            "Выберите дату:",
+            reply_markup=get_bookings_date_filter_keyboard(dates)
+        )
+    elif action == 'table':
+        await callback.message.edit_text(
+            "Выберите стол:",
+            reply_markup=get_bookings_table_filter_keyboard()
+        )
+    else:
+        await state.update_data(bookings_filter_date=None, bookings_filter_table=None)
+        await show_bookings_page(callback, state, booking_repository)
+
+@admin_router.callback_query(
+    BookingStates.admin_manage_bookings,
+    lambda c: c.data.startswith("admin_filter_date:")
+)
+async def handle_bookings_filter_date(
+    callback: CallbackQuery,
+    state: FSMContext,
+    booking_repository: BookingRepository
+):
+    await state.update_data(bookings_filter_date=callback.data.replace('admin_filter_date:', ''))
+    await show_bookings_page(callback, state, booking_repository)
+
+@admin_router.callback_query(
+    BookingStates.admin_manage_bookings,
+    lambda c: c.data.startswith("admin_filter_table:")
+)
+async def handle_bookings_filter_table(
+    callback: CallbackQuery,
+    state: FSMContext,
+    booking_repository: BookingRepository
+):
+    await state.update_data(bookings_filter_table=int(callback.data.replace('admin_filter_table:', '')))
+    await show_bookings_page(callback, state, booking_repository)
+
 @admin_router.callback_query(
     BookingStates.admin_manage_bookings,
     lambda c: c.data.startswith("admin_cancel:")
@@ -100,7 +218,9 @@ async def handle_admin_cancel_booking(
     callback: CallbackQuery,
     state: FSMContext,
     booking_repository: BookingRepository,
-    sheets_service: GoogleSheetsService
+    sheets_service: GoogleSheetsService,
+    js: JetStreamContext | None = None,
+    sheets_sync_subject: str | None = None
 ):
     booking_id = int(callback.data.replace('admin_cancel:', ''))
     booking = await booking_repository.get_booking(booking_id)
@@ -116,11 +236,12 @@ async def handle_admin_cancel_booking(
     await booking_repository.update_booking_status(booking_id, BookingStatus.CANCELLED)
     
     # Очищаем ячейки в Google Sheets
-    await sheets_service.clear_booking_in_sheets(
-        date_str=booking.booking_date.strftime('%d.%m.%y'),
-        start_time=booking.start_time.strftime('%H:%M'),
-        end_time=booking.end_time.strftime('%H:%M'),
-        table_id=booking.table_id
+    await sync_booking_to_sheets(
+        sheets_service,
+        # Ячейки брони сохранены при записи - очистка не читает лист
+        SheetsSyncEvent.cancel(booking),
+        js=js,
+        subject=sheets_sync_subject
     )
     
     await callback.message.edit_text(
@@ -155,12 +276,12 @@ async def process_admin_client_name(
 async def process_admin_client_phone(
     message: Message,
     state: FSMContext,
-    sheets_service: GoogleSheetsService
+    availability_service: AvailabilityService
 ):
     phone = message.text.strip()
     await state.update_data(client_phone=phone)
     
-    available_dates = await get_available_dates(sheets_service)
+    available_dates = await get_available_dates(availability_service)
     if not available_dates:
         await message.answer(
             "На ближайшие дни все занято!",
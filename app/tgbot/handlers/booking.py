@@ -5,11 +5,15 @@ from aiogram import Router
 from aiogram.filters import CommandStart
 from aiogram.fsm.context import FSMContext
 from aiogram.types import Message, CallbackQuery, FSInputFile, InlineKeyboardMarkup, InlineKeyboardButton, InputMediaPhoto
+from nats.js.client import JetStreamContext
 from app.tgbot.handlers.admin import handle_admin_booking
 from app.tgbot.handlers.navigation import back_to_main
-from app.infrastructure.database.repositories.booking_repository import BookingRepository
-from app.infrastructure.database.repositories.client_repository import ClientRepository
+from app.infrastructure.database.repositories.booking_repository import BookingConflictError, BookingRepository
+from app.infrastructure.database.repositories.unit_of_work import UnitOfWork
+from app.infrastructure.database.repositories.blocked_day_repository import BlockedDayRepository
 from app.infrastructure.google.sheets_service import GoogleSheetsService
+from app.infrastructure.storage.storage.slot_holds import SlotHoldService
+from app.services.availability.service import AvailabilityService
 from app.schemas.booking import BookingCreate, BookingFilter, BookingStatus
 from app.tgbot.keyboards.booking import (
     get_dates_keyboard, 
@@ -21,7 +25,9 @@ from app.tgbot.keyboards.booking import (
     get_table_preference_keyboard
 )
 from app.tgbot.states.booking import BookingStates
-from app.tgbot.utils.booking import get_available_dates, get_available_times
+from app.services.sheets_sync.models.actions import SheetsSyncAction
+from app.services.sheets_sync.models.sync_events import SheetsSyncEvent
+from app.tgbot.utils.booking import get_available_dates, get_available_times, sync_booking_to_sheets
 from app.tgbot.utils.date_helpers import format_date_with_weekday
 from config.config import settings
 from app.schemas.client import ClientCreate
@@ -48,7 +54,7 @@ async def start_cmd(message: Message, state: FSMContext):
 async def handle_booking_callback(
     callback: CallbackQuery, 
     state: FSMContext,
-    sheets_service: GoogleSheetsService
+    availability_service: AvailabilityService
 ):
     user_data = await state.get_data()
     
@@ -59,7 +65,7 @@ async def handle_booking_callback(
 
     if user_data.get('client_name'):
         await state.set_state(BookingStates.waiting_for_date)
-        available_dates = await get_available_dates(sheets_service)
+        available_dates = await get_available_dates(availability_service)
         await callback.message.edit_text(
             f"С возвращением, {user_data['client_name']}!\n\nВыбери день:",
             reply_markup=get_dates_keyboard(available_dates)
@@ -76,7 +82,7 @@ async def handle_booking_callback(
 async def process_name(
     message: Message, 
     state: FSMContext,
-    sheets_service: GoogleSheetsService
+    availability_service: AvailabilityService
 ):
     try:
         # Создаем временный объект для валидации имени
@@ -103,7 +109,7 @@ async def process_name(
             return
 
         # Обычный процесс для не-админа
-        available_dates = await get_available_dates(sheets_service)
+        available_dates = await get_available_dates(availability_service)
         
         if not available_dates:
             await message.answer(
@@ -129,7 +135,7 @@ async def process_name(
 async def process_date(
     callback: CallbackQuery, 
     state: FSMContext,
-    sheets_service: GoogleSheetsService
+    availability_service: AvailabilityService
 ):
     if callback.data == "back_to_main":
         await back_to_main(callback, state)
@@ -160,10 +166,11 @@ async def process_date(
 async def process_table_preference(
     callback: CallbackQuery,
     state: FSMContext,
-    sheets_service: GoogleSheetsService
+    availability_service: AvailabilityService,
+    slot_holds: SlotHoldService | None = None
 ):
     if callback.data == "back_to_dates":
-        await back_to_dates(callback, state, sheets_service)
+        await back_to_dates(callback, state, availability_service)
         return
 
     table_pref = callback.data.replace('table_pref:', '')
@@ -174,7 +181,9 @@ async def process_table_preference(
     selected_date = state_data['selected_date']
     
     # Получаем доступное время с учетом предпочтительного стола
-    available_times = await get_available_times(sheets_service, selected_date, table_pref)
+    # и ячеек, которые сейчас оформляют другие пользователи
+    held = slot_holds.held_by_others(selected_date, state.key.user_id) if slot_holds else ()
+    available_times = await get_available_times(availability_service, selected_date, table_pref, held)
     
     if not available_times:
         await callback.message.edit_text(
@@ -194,31 +203,34 @@ async def process_table_preference(
 async def process_start_time(
     callback: CallbackQuery,
     state: FSMContext,
-    sheets_service: GoogleSheetsService
+    availability_service: AvailabilityService,
+    slot_holds: SlotHoldService | None = None
 ):
     if callback.data == "back_to_dates":
-        await back_to_dates(callback, state, sheets_service)
+        await back_to_dates(callback, state, availability_service)
         return
         
     start_time = callback.data.replace('time:', '')
     state_data = await state.get_data()
     is_admin = state_data.get('is_admin', False)
     table_preference = state_data.get('table_preference')
-    
+    held = slot_holds.held_by_others(state_data['selected_date'], state.key.user_id) if slot_holds else ()
     
     if table_preference == 'random':
-        best_table, available_end_times = await sheets_service.get_best_table_and_end_times(
+        best_table, available_end_times = await availability_service.get_best_table_and_end_times(
             state_data['selected_date'],
-            start_time
+            start_time,
+            held
         )
     else:
         # Преобразуем строку с номером стола в число
         requested_table = int(table_preference)
         # Проверяем доступность конкретного стола
-        available_end_times = await sheets_service.get_available_end_times_for_table(
+        available_end_times = await availability_service.get_available_end_times_for_table(
             state_data['selected_date'],
             start_time,
-            requested_table
+            requested_table,
+            held
         )
         best_table = requested_table if available_end_times else None
     
@@ -228,10 +240,21 @@ async def process_start_time(
             reply_markup=get_admin_menu_inline_keyboard() if is_admin else get_main_menu_inline_keyboard()
         )
         return
+
+    # Держим стартовый слот, пока пользователь выбирает окончание и вводит телефон
+    if slot_holds and not await slot_holds.hold(
+        state_data['selected_date'], best_table, [start_time], state.key.user_id
+    ):
+        await callback.message.edit_text(
+            "Ой, это время только что выбрал кто-то другой 😔 Выбери другое время:",
+            reply_markup=get_admin_menu_inline_keyboard() if is_admin else get_main_menu_inline_keyboard()
+        )
+        return
     
     await state.update_data(
         start_time=start_time,
-        table_id=best_table
+        table_id=best_table,
+        end_times=available_end_times
     )
     
     await state.set_state(BookingStates.waiting_for_end_time)
@@ -245,22 +268,41 @@ async def process_end_time(
     callback: CallbackQuery,
     state: FSMContext,
     sheets_service: GoogleSheetsService,
+    availability_service: AvailabilityService,
     booking_repository: BookingRepository,
-    client_repository: ClientRepository
+    unit_of_work: UnitOfWork,
+    js: JetStreamContext | None = None,
+    sheets_sync_subject: str | None = None,
+    slot_holds: SlotHoldService | None = None
 ):
     # Проверяем навигационные команды
     if callback.data == "back_to_start_time":
-        await back_to_start_time(callback, state, sheets_service)
+        await back_to_start_time(callback, state, availability_service, slot_holds)
         return
         
     end_time = callback.data.replace('end_time:', '')
     await state.update_data(end_time=end_time)
     
     user_data = await state.get_data()
+
+    # Расширяем удержание на все часы брони
+    if slot_holds:
+        end_times = user_data.get('end_times') or []
+        covered = end_times[:end_times.index(end_time)] if end_time in end_times else []
+        if not await slot_holds.hold(
+            user_data['selected_date'], user_data['table_id'], [user_data['start_time']] + covered,
+            state.key.user_id
+        ):
+            await callback.answer("Часть этого времени только что заняли, выбери другое 🙏", show_alert=True)
+            await back_to_start_time(callback, state, availability_service, slot_holds)
+            return
     
     # Проверяем, есть ли уже сохраненный телефон
     if user_data.get('client_phone'):
-        await process_booking(callback.message, state, sheets_service, booking_repository, client_repository)
+        await process_booking(
+            callback.message, state, sheets_service, booking_repository, unit_of_work,
+            js, sheets_sync_subject, slot_holds
+        )
     else:
         # Если телефона нет, запрашиваем его
         await state.set_state(BookingStates.waiting_for_phone)
@@ -274,7 +316,10 @@ async def process_phone(
     state: FSMContext,
     sheets_service: GoogleSheetsService,
     booking_repository: BookingRepository,
-    client_repository: ClientRepository
+    unit_of_work: UnitOfWork,
+    js: JetStreamContext | None = None,
+    sheets_sync_subject: str | None = None,
+    slot_holds: SlotHoldService | None = None
 ):
     try:
         state_data = await state.get_data()
@@ -287,7 +332,10 @@ async def process_phone(
         )
         
         await state.update_data(client_phone=client.phone)
-        await process_booking(message, state, sheets_service, booking_repository, client_repository)
+        await process_booking(
+            message, state, sheets_service, booking_repository, unit_of_work,
+            js, sheets_sync_subject, slot_holds
+        )
         
     except ValidationError as e:
         await message.answer(
@@ -301,62 +349,56 @@ async def process_booking(
     state: FSMContext,
     sheets_service: GoogleSheetsService,
     booking_repository: BookingRepository,
-    client_repository: ClientRepository
+    unit_of_work: UnitOfWork,
+    js: JetStreamContext | None = None,
+    sheets_sync_subject: str | None = None,
+    slot_holds: SlotHoldService | None = None
 ):
     try:
         booking_data = await state.get_data()
-        
-        # Сначала проверяем, существует ли клиент
-        existing_client = await client_repository.get_client_by_phone(phone=booking_data.get('client_phone'))
         # Преобразуем строку даты в объект datetime
         visit_date = datetime.strptime(booking_data['selected_date'], '%d.%m.%y')
         is_admin = booking_data.get('is_admin', False)
-
-        if not existing_client:
-            
-
-            # Если клиент новый - создаем запись
-            client = await client_repository.create_client(
-                name=booking_data['client_name'],
-                phone=booking_data['client_phone'],
-                visit_date=visit_date
-            )
-            client_id = client.id
-        else:
-            # Обновляем дату последнего посещения
-            await client_repository.update_visit_date(
-                client_id=existing_client.id,
-                visit_date=visit_date
-            )
-            client_id = existing_client.id
         
         # Преобразуем строки в объекты date и time
-        booking_date = datetime.strptime(booking_data['selected_date'], '%d.%m.%y').date()
+        booking_date = visit_date.date()
         start_time = datetime.strptime(booking_data['start_time'], '%H:%M').time()
         end_time = datetime.strptime(booking_data['end_time'], '%H:%M').time()
-        
-        # Создаем объект бронирования
-        booking = BookingCreate(
-            table_id=booking_data['table_id'],
-            client_name=booking_data['client_name'],
-            client_id=client_id,
-            client_phone=booking_data['client_phone'],
-            booking_date=booking_date,
-            start_time=start_time,
-            end_time=end_time
-        )
 
-        # Сохраняем бронирование
-        await booking_repository.create_booking(booking)
+        # Клиент и бронь сохраняются в одной транзакции с одним коммитом
+        async with unit_of_work as uow:
+            # Новый клиент создаётся, у существующего обновляется дата посещения
+            client_id = await uow.clients.upsert_client(
+                name=booking_data['client_name'],
+                phone=booking_data['client_phone'],
+                visit_date=visit_date
+            )
+            db_booking = await uow.bookings.create_booking(BookingCreate(
+                table_id=booking_data['table_id'],
+                client_name=booking_data['client_name'],
+                client_id=client_id,
+                client_phone=booking_data['client_phone'],
+                booking_date=booking_date,
+                start_time=start_time,
+                end_time=end_time
+            ))
 
         # Обновляем Google Sheets
-        sheets_updated = await sheets_service.update_booking_in_sheets(
-            date_str=booking_data['selected_date'],
-            start_time=booking_data['start_time'],
-            end_time=booking_data['end_time'],
-            table_id=booking_data['table_id'],
-            client_name=booking_data['client_name'],
-            client_phone=booking_data['client_phone']
+        sheets_updated = await sync_booking_to_sheets(
+            sheets_service,
+            SheetsSyncEvent(
+                action=SheetsSyncAction.BOOK,
+                date_str=booking_data['selected_date'],
+                start_time=booking_data['start_time'],
+                end_time=booking_data['end_time'],
+                table_id=booking_data['table_id'],
+                client_name=booking_data['client_name'],
+                client_phone=booking_data['client_phone'],
+                booking_id=db_booking.id
+            ),
+            js=js,
+            subject=sheets_sync_subject,
+            booking_repository=booking_repository
         )
 
         if not sheets_updated:
@@ -416,6 +458,18 @@ async def process_booking(
                 reply_markup=get_main_menu_inline_keyboard()
             )
         
+    except BookingConflictError as e:
+        user_data = await state.get_data()
+        is_admin = user_data.get('is_admin', False)
+
+        await state.set_state(BookingStates.waiting_for_action)
+        await message.answer(
+            "Ой, пока ты оформлял(а) бронь, этот стол на это время уже заняли 😔\n"
+            "Выбери, пожалуйста, другое время.",
+            reply_markup=get_admin_menu_inline_keyboard() if is_admin else get_main_menu_inline_keyboard()
+        )
+        logger.info(f"Booking conflict: {e}")
+
     except Exception as e:
         user_data = await state.get_data()
         is_admin = user_data.get('is_admin', False)
@@ -427,11 +481,16 @@ async def process_booking(
         )
         logger.error(f"Error creating booking: {e}")
     
+    # Бронь создана или не удалась - удержание больше не нужно
+    if slot_holds:
+        await slot_holds.release(state.key.user_id)
+
     # Не очищаем состояние полностью, а только убираем данные бронирования
     await state.update_data(
         selected_date=None,
         start_time=None,
         end_time=None,
+        end_times=None,
         table_id=None
     )
 
@@ -451,9 +510,9 @@ async def back_to_main(callback: CallbackQuery, state: FSMContext):
 async def back_to_dates(
     callback: CallbackQuery, 
     state: FSMContext,
-    sheets_service: GoogleSheetsService
+    availability_service: AvailabilityService
 ):
-    available_dates = await get_available_dates(sheets_service)
+    available_dates = await get_available_dates(availability_service)
     await state.set_state(BookingStates.waiting_for_date)
     # Получаем данные о статусе админа для кнопки "назад"
     user_data = await state.get_data()
@@ -468,11 +527,17 @@ async def back_to_dates(
 async def back_to_start_time(
     callback: CallbackQuery, 
     state: FSMContext,
-    sheets_service: GoogleSheetsService
+    availability_service: AvailabilityService,
+    slot_holds: SlotHoldService | None = None
 ):
     state_data = await state.get_data()
     table_pref = state_data.get('table_preference', 'random')  # Get the stored table preference
-    available_times = await get_available_times(sheets_service, state_data['selected_date'], table_pref)
+    held = ()
+    if slot_holds:
+        # Время выбирается заново - отпускаем прежнее удержание
+        await slot_holds.release(state.key.user_id)
+        held = slot_holds.held_by_others(state_data['selected_date'], state.key.user_id)
+    available_times = await get_available_times(availability_service, state_data['selected_date'], table_pref, held)
     
     await state.set_state(BookingStates.waiting_for_start_time)
     # Получаем данные о статусе админа для кнопки "назад"
@@ -508,7 +573,7 @@ async def handle_my_bookings(
     )
     
     # Получаем брони пользователя
-    bookings = await booking_repository.get_bookings(filters)
+    bookings = await booking_repository.get_booking_items(filters)
     
     if not bookings:
         await callback.message.edit_text(
@@ -525,7 +590,7 @@ async def handle_my_bookings(
         message_text += (
             f"📅 {date_str} ({weekday_ru})\n"
             f"🕒 {booking.start_time.strftime('%H:%M')} - {booking.end_time.strftime('%H:%M')}\n"
-            f"🎱 Стол: {booking.table.name}\n\n"
+            f"🎱 Стол: {booking.table_name}\n\n"
         )
     
     message_text += "Хочешь забронировать ещё?"
@@ -556,7 +621,7 @@ async def handle_cancel_booking(
         status=BookingStatus.ACTIVE
     )
     
-    bookings = await booking_repository.get_bookings(filters)
+    bookings = await booking_repository.get_booking_items(filters)
     
     if not bookings:
         await callback.message.edit_text(
@@ -576,7 +641,9 @@ async def handle_booking_cancellation(
     callback: CallbackQuery,
     state: FSMContext,
     booking_repository: BookingRepository,
-    sheets_service: GoogleSheetsService
+    sheets_service: GoogleSheetsService,
+    js: JetStreamContext | None = None,
+    sheets_sync_subject: str | None = None
 ):
     if callback.data == "back_to_main":
         await back_to_main(callback, state)
@@ -597,11 +664,12 @@ async def handle_booking_cancellation(
     await booking_repository.update_booking_status(booking_id, BookingStatus.CANCELLED)
     
     # Обновляем Google Sheets (очищаем ячейки)
-    await sheets_service.clear_booking_in_sheets(
-        date_str=booking.booking_date.strftime('%d.%m.%y'),
-        start_time=booking.start_time.strftime('%H:%M'),
-        end_time=booking.end_time.strftime('%H:%M'),
-        table_id=booking.table_id
+    await sync_booking_to_sheets(
+        sheets_service,
+        # Ячейки брони сохранены при записи - очистка не читает лист
+        SheetsSyncEvent.cancel(booking),
+        js=js,
+        subject=sheets_sync_subject
     )
     
     date_str, weekday_ru = format_date_with_weekday(booking.booking_date.strftime('%d.%m.%y'))
@@ -621,29 +689,15 @@ async def handle_unblock_day(
     sheets_service: GoogleSheetsService
 ):
     # Получаем доступные даты (все даты из таблицы)
-    data = await sheets_service.get_sheet_data()
-    available_dates = []
-    
-    if not data or len(data) < 3:
+    try:
+        available_dates = await sheets_service.get_all_dates()
+    except Exception as e:
+        logger.error(f"Error getting dates from sheets: {e}")
         await callback.message.edit_text(
             "Не удалось получить даты из таблицы.",
             reply_markup=get_admin_menu_inline_keyboard()
         )
         return
-        
-    # Получаем все даты из первого столбца
-    for idx in range(3, len(data), 4):
-        try:
-            date_cell = data[idx][0]
-            if date_cell and date_cell.strip():
-                date = datetime.strptime(date_cell, '%d.%m')
-                date = date.replace(year=datetime.now().year)
-                available_dates.append({
-                    'date': date.strftime('%d.%m.%y'),
-                    'weekday': date.strftime('%A')
-                })
-        except (ValueError, AttributeError):
-            continue
     
     if not available_dates:
         await callback.message.edit_text(
@@ -663,7 +717,8 @@ async def handle_unblock_day(
 async def process_block_unblock_day(
     callback: CallbackQuery,
     state: FSMContext,
-    sheets_service: GoogleSheetsService
+    sheets_service: GoogleSheetsService,
+    blocked_day_repository: BlockedDayRepository
 ):
     if callback.data == "back_to_main":
         await back_to_main(callback, state)
@@ -673,12 +728,19 @@ async def process_block_unblock_day(
     action = state_data.get('action', 'block')  # По умолчанию блокировка
     selected_date = callback.data.replace('date_', '')
     
+    day = datetime.strptime(selected_date, '%d.%m.%y').date()
+    
+    # Сначала лист, затем база: при ошибке Sheets оба хранилища остаются как были
     success = False
     if action == 'block':
         success = await sheets_service.block_day_in_sheets(selected_date)
+        if success:
+            await blocked_day_repository.block_days([day])
         message = "День успешно заблокирован!" if success else "Не удалось заблокировать день."
     else:  # unblock
         success = await sheets_service.unblock_day_in_sheets(selected_date)
+        if success:
+            await blocked_day_repository.unblock_days([day])
         message = "День успешно разблокирован!" if success else "Не удалось разблокировать день."
 
     await state.set_state(BookingStates.waiting_for_action)
@@ -23,9 +23,9 @@ async def back_to_main(callback: CallbackQuery, state: FSMContext):
 async def back_to_dates(
     callback: CallbackQuery, 
     state: FSMContext,
-    sheets_service
+    availability_service
 ):
-    available_dates = await get_available_dates(sheets_service)
+    available_dates = await get_available_dates(availability_service)
     await state.set_state(BookingStates.waiting_for_date)
     user_data = await state.get_data()
     keyboard = get_dates_keyboard(available_dates, is_admin=user_data.get('is_admin', False))
@@ -38,11 +38,11 @@ async def back_to_dates(
 async def back_to_start_time(
     callback: CallbackQuery, 
     state: FSMContext,
-    sheets_service
+    availability_service
 ):
     state_data = await state.get_data()
     table_pref = state_data.get('table_preference', 'random')
-    available_times = await get_available_times(sheets_service, state_data['selected_date'], table_pref)
+    available_times = await get_available_times(availability_service, state_data['selected_date'], table_pref)
     
     await state.set_state(BookingStates.waiting_for_start_time)
     keyboard = get_time_keyboard(available_times, is_admin=state_data.get('is_admin', False))
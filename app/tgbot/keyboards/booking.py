@@ -1,7 +1,9 @@
+import datetime
+
 from aiogram.types import ReplyKeyboardMarkup, KeyboardButton, InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
-from app.infrastructure.database.models.booking import Booking
+from app.infrastructure.database.repositories.booking_repository import BookingListItem
 from app.tgbot.utils.date_helpers import format_date_with_weekday
 
 def get_main_menu_inline_keyboard() -> InlineKeyboardMarkup:
@@ -98,7 +100,7 @@ def get_end_time_keyboard(available_end_times: list[str], is_admin: bool = False
     builder.adjust(3)
     return builder.as_markup()
 
-def get_cancel_booking_keyboard(bookings: list[Booking], is_admin: bool = False) -> InlineKeyboardMarkup:
+def get_cancel_booking_keyboard(bookings: list[BookingListItem], is_admin: bool = False) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     
     for booking in bookings:
@@ -141,7 +143,12 @@ def get_admin_menu_inline_keyboard() -> InlineKeyboardMarkup:
     builder.adjust(1)  # По одной кнопке в ряд
     return builder.as_markup()
 
-def get_all_bookings_keyboard(bookings: list[Booking]) -> InlineKeyboardMarkup:
+def get_all_bookings_keyboard(
+    bookings: list[BookingListItem],
+    prev_cursor: str | None = None,
+    next_cursor: str | None = None,
+    filters_active: bool = False
+) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     
     for booking in bookings:
@@ -156,12 +163,60 @@ def get_all_bookings_keyboard(bookings: list[Booking]) -> InlineKeyboardMarkup:
             callback_data=f"admin_cancel:{booking.id}"
         )
     
+    # Навигация по страницам: курсор - ключ крайней брони на текущей странице
+    nav_buttons = 0
+    if prev_cursor:
+        builder.button(text="◀️ Назад", callback_data=f"admin_page:prev:{prev_cursor}")
+        nav_buttons += 1
+    if next_cursor:
+        builder.button(text="Вперёд ▶️", callback_data=f"admin_page:next:{next_cursor}")
+        nav_buttons += 1
+    
+    builder.button(text="📅 По дате", callback_data="admin_filter:date")
+    builder.button(text="🎱 По столу", callback_data="admin_filter:table")
+    if filters_active:
+        builder.button(text="Сбросить фильтры ✖️", callback_data="admin_filter:reset")
+    
     builder.button(
         text="« Назад в меню",
         callback_data="back_to_main"
     )
     
-    builder.adjust(1)
+    sizes = [1] * len(bookings)
+    if nav_buttons:
+        sizes.append(nav_buttons)
+    sizes.append(2)
+    builder.adjust(*sizes, 1)
+    return builder.as_markup()
+
+def get_bookings_date_filter_keyboard(dates: list[datetime.date]) -> InlineKeyboardMarkup:
+    builder = InlineKeyboardBuilder()
+    
+    for day in dates:
+        date_str, weekday_ru = format_date_with_weekday(day.strftime('%d.%m.%y'))
+        builder.button(
+            text=f"{date_str} ({weekday_ru})",
+            callback_data=f"admin_filter_date:{day.strftime('%d.%m.%y')}"
+        )
+    
+    builder.button(
+        text="« Назад к броням",
+        callback_data="admin_page:first"
+    )
+    builder.adjust(2)
+    return builder.as_markup()
+
+def get_bookings_table_filter_keyboard() -> InlineKeyboardMarkup:
+    builder = InlineKeyboardBuilder()
+    builder.button(text="Леопардовый стол 🐆", callback_data="admin_filter_table:1")
+    builder.button(text="Синий стол 💙", callback_data="admin_filter_table:2")
+    builder.button(text="Зелёный стол 💚", callback_data="admin_filter_table:3")
+    builder.button(text="Красный стол ❤️", callback_data="admin_filter_table:4")
+    builder.button(
+        text="« Назад к броням",
+        callback_data="admin_page:first"
+    )
+    builder.adjust(2, 2, 1)
     return builder.as_markup()
 
 def get_back_to_admin_menu_keyboard() -> InlineKeyboardMarkup:
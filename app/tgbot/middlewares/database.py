@@ -4,32 +4,58 @@ from typing import Awaitable, Callable
 
 from aiogram import BaseMiddleware
 from aiogram.types import Update
-from psycopg import Error
-from psycopg_pool import AsyncConnectionPool
-from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.infrastructure.database.repositories.booking_repository import BookingRepository
 from app.infrastructure.database.repositories.table_repository import TableRepository
 from app.infrastructure.database.repositories.client_repository import ClientRepository
+from app.infrastructure.database.repositories.blocked_day_repository import BlockedDayRepository
+from app.infrastructure.database.repositories.unit_of_work import UnitOfWork
+from app.infrastructure.database.utils.lazy_session import LazySession
 
 logger = logging.getLogger(__name__)
 
 
 class DatabaseMiddleware(BaseMiddleware):
+    """Сессия БД и репозитории для хендлеров.
+
+    Регистрируется один раз на dp.update. Сессия открывается только при первом
+    запросе к БД, поэтому апдейты вроде навигации по меню обходятся без неё.
+    """
+
     def __init__(self, async_session_maker):
         self.async_session_maker = async_session_maker
+        self.updates_count = 0
+        self.sessions_opened = 0
         super().__init__()
 
+    def get_stats(self) -> dict[str, int]:
+        """Сколько апдейтов обработано и сколько из них открывали сессию"""
+        return {'updates': self.updates_count, 'sessions_opened': self.sessions_opened}
+
     async def __call__(
         self,
         handler: Callable[[Update, dict[str, any]], Awaitable[None]],
         event: Update,
         data: dict[str, any]
     ) -> any:
-        async with self.async_session_maker() as session:
-            data['session'] = session
-            data['booking_repository'] = BookingRepository(session)
-            data['table_repository'] = TableRepository(session)
-            data['client_repository'] = ClientRepository(session)
-            
+        session = LazySession(self.async_session_maker)
+        data['session'] = session
+        # Репозитории только хранят ссылку на сессию, их создание ничего не стоит
+        data['booking_repository'] = BookingRepository(session)
+        data['table_repository'] = TableRepository(session)
+        data['client_repository'] = ClientRepository(session)
+        data['blocked_day_repository'] = BlockedDayRepository(session)
+        data['unit_of_work'] = UnitOfWork(session)
+
+        try:
             return await handler(event, data)
+        finally:
+            self.updates_count += 1
+            if session.opened:
+                self.sessions_opened += 1
+            logger.debug(
+                f"Update {getattr(event, 'update_id', None)}: DB session "
+                f"{'opened' if session.opened else 'not used'}, "
+                f"{self.sessions_opened}/{self.updates_count} updates used the DB"
+            )
+            await session.close()
@@ -1,11 +1,19 @@
 from aiogram import BaseMiddleware
 from app.infrastructure.google.sheets_service import GoogleSheetsService
+from app.services.availability.service import DbAvailabilityService
 
 class GoogleSheetsMiddleware(BaseMiddleware):
-    def __init__(self, sheets_service: GoogleSheetsService):
+    def __init__(
+        self,
+        sheets_service: GoogleSheetsService,
+        availability_service: GoogleSheetsService | DbAvailabilityService | None = None
+    ):
         self.sheets_service = sheets_service
+        # Источник доступности: сама таблица или БД, таблица тогда только проекция
+        self.availability_service = availability_service or sheets_service
         super().__init__()
 
     async def __call__(self, handler, event, data):
         data['sheets_service'] = self.sheets_service
-        return await handler(event, data) 
\ No newline at end of file
+        data['availability_service'] = self.availability_service
+        return await handler(event, data) 
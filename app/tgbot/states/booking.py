@@ -16,4 +16,18 @@ class BookingStates(StatesGroup):
     waiting_for_block_day = State()
     admin_manage_bookings = State()
     admin_waiting_for_client_name = State()
-    admin_waiting_for_client_phone = State() 
\ No newline at end of file
+    admin_waiting_for_client_phone = State()
+
+
+# Шаги оформления брони: застрявшие на них сценарии сбрасывает задача purge_abandoned_fsm
+BOOKING_FLOW_STATES = (
+    BookingStates.waiting_for_name,
+    BookingStates.waiting_for_date,
+    BookingStates.waiting_for_table_preference,
+    BookingStates.waiting_for_start_time,
+    BookingStates.waiting_for_end_time,
+    BookingStates.waiting_for_phone,
+    BookingStates.confirm_booking,
+    BookingStates.admin_waiting_for_client_name,
+    BookingStates.admin_waiting_for_client_phone,
+)
@@ -8,7 +8,6 @@ from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from alembic import command
 from alembic.config import Config
 from sqlalchemy.sql import text
-from google.oauth2.service_account import Credentials
 
 from app.tgbot.handlers.booking import booking_router
 from app.tgbot.handlers.admin import admin_router
@@ -16,6 +15,16 @@ from app.tgbot.middlewares.database import DatabaseMiddleware
 from app.tgbot.middlewares.google_sheets import GoogleSheetsMiddleware
 from config.config import settings
 from app.infrastructure.google.sheets_service import GoogleSheetsService
+from app.services.availability.service import DbAvailabilityService
+from app.infrastructure.cache.cache.shared_cache import SharedCache
+from app.infrastructure.cache.utils.connect_to_redis import get_redis_pool
+from app.infrastructure.storage.storage.nats_storage import NatsStorage
+from app.infrastructure.storage.storage.redis_storage import RedisStorage
+from app.infrastructure.storage.storage.slot_holds import SlotHoldService
+from app.infrastructure.storage.utils.nats_connect import connect_to_nats
+from app.services.sheets_sync.utils.start_consumer import start_sheets_sync_consumer
+from app.services.update_router.publisher import UpdateIngress
+from app.services.update_router.utils.start_consumer import start_update_worker
 
 logger = logging.getLogger(__name__)
 
@@ -40,6 +49,22 @@ async def create_db_session():
     
     return async_session
 
+async def create_fsm_storage(nc, js, local_cache: bool = True) -> NatsStorage:
+    # Бакеты FSM с history и TTL из настроек; существующие бакеты перенастраиваются
+    fsm_ttl = settings.deploy.get('FSM_DATA_TTL', 0)
+    return await NatsStorage(
+        nc=nc,
+        js=js,
+        layout=settings.deploy.get('FSM_LAYOUT', 'split'),
+        local_cache=local_cache and settings.deploy.get('FSM_LOCAL_CACHE', False),
+        cache_size=settings.deploy.get('FSM_CACHE_SIZE', 10_000),
+        history=settings.deploy.get('FSM_HISTORY', 1),
+        states_ttl=settings.deploy.get('FSM_STATES_TTL', 0) or None,
+        data_ttl=fsm_ttl or None,
+        # В merged-записи лежат и данные, поэтому она живёт столько же, сколько данные
+        fsm_ttl=fsm_ttl or None
+    ).create_storage()
+
 async def main():
     try:
         # Создаем фабрику сессий БД
@@ -58,7 +83,48 @@ async def main():
         
         # Инициализация бота
         bot = Bot(token=settings.bot_token)
-        storage = MemoryStorage()
+
+        # 'polling' - один процесс; 'ingress' + N процессов 'worker' - горизонтальное масштабирование
+        mode = settings.deploy.get('MODE', 'polling')
+        fsm_storage = settings.deploy.get('FSM_STORAGE', 'memory')
+        # Несколько процессов не могут делить состояние FSM в памяти - тогда оно хранится в NATS
+        if mode != 'polling' and fsm_storage == 'memory':
+            fsm_storage = 'nats'
+
+        # Ingress и воркеры обмениваются апдейтами через JetStream при любом хранилище FSM
+        if (
+            mode != 'polling'
+            or fsm_storage == 'nats'
+            or settings.nats.get('SHEETS_SYNC_ENABLED', False)
+            or settings.nats.get('SLOT_HOLDS_ENABLED', False)
+        ):
+            nc, js = await connect_to_nats(servers=settings.nats.servers)
+
+        # Ingress только раскладывает апдейты по партициям, хендлеры ему не нужны
+        if mode == 'ingress':
+            await UpdateIngress(
+                bot=bot,
+                js=js,
+                subject=settings.deploy.get('UPDATES_SUBJECT', 'bot.updates'),
+                partitions=settings.deploy.get('WORKERS', 1)
+            ).run()
+            return
+
+        if fsm_storage == 'redis' or settings.cache.get('SHARED_CACHE_ENABLED', False):
+            redis = await get_redis_pool(
+                db=settings.redis_database,
+                host=settings.redis_host,
+                port=settings.redis_port,
+                username=settings.redis_username,
+                password=settings.redis_password
+            )
+
+        if fsm_storage == 'nats':
+            storage = await create_fsm_storage(nc, js)
+        elif fsm_storage == 'redis':
+            storage = RedisStorage(redis=redis, ttl=settings.deploy.get('FSM_DATA_TTL', 0) or None)
+        else:
+            storage = MemoryStorage()
         dp = Dispatcher(storage=storage)
         
         # Получаем путь к корню проекта
@@ -67,42 +133,115 @@ async def main():
         # Формируем путь к файлу credentials
         credentials_path = os.path.join(project_root, 'config', 'cred.json')
         
-        # Инициализация Google Sheets
-        credentials = Credentials.from_service_account_file(
-            credentials_path,
-            scopes=['https://www.googleapis.com/auth/spreadsheets']
-        )
+        # Снимки листа, прочитанные одной репликой, достаются остальным из Redis
+        shared_cache = None
+        if settings.cache.get('SHARED_CACHE_ENABLED', False):
+            shared_cache = await SharedCache(
+                redis=redis,
+                channel=settings.cache.get('INVALIDATION_CHANNEL', 'cache:invalidate')
+            ).start()
+
+        # Инициализация Google Sheets: клиент создаётся в фоне,
+        # бот начинает принимать апдейты, не дожидаясь его
         sheets_service = GoogleSheetsService(
             spreadsheet_id=settings.google.SPREADSHEET_ID,
-            credentials=credentials
+            credentials_file=credentials_path,
+            max_workers=settings.google.get('MAX_WORKERS', 8),
+            cache_ttl=settings.google.get('CACHE_TTL', 5.0),
+            cache_stale_ttl=settings.google.get('CACHE_STALE_TTL', 30.0),
+            reads_per_minute=settings.google.get('READS_PER_MINUTE', 60),
+            writes_per_minute=settings.google.get('WRITES_PER_MINUTE', 60),
+            max_retries=settings.google.get('MAX_RETRIES', 5),
+            locator_ttl=settings.google.get('LOCATOR_TTL', 300.0),
+            snapshot_path=os.path.join(project_root, settings.google.get('SNAPSHOT_PATH', 'data/sheets_snapshot.msgpack')),
+            failure_threshold=settings.google.get('FAILURE_THRESHOLD', 3),
+            circuit_reset_timeout=settings.google.get('CIRCUIT_RESET_TIMEOUT', 30.0),
+            shared_cache=shared_cache
         )
+        sheets_service.start()
         
+        # Источник доступности столов: таблица или БД (тогда таблица - только проекция)
+        if settings.availability.get('SOURCE', 'sheets') == 'db':
+            availability_service = DbAvailabilityService(
+                async_session_maker=async_session,
+                first_slot=settings.availability.FIRST_SLOT,
+                slots_count=settings.availability.SLOTS_COUNT,
+                days_ahead=settings.availability.DAYS_AHEAD
+            )
+        else:
+            availability_service = sheets_service
+
+        # Запись в Google Sheets в фоне через NATS JetStream. Публикуют события все
+        # процессы, а применяет их один: к durable push-консьюмеру можно подписаться
+        # только один раз, и порядок записей в строку листа держит один процесс
+        if settings.nats.get('SHEETS_SYNC_ENABLED', False):
+            if mode != 'worker' or settings.deploy.get('WORKER_ID', 0) == 0:
+                sheets_sync_consumer = await start_sheets_sync_consumer(
+                    nc=nc,
+                    js=js,
+                    sheets_service=sheets_service,
+                    subject=settings.nats.sheets_sync_subject,
+                    stream=settings.nats.sheets_sync_stream,
+                    durable_name=settings.nats.sheets_sync_durable_name,
+                    async_session_maker=async_session
+                )
+            dp.workflow_data.update(js=js, sheets_sync_subject=settings.nats.sheets_sync_subject)
+
+        # Удержание выбранного времени в NATS KV на время оформления брони
+        if settings.nats.get('SLOT_HOLDS_ENABLED', False):
+            slot_holds = await SlotHoldService(
+                js=js,
+                bucket=settings.nats.get('SLOT_HOLDS_BUCKET', 'slot_holds'),
+                hold_ttl=settings.nats.get('SLOT_HOLD_TTL', 300)
+            ).create()
+            dp.workflow_data.update(slot_holds=slot_holds)
+
+        # Middleware регистрируются один раз: данные с dp.update доходят до всех роутеров
         logger.info("Including middlewares")
         dp.update.middleware(DatabaseMiddleware(async_session))
-        dp.update.middleware(GoogleSheetsMiddleware(sheets_service))
+        dp.update.middleware(GoogleSheetsMiddleware(sheets_service, availability_service))
 
         logger.info("Including routers")
         dp.include_router(booking_router)
         dp.include_router(admin_router)
 
-
-        # Подключаем middleware к обоим типам обработчиков
-        booking_router.message.middleware(DatabaseMiddleware(async_session))
-        booking_router.callback_query.middleware(DatabaseMiddleware(async_session))
-        booking_router.message.middleware(GoogleSheetsMiddleware(sheets_service))
-        booking_router.callback_query.middleware(GoogleSheetsMiddleware(sheets_service))
-        admin_router.message.middleware(DatabaseMiddleware(async_session))
-        admin_router.callback_query.middleware(DatabaseMiddleware(async_session))
-        admin_router.message.middleware(GoogleSheetsMiddleware(sheets_service))
-        admin_router.callback_query.middleware(GoogleSheetsMiddleware(sheets_service))
-        
-        logger.info("Starting bot")
-        await dp.start_polling(bot)
+        if mode == 'worker':
+            # Апдейты своей партиции приходят из JetStream, Telegram не опрашивается
+            update_worker = await start_update_worker(
+                nc=nc,
+                js=js,
+                dp=dp,
+                bot=bot,
+                subject=settings.deploy.get('UPDATES_SUBJECT', 'bot.updates'),
+                stream=settings.deploy.get('UPDATES_STREAM', 'BotUpdatesStream'),
+                worker_id=settings.deploy.get('WORKER_ID', 0),
+                ack_wait=settings.deploy.get('UPDATE_ACK_WAIT', 120),
+                max_deliver=settings.deploy.get('UPDATE_MAX_DELIVER', 5)
+            )
+            logger.info("Starting update worker")
+            await asyncio.Event().wait()
+        else:
+            logger.info("Starting bot")
+            await dp.start_polling(bot)
         
     except Exception as e:
         logger.exception("Error during startup: %s", e)
         raise
     finally:
+        if 'update_worker' in locals():
+            await update_worker.unsubscribe()
+        if 'sheets_sync_consumer' in locals():
+            await sheets_sync_consumer.unsubscribe()
+        if 'slot_holds' in locals():
+            await slot_holds.close()
+        if 'nc' in locals():
+            await nc.close()
+        if 'sheets_service' in locals():
+            sheets_service.close()
+        if locals().get('shared_cache') is not None:
+            await shared_cache.close()
+        if 'redis' in locals():
+            await redis.aclose()
         if 'bot' in locals():
             await bot.session.close()
 
@@ -1,10 +1,71 @@
 from datetime import datetime, timedelta
+from logging import getLogger
+
+from nats.js.client import JetStreamContext
+
+from app.infrastructure.database.repositories.booking_repository import BookingRepository
+from app.services.sheets_sync.models.sync_events import SheetsSyncEvent
+from app.services.sheets_sync.publisher import publish_sheets_sync
+from app.services.sheets_sync.models.actions import SheetsSyncAction
+
+logger = getLogger(__name__)
 
 async def get_available_dates(sheets_service):
     return await sheets_service.get_available_dates()
 
-async def get_available_times(sheets_service, date, table_pref):
-    return await sheets_service.get_available_times(date, table_pref)
+async def get_available_times(sheets_service, date, table_pref, held=()):
+    return await sheets_service.get_available_times(date, table_pref, held)
 
 async def get_available_end_times(sheets_service, date, start_time):
     return await sheets_service.get_available_end_times(date, start_time)
+
+async def sync_booking_to_sheets(
+    sheets_service,
+    event: SheetsSyncEvent,
+    js: JetStreamContext | None = None,
+    subject: str | None = None,
+    booking_repository: BookingRepository | None = None
+) -> bool:
+    # Если подключен JetStream, запись в таблицу выполнит SheetsSyncConsumer,
+    # и пользователю не нужно ждать ответа Google Sheets
+    if js is not None and subject:
+        try:
+            await publish_sheets_sync(js=js, event=event, subject=subject)
+            # До записи воркером показываем изменение из снимка в памяти
+            sheets_service.mark_booking_cells(
+                event.date_str,
+                event.start_time,
+                event.end_time,
+                event.table_id,
+                busy=event.action == SheetsSyncAction.BOOK
+            )
+            return True
+        except Exception as e:
+            logger.error(f"Error publishing sheets sync event, writing directly: {e}")
+
+    if event.action == SheetsSyncAction.BOOK:
+        try:
+            cells = await sheets_service.write_booking(
+                date_str=event.date_str,
+                start_time=event.start_time,
+                end_time=event.end_time,
+                table_id=event.table_id,
+                client_name=event.client_name,
+                client_phone=event.client_phone
+            )
+        except Exception as e:
+            logger.error(f"Error updating booking in sheets: {e}")
+            return False
+        if cells is not None and event.booking_id and booking_repository is not None:
+            # Запоминаем ячейки, чтобы отмена обошлась без чтения листа
+            await booking_repository.set_sheet_cells(
+                event.booking_id, cells.row, cells.start_col, cells.end_col, cells.layout
+            )
+        return cells is not None
+    return await sheets_service.clear_booking_in_sheets(
+        date_str=event.date_str,
+        start_time=event.start_time,
+        end_time=event.end_time,
+        table_id=event.table_id,
+        cells=event.cells
+    )
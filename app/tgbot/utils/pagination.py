@@ -0,0 +1,17 @@
+from datetime import datetime
+
+from app.infrastructure.database.repositories.booking_repository import BookingCursor, BookingListItem
+
+CURSOR_FORMAT = '%y%m%d%H%M'
+
+
+def encode_cursor(booking: BookingListItem) -> str:
+    """Ключ брони для callback_data: 'ггммддЧЧММ.id' - укладывается в лимит 64 байта"""
+    moment = datetime.combine(booking.booking_date, booking.start_time)
+    return f"{moment.strftime(CURSOR_FORMAT)}.{booking.id}"
+
+
+def decode_cursor(value: str) -> BookingCursor:
+    moment, booking_id = value.split('.')
+    parsed = datetime.strptime(moment, CURSOR_FORMAT)
+    return parsed.date(), parsed.time(), int(booking_id)
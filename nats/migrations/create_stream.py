@@ -30,6 +30,30 @@ async def main():
 
     print(f"Stream `{stream_name}` created")
 
+    # Стрим для фоновой синхронизации броней с Google Sheets
+    sheets_sync_stream = settings.nats.sheets_sync_stream
+    await js.add_stream(StreamConfig(
+        name=sheets_sync_stream,
+        subjects=[settings.nats.sheets_sync_subject],
+        retention="workqueue",  # Сообщение удаляется после подтверждения
+        storage="file",
+        duplicate_window=120  # Окно дедупликации по Nats-Msg-Id, секунды
+    ))
+
+    print(f"Stream `{sheets_sync_stream}` created")
+
+    # Стрим апдейтов Telegram, разложенных по партициям для воркеров
+    updates_stream = settings.deploy.get('UPDATES_STREAM', 'BotUpdatesStream')
+    await js.add_stream(StreamConfig(
+        name=updates_stream,
+        subjects=[f"{settings.deploy.get('UPDATES_SUBJECT', 'bot.updates')}.*"],
+        retention="workqueue",  # У каждой партиции ровно один воркер
+        storage="file",
+        duplicate_window=120  # Повторная публикация апдейта после рестарта ingress отбрасывается
+    ))
+
+    print(f"Stream `{updates_stream}` created")
+
     # Закрытие соединения
     await nc.close()
 
@@ -0,0 +1,90 @@
+"""Сравнение get_bookings и get_booking_items на длинном списке броней.
+
+В одной транзакции засевает bookings N активными бронями одного клиента
+и несколько раз читает их обоими методами: ORM-объекты с selectinload
+стола против проекции нужных колонок в BookingListItem. Для каждого
+метода печатает медиану времени и пик памяти Python (tracemalloc) на
+чтение. В конце транзакция откатывается, данные в БД не меняются. Нужна
+БД с применёнными миграциями:
+
+    python scripts/bench_booking_lists.py [количество_броней] [повторы]
+"""
+import asyncio
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import date
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.infrastructure.database.repositories.booking_repository import BookingRepository
+from app.schemas.booking import BookingFilter, BookingStatus
+from config.config import settings
+
+PHONE = '+70000000000'
+TABLES_COUNT = 4
+SLOTS_PER_DAY = 10
+
+# Брони не пересекаются: каждая занимает свой час своего стола
+SEED = text(f"""
+    INSERT INTO bookings (table_id, client_name, client_phone, booking_date, start_time, end_time, status)
+    SELECT
+        n % {TABLES_COUNT} + 1,
+        'Клиент бенчмарка',
+        :phone,
+        DATE '2000-01-01' + n / ({TABLES_COUNT} * {SLOTS_PER_DAY}),
+        TIME '14:00' + make_interval(hours => (n / {TABLES_COUNT}) % {SLOTS_PER_DAY}),
+        TIME '14:00' + make_interval(hours => (n / {TABLES_COUNT}) % {SLOTS_PER_DAY} + 1),
+        'active'
+    FROM generate_series(0, CAST(:rows AS int) - 1) AS n
+""")
+
+FILTERS = BookingFilter(client_phone=PHONE, date_from=date(2000, 1, 1), status=BookingStatus.ACTIVE)
+
+
+async def measure(conn, method: str, runs: int) -> tuple[float, float, int]:
+    timings, peaks = [], []
+    for _ in range(runs):
+        # Новая сессия на каждый прогон - как в DatabaseMiddleware на каждый апдейт
+        async with AsyncSession(bind=conn) as session:
+            repository = BookingRepository(session)
+            tracemalloc.start()
+            started = time.perf_counter()
+            bookings = await getattr(repository, method)(FILTERS)
+            timings.append(time.perf_counter() - started)
+            peaks.append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+    return statistics.median(timings), statistics.median(peaks), len(bookings)
+
+
+async def main(rows: int, runs: int) -> None:
+    database_url = (
+        f"postgresql+psycopg://{settings.postgres_user}:{settings.postgres_password}"
+        f"@{settings.postgres.host}:{settings.postgres.port}/{settings.postgres_db}"
+    )
+    engine = create_async_engine(database_url)
+    async with engine.connect() as conn:
+        transaction = await conn.begin()
+        try:
+            await conn.execute(SEED, {'phone': PHONE, 'rows': rows})
+            await conn.execute(text("ANALYZE bookings"))
+            for method in ('get_bookings', 'get_booking_items'):
+                elapsed, peak, count = await measure(conn, method, runs)
+                print(
+                    f"{method:<18} {count:>7} броней: "
+                    f"{elapsed * 1000:8.1f} мс, пик памяти {peak / 1024 / 1024:7.2f} МБ"
+                )
+        finally:
+            await transaction.rollback()
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    asyncio.run(main(count, repeats))
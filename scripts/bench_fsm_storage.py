@@ -0,0 +1,189 @@
+"""Запросы к хранилищу FSM за один сценарий бронирования.
+
+Повторяет обращения к FSM, которые делают хендлеры при бронировании
+(плюс get_state от FSMContextMiddleware на каждый апдейт), на одних и тех
+же данных для MemoryStorage, RedisStorage и раскладок NatsStorage. Для
+каждого хранилища печатает число сетевых запросов и время на сценарий и
+время одного get_data. Между апдейтами запомненные записи сбрасываются -
+как если бы пользователь думал дольше record_ttl. Исключение - NatsStorage
+с локальным кэшем: его держит watch, и между апдейтами он не сбрасывается.
+Бакеты и ключи создаются с префиксом bench_ и удаляются в конце. Нужны
+NATS и Redis из настроек:
+
+    python scripts/bench_fsm_storage.py [количество_сценариев]
+"""
+import asyncio
+import os
+import sys
+import time
+from typing import Callable
+
+import nats
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.infrastructure.cache.utils.connect_to_redis import get_redis_pool
+from app.infrastructure.storage.storage.nats_storage import MERGED_LAYOUT, SPLIT_LAYOUT, NatsStorage
+from app.infrastructure.storage.storage.redis_storage import RedisStorage
+from config.config import settings
+
+# Апдейты сценария бронирования: вызовы FSMContext внутри одного хендлера
+BOOKING_FLOW = [
+    # /start
+    [('set_state', 'BookingStates:waiting_for_action')],
+    # «Забронировать столик»
+    [('get_data',), ('set_state', 'BookingStates:waiting_for_date')],
+    # Выбор даты
+    [('update_data', {'selected_date': '20.10.26'}), ('get_data',),
+     ('set_state', 'BookingStates:waiting_for_table_preference')],
+    # Выбор стола
+    [('update_data', {'table_preference': 'random'}), ('get_data',),
+     ('set_state', 'BookingStates:waiting_for_start_time')],
+    # Время начала
+    [('get_data',), ('update_data', {'start_time': '18:00', 'table_id': 2, 'end_times': ['19:00', '20:00']}),
+     ('set_state', 'BookingStates:waiting_for_end_time')],
+    # Время окончания
+    [('update_data', {'end_time': '20:00'}), ('get_data',),
+     ('set_state', 'BookingStates:waiting_for_phone')],
+    # Подтверждение
+    [('get_data',), ('set_state', 'BookingStates:waiting_for_action')],
+]
+
+FIRST_USER_ID = 8_000_000_000
+
+
+class Counting:
+    """Обёртка над KeyValue или клиентом Redis, считающая запросы к серверу"""
+
+    def __init__(self, client) -> None:
+        self.client = client
+        self.ops = 0
+
+    def __getattr__(self, name):
+        method = getattr(self.client, name)
+        if name == 'pipeline':
+            # Команды пайплайна уходят на сервер одним запросом в execute
+            return lambda *args, **kwargs: CountingPipeline(self, method(*args, **kwargs))
+
+        async def counted(*args, **kwargs):
+            self.ops += 1
+            return await method(*args, **kwargs)
+        return counted
+
+
+class CountingPipeline:
+    def __init__(self, counter: Counting, pipe) -> None:
+        self.counter = counter
+        self.pipe = pipe
+
+    def __getattr__(self, name):
+        return getattr(self.pipe, name)
+
+    async def execute(self):
+        self.counter.ops += 1
+        return await self.pipe.execute()
+
+
+async def measure(storage: BaseStorage, flows: int, reset: Callable[[], None]) -> tuple[float, float]:
+    started = time.perf_counter()
+    for user_id in range(FIRST_USER_ID, FIRST_USER_ID + flows):
+        key = StorageKey(bot_id=1, chat_id=user_id, user_id=user_id)
+        for update in BOOKING_FLOW:
+            reset()
+            await storage.get_state(key)  # FSMContextMiddleware
+            for op, *args in update:
+                await getattr(storage, op)(key, *args)
+    elapsed = time.perf_counter() - started
+
+    key = StorageKey(bot_id=1, chat_id=FIRST_USER_ID, user_id=FIRST_USER_ID)
+    read_started = time.perf_counter()
+    for _ in range(1000):
+        await storage.get_data(key)
+    return elapsed / flows, (time.perf_counter() - read_started) / 1000
+
+
+def report(name: str, ops: float | None, elapsed: float, read: float) -> None:
+    ops_text = f"{ops:6.1f}" if ops is not None else "     -"
+    print(
+        f"{name:<16} {ops_text} запросов на сценарий, {elapsed * 1000:7.1f} мс на сценарий, "
+        f"get_data {read * 1_000_000:8.1f} мкс"
+    )
+
+
+async def run_nats(nc, js, layout: str, flows: int, local_cache: bool = False) -> None:
+    storage = await NatsStorage(
+        nc=nc,
+        js=js,
+        fsm_states_bucket='bench_fsm_states',
+        fsm_data_bucket='bench_fsm_data',
+        fsm_bucket='bench_fsm',
+        layout=layout,
+        local_cache=local_cache
+    ).create_storage()
+    # Кэшу верят только после того, как watch подписался на бакет
+    while local_cache and not storage._watching:
+        await asyncio.sleep(0.01)
+    counters = []
+    for name in ('kv_states', 'kv_data', 'kv_fsm'):
+        if hasattr(storage, name):
+            counter = Counting(getattr(storage, name))
+            setattr(storage, name, counter)
+            counters.append(counter)
+
+    reset = (lambda: None) if local_cache else storage._cache.clear
+    elapsed, read = await measure(storage, flows, reset)
+    for task in storage._watch_tasks:
+        task.cancel()
+    report(
+        f"nats {layout}{' + кэш' if local_cache else ''}",
+        sum(counter.ops for counter in counters) / flows,
+        elapsed,
+        read
+    )
+
+
+async def run_redis(redis, flows: int) -> None:
+    storage = RedisStorage(redis=redis, key_builder=DefaultKeyBuilder(prefix='bench_fsm'))
+    counter = Counting(redis)
+    storage.redis = counter
+    elapsed, read = await measure(storage, flows, storage._records.clear)
+    report("redis", counter.ops / flows, elapsed, read)
+
+
+async def main(flows: int) -> None:
+    elapsed, read = await measure(MemoryStorage(), flows, lambda: None)
+    report("memory", None, elapsed, read)
+
+    redis = await get_redis_pool(
+        db=settings.redis_database,
+        host=settings.redis_host,
+        port=settings.redis_port,
+        username=settings.redis_username,
+        password=settings.redis_password
+    )
+    try:
+        await run_redis(redis, flows)
+    finally:
+        keys = [key async for key in redis.scan_iter(match='bench_fsm:*')]
+        if keys:
+            await redis.delete(*keys)
+        await redis.aclose()
+
+    nc = await nats.connect(servers=settings.nats.servers)
+    js = nc.jetstream()
+    try:
+        for layout, local_cache in ((SPLIT_LAYOUT, False), (MERGED_LAYOUT, False), (MERGED_LAYOUT, True)):
+            await run_nats(nc, js, layout, flows, local_cache)
+    finally:
+        for bucket in ('bench_fsm_states', 'bench_fsm_data', 'bench_fsm'):
+            try:
+                await js.delete_key_value(bucket)
+            except Exception:
+                pass
+        await nc.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 100))
@@ -0,0 +1,79 @@
+"""Сравнение стоимости разбора листа: старый построчный скан в каждом методе
+против SheetGrid, который строится один раз на снимок.
+
+    python scripts/bench_sheet_grid.py [количество_дней]
+"""
+import os
+import sys
+import timeit
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.infrastructure.google.sheet_grid import SLOTS_COUNT, TABLES_COUNT, SheetGrid
+
+
+def make_season_sheet(days: int) -> list[list[str]]:
+    header = ['', 'Стол']
+    for hour in range(SLOTS_COUNT):
+        start = (14 + hour) % 24
+        header.append(f"{start:02d}:00-{(start + 1) % 24:02d}:00")
+    values = [header, [], []]
+
+    first_day = date(2025, 1, 1)
+    for day_idx in range(days):
+        day = first_day + timedelta(days=day_idx)
+        for table_idx in range(TABLES_COUNT):
+            row = [day.strftime('%d.%m') if table_idx == 0 else '', f'стол {table_idx + 1}']
+            # Занята примерно треть ячеек
+            row += ['Имя\n+79990000000' if (day_idx + table_idx + slot) % 3 == 0 else ''
+                    for slot in range(SLOTS_COUNT)]
+            values.append(row)
+    return values
+
+
+def legacy_lookup(data: list[list[str]], date_str: str, start_time: str) -> tuple[int | None, int | None]:
+    """Повторяет скан, который раньше выполнялся в каждом методе сервиса"""
+    target_date = datetime.strptime(date_str, '%d.%m.%y')
+    target_row_idx = None
+    for idx in range(3, len(data), 4):
+        try:
+            date_cell = data[idx][0]
+            if date_cell:
+                row_date = datetime.strptime(date_cell, '%d.%m')
+                if row_date.day == target_date.day and row_date.month == target_date.month:
+                    target_row_idx = idx
+                    break
+        except (ValueError, IndexError):
+            continue
+
+    time_slots = [slot.split('-')[0].strip() for slot in data[0][2:14]]
+    target_col_idx = None
+    for idx, time_slot in enumerate(time_slots, start=2):
+        if time_slot == start_time:
+            target_col_idx = idx
+            break
+    return target_row_idx, target_col_idx
+
+
+def main() -> None:
+    days = int(sys.argv[1]) if len(sys.argv) > 1 else 180
+    values = make_season_sheet(days)
+    last_day = (date(2025, 1, 1) + timedelta(days=days - 1)).strftime('%d.%m.%y')
+    grid = SheetGrid.from_values(values, year=2025)
+    number = 200
+
+    legacy = timeit.timeit(lambda: legacy_lookup(values, last_day, '20:00'), number=number)
+    build = timeit.timeit(lambda: SheetGrid.from_values(values, year=2025), number=number)
+    lookup = timeit.timeit(
+        lambda: (grid.find_date(last_day), grid.start_slots.get('20:00')), number=number
+    )
+
+    print(f"Лист: {days} дней, {len(values)} строк")
+    print(f"Старый скан на один вызов:       {legacy / number * 1e6:10.1f} мкс")
+    print(f"Построение SheetGrid (на снимок): {build / number * 1e6:10.1f} мкс")
+    print(f"Поиск в SheetGrid на один вызов:  {lookup / number * 1e6:10.1f} мкс")
+
+
+if __name__ == "__main__":
+    main()
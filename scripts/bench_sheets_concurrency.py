@@ -0,0 +1,91 @@
+"""Задержка хендлеров при одновременных запросах к Sheets API.
+
+N пользователей одновременно присылают апдейт, хендлер которого читает
+лист; так повторяется несколько раз. Запрос к API заменён заглушкой
+HttpRequest.execute, которая спит заданное время, - сеть и квоты не нужны. Сравниваются два варианта:
+
+    до     - execute() вызывается прямо в event loop, как было раньше;
+    после  - запрос идёт через GoogleSheetsService._execute в пул потоков.
+
+Печатает p50 и p99 задержки хендлера для каждого варианта:
+
+    python scripts/bench_sheets_concurrency.py [пользователей] [задержка_мс] [размер_пула]
+"""
+import asyncio
+import os
+import statistics
+import sys
+import time
+from typing import Awaitable, Callable
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.infrastructure.google.sheets_service import GoogleSheetsService
+
+HANDLER_CALLS = 5
+
+
+class SleepingRequest:
+    """Заглушка HttpRequest: execute() блокирует поток на время ответа API"""
+
+    def __init__(self, latency: float) -> None:
+        self.latency = latency
+
+    def execute(self, http=None, num_retries: int = 0) -> dict:
+        time.sleep(self.latency)
+        return {'values': []}
+
+
+async def run_users(users: int, call: Callable[[], Awaitable[dict]]) -> list[float]:
+    """Задержка считается от прихода апдейта, а не от старта хендлера:
+    пока execute() блокирует loop, остальные апдейты ждут своей очереди"""
+    latencies = []
+
+    async def handler(arrived: float) -> None:
+        await call()
+        latencies.append(time.perf_counter() - arrived)
+
+    for _ in range(HANDLER_CALLS):
+        # Все пользователи присылают апдейт одновременно
+        arrived = time.perf_counter()
+        await asyncio.gather(*(handler(arrived) for _ in range(users)))
+    return latencies
+
+
+def report(name: str, latencies: list[float]) -> None:
+    percentiles = statistics.quantiles(latencies, n=100)
+    print(
+        f"{name:<24} p50 {percentiles[49] * 1000:8.1f} мс, p99 {percentiles[98] * 1000:8.1f} мс, "
+        f"всего вызовов {len(latencies)}"
+    )
+
+
+async def main(users: int, latency: float, max_workers: int) -> None:
+    request = SleepingRequest(latency)
+
+    async def blocking_call() -> dict:
+        return request.execute()
+
+    report("до (execute в loop)", await run_users(users, blocking_call))
+
+    # Квоты заведомо больше нагрузки, чтобы мерить только пул потоков
+    service = GoogleSheetsService(
+        spreadsheet_id='bench',
+        max_workers=max_workers,
+        reads_per_minute=1_000_000
+    )
+    try:
+        report(
+            f"после (пул {max_workers})",
+            await run_users(users, lambda: service._execute(request))
+        )
+    finally:
+        service.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(
+        users=int(sys.argv[1]) if len(sys.argv) > 1 else 50,
+        latency=(float(sys.argv[2]) if len(sys.argv) > 2 else 200.0) / 1000,
+        max_workers=int(sys.argv[3]) if len(sys.argv) > 3 else 8
+    ))
@@ -0,0 +1,75 @@
+"""Время от запуска процесса до готовности бота принимать апдейты.
+
+Каждый замер - отдельный процесс: импорт app.tgbot.tgbot и создание
+GoogleSheetsService с фоновой инициализацией. Стек googleapiclient
+к этому моменту не должен быть загружен. Скрипт завершается с кодом 1,
+если медиана превышает бюджет, - его можно запускать в CI перед деплоем.
+
+    python scripts/bench_startup.py [бюджет_мс] [количество_запусков]
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+PROBE = """
+import asyncio, json, sys, time
+started = time.perf_counter()
+import app.tgbot.tgbot
+imported = time.perf_counter()
+from app.infrastructure.google.sheets_service import GoogleSheetsService
+
+async def main():
+    service = GoogleSheetsService(spreadsheet_id='bench', credentials_file='bench.json')
+    service.start()
+    # Задача инициализации ещё не запускалась - так выглядит старт поллинга
+    result = {
+        'import': imported - started,
+        'ready': time.perf_counter() - started,
+        'google_loaded': 'googleapiclient' in sys.modules,
+    }
+    service.close()
+    return result
+
+print(json.dumps(asyncio.run(main())))
+"""
+
+
+def run_probe() -> dict:
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE],
+        cwd=PROJECT_ROOT,
+        capture_output=True,
+        text=True,
+        check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main(budget_ms: float, runs: int) -> int:
+    results = [run_probe() for _ in range(runs)]
+    import_ms = statistics.median(result['import'] for result in results) * 1000
+    ready_ms = statistics.median(result['ready'] for result in results) * 1000
+    google_loaded = any(result['google_loaded'] for result in results)
+
+    print(f"Импорт app.tgbot.tgbot (медиана):  {import_ms:8.1f} мс")
+    print(f"До готовности к поллингу:          {ready_ms:8.1f} мс (бюджет {budget_ms:.0f} мс)")
+    print(f"googleapiclient загружен на старте: {'да' if google_loaded else 'нет'}")
+
+    if google_loaded:
+        print("FAIL: стек Google импортируется до старта поллинга")
+        return 1
+    if ready_ms > budget_ms:
+        print("FAIL: старт дольше бюджета")
+        return 1
+    print("OK")
+    return 0
+
+
+if __name__ == "__main__":
+    budget = float(sys.argv[1]) if len(sys.argv) > 1 else 1500.0
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    sys.exit(main(budget, count))
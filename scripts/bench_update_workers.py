@@ -0,0 +1,80 @@
+"""Нагрузочный тест режима ingress/worker.
+
+Вместо ingress публикует в стрим апдейтов N синтетических команд /start
+от разных чатов и ждёт, пока запущенные воркеры разберут стрим. Печатает
+пропускную способность в апдейтах в секунду. Запуск для сравнения 1 и 4
+процессов:
+
+    DEPLOY__MODE=worker DEPLOY__WORKERS=4 DEPLOY__WORKER_ID=0 python __main__.py  # и так для 1..3
+    DEPLOY__WORKERS=4 python scripts/bench_update_workers.py [количество_апдейтов]
+
+Хендлеры отвечают в Telegram, поэтому запускайте воркеры с тестовым
+ботом: ответ в несуществующий чат завершится ошибкой, но сетевой запрос
+и работа с FSM в NATS будут такими же, как в проде.
+"""
+import asyncio
+import json
+import os
+import sys
+import time
+
+import nats
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from config.config import settings
+
+# Синтетические чаты, id не пересекаются с реальными пользователями
+FIRST_CHAT_ID = 9_000_000_000
+
+
+def make_update(update_id: int, chat_id: int) -> bytes:
+    user = {'id': chat_id, 'is_bot': False, 'first_name': 'Bench'}
+    return json.dumps({
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id,
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'private'},
+            'from': user,
+            'text': '/start',
+            'entities': [{'type': 'bot_command', 'offset': 0, 'length': 6}],
+        },
+    }).encode()
+
+
+async def main(count: int) -> None:
+    subject = settings.deploy.get('UPDATES_SUBJECT', 'bot.updates')
+    stream = settings.deploy.get('UPDATES_STREAM', 'BotUpdatesStream')
+    partitions = settings.deploy.get('WORKERS', 1)
+
+    nc = await nats.connect(servers=settings.nats.servers)
+    js = nc.jetstream()
+
+    # update_id уникальны между запусками, иначе стрим отбросит их как дубликаты
+    first_update_id = int(time.time() * 1000)
+    started = time.perf_counter()
+    for n in range(count):
+        chat_id = FIRST_CHAT_ID + n % 1000
+        await js.publish(
+            subject=f"{subject}.{chat_id % partitions}",
+            payload=make_update(first_update_id + n, chat_id),
+            headers={'Nats-Msg-Id': str(first_update_id + n)}
+        )
+    published = time.perf_counter()
+
+    # Стрим workqueue: подтверждённые сообщения удаляются, пустой стрим - всё обработано
+    while (await js.stream_info(stream)).state.messages:
+        await asyncio.sleep(0.05)
+    drained = time.perf_counter()
+    await nc.close()
+
+    print(f"Партиций (воркеров):  {partitions}")
+    print(f"Апдейтов:             {count}")
+    print(f"Публикация:           {published - started:8.2f} с")
+    print(f"Обработка всех:       {drained - started:8.2f} с")
+    print(f"Пропускная способность: {count / (drained - started):8.1f} апдейтов/с")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000))
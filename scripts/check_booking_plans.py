@@ -0,0 +1,144 @@
+"""Проверка планов запросов BookingRepository на большой таблице.
+
+В одной транзакции засевает bookings миллионом строк, делает ANALYZE
+и для каждого запроса репозитория проверяет через EXPLAIN, что таблица
+bookings читается по индексу, а не полным сканированием. Запросы берутся
+из самого репозитория и компилируются диалектом PostgreSQL - те же, что
+выполняют хендлеры, с теми же фильтрами. В конце транзакция откатывается,
+данные в БД не меняются. Нужна БД с применёнными миграциями:
+
+    python scripts/check_booking_plans.py [количество_строк]
+"""
+import json
+import os
+import sys
+from datetime import date, time, timedelta
+from enum import Enum
+
+import psycopg
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import psycopg as pg_psycopg
+from sqlalchemy.sql import Executable
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.infrastructure.database.models.booking import Booking
+from app.infrastructure.database.models.client import Client  # noqa: F401 - нужен мапперу для Booking.client
+from app.infrastructure.database.repositories.booking_repository import BookingRepository
+from app.schemas.booking import BookingFilter, BookingStatus
+from config.config import settings
+
+SLOTS_PER_DAY = 12
+TABLES_COUNT = 4
+
+
+def repository_queries(
+    booking_id: int,
+    phone: str,
+    table_id: int,
+    day: date,
+    start_time: time
+) -> dict[str, Executable]:
+    """Запросы BookingRepository с фильтрами, с которыми их вызывает бот"""
+    active_from_day = BookingFilter(date_from=day, status=BookingStatus.ACTIVE)
+    cursor = (day, start_time, booking_id)
+    return {
+        'get_bookings (client_phone, active)': BookingRepository.bookings_query(
+            BookingFilter(client_phone=phone, date_from=day, status=BookingStatus.ACTIVE)
+        ),
+        'get_bookings (table_id, date range)': BookingRepository.bookings_query(
+            BookingFilter(table_id=table_id, date_from=day, date_to=day + timedelta(days=7))
+        ),
+        # «Мои брони» и отмена брони
+        'get_booking_items (client_phone, active)': BookingRepository.booking_items_query(
+            BookingFilter(client_phone=phone, date_from=day, status=BookingStatus.ACTIVE)
+        ),
+        # Список броней у админа: первая страница, вперёд, назад и с фильтрами
+        'get_bookings_page (first)': BookingRepository.bookings_page_query(active_from_day),
+        'get_bookings_page (after)': BookingRepository.bookings_page_query(active_from_day, after=cursor),
+        'get_bookings_page (before)': BookingRepository.bookings_page_query(active_from_day, before=cursor),
+        'get_bookings_page (date filter)': BookingRepository.bookings_page_query(
+            BookingFilter(date_from=day, date_to=day, status=BookingStatus.ACTIVE)
+        ),
+        'get_bookings_page (table filter)': BookingRepository.bookings_page_query(
+            BookingFilter(date_from=day, status=BookingStatus.ACTIVE, table_id=table_id)
+        ),
+        'get_active_booking_dates': BookingRepository.active_booking_dates_query(day),
+        'check_table_availability': BookingRepository.table_availability_query(
+            table_id, day, time(16, 0), time(18, 0)
+        ),
+        'get_active_booking_times': BookingRepository.active_booking_times_query(day, day + timedelta(days=13)),
+        # session.get выполняет SELECT по первичному ключу
+        'get_booking': select(Booking).where(Booking.id == booking_id),
+        'update_past_bookings_status': BookingRepository.past_bookings_update(day),
+    }
+
+
+def compile_query(statement: Executable) -> tuple[str, dict]:
+    """SQL и параметры запроса в виде, в котором его отправил бы драйвер psycopg"""
+    compiled = statement.compile(dialect=pg_psycopg.dialect(), compile_kwargs={'render_postcompile': True})
+    params = {
+        name: value.value if isinstance(value, Enum) else value
+        for name, value in compiled.params.items()
+    }
+    return str(compiled), params
+
+
+# Строки не пересекаются: каждая занимает свой час своего стола.
+# Используются первые 10 слотов дня, чтобы бронь заканчивалась не позже полуночи
+SEED = f"""
+    INSERT INTO bookings (table_id, client_name, client_phone, booking_date, start_time, end_time, status)
+    SELECT
+        n %% {TABLES_COUNT} + 1,
+        'Клиент ' || (n %% 50000),
+        '+7999' || lpad((n %% 50000)::text, 7, '0'),
+        DATE '2000-01-01' + n / ({TABLES_COUNT} * {SLOTS_PER_DAY}),
+        TIME '14:00' + make_interval(hours => (n / {TABLES_COUNT}) %% {SLOTS_PER_DAY}),
+        TIME '14:00' + make_interval(hours => (n / {TABLES_COUNT}) %% {SLOTS_PER_DAY} + 1),
+        CASE WHEN n %% 20 = 0 THEN 'active' ELSE 'completed' END
+    FROM generate_series(0, (%(rows)s * {SLOTS_PER_DAY} / 10 - 1)::int) AS n
+    WHERE (n / {TABLES_COUNT}) %% {SLOTS_PER_DAY} < 10
+"""
+
+
+def scanned_nodes(plan: dict) -> list[tuple[str, str | None]]:
+    """Узлы плана, читающие bookings: (тип узла, индекс)"""
+    nodes = []
+    if plan.get('Relation Name') == 'bookings':
+        nodes.append((plan['Node Type'], plan.get('Index Name')))
+    for child in plan.get('Plans', []):
+        nodes.extend(scanned_nodes(child))
+    return nodes
+
+
+def main(rows: int) -> int:
+    conninfo = (
+        f"postgresql://{settings.postgres_user}:{settings.postgres_password}"
+        f"@{settings.postgres.host}:{settings.postgres.port}/{settings.postgres_db}"
+    )
+    failed = False
+    with psycopg.connect(conninfo) as conn:
+        try:
+            conn.execute(SEED, {'rows': rows})
+            conn.execute("ANALYZE bookings")
+            sample = conn.execute(
+                "SELECT id, client_phone, table_id, booking_date, start_time FROM bookings "
+                "WHERE status = 'active' ORDER BY id DESC LIMIT 1"
+            ).fetchone()
+
+            for name, statement in repository_queries(*sample).items():
+                query, params = compile_query(statement)
+                plan = conn.execute(f"EXPLAIN (FORMAT JSON) {query}", params).fetchone()[0]
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                nodes = scanned_nodes(plan[0]['Plan'])
+                ok = bool(nodes) and all(node_type != 'Seq Scan' for node_type, _ in nodes)
+                failed |= not ok
+                print(f"{'OK  ' if ok else 'FAIL'} {name}: {nodes}")
+        finally:
+            conn.rollback()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000))
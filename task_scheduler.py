@@ -8,7 +8,10 @@ from taskiq import TaskiqScheduler, TaskiqEvents, TaskiqState, Context, TaskiqDe
 from taskiq.schedule_sources import LabelScheduleSource
 from taskiq_nats import NatsBroker
 
-from app.tgbot.tgbot import create_db_session
+from app.infrastructure.storage.utils.nats_connect import connect_to_nats
+from app.tgbot.states.booking import BOOKING_FLOW_STATES
+from app.tgbot.tgbot import create_db_session, create_fsm_storage
+from config.config import settings
 
 broker = NatsBroker("nats://localhost:4222", queue="notifying")
 scheduler = TaskiqScheduler(broker, [LabelScheduleSource(broker)])
@@ -47,4 +50,28 @@ async def update_past_bookings(context: Context = TaskiqDepends()) -> None:
             logger = context.state.logger
             logger.info(f"Updated {updated_count} past bookings to completed status")
     except Exception as e:
-        logger.error(f"Error updating past bookings: {e}")
\ No newline at end of file
+        logger.error(f"Error updating past bookings: {e}")
+
+
+@broker.task(task_name="purge_abandoned_fsm", schedule=[{"cron": "*/15 * * * *"}])
+async def purge_abandoned_fsm(context: Context = TaskiqDepends()) -> None:
+    logger = context.state.logger
+    fsm_storage = settings.deploy.get('FSM_STORAGE', 'memory')
+    if settings.deploy.get('MODE', 'polling') != 'polling' and fsm_storage == 'memory':
+        fsm_storage = 'nats'
+    # В памяти процесса и в Redis брошенные сценарии ограничены рестартом и TTL ключа
+    if fsm_storage != 'nats':
+        return
+    try:
+        nc, js = await connect_to_nats(servers=settings.nats.servers)
+        try:
+            storage = await create_fsm_storage(nc, js, local_cache=False)
+            purged = await storage.purge_abandoned(
+                states={state.state for state in BOOKING_FLOW_STATES},
+                idle=settings.deploy.get('FSM_ABANDONED_AFTER', 3600)
+            )
+            logger.info(f"Reset {purged} abandoned booking flows, FSM buckets: {await storage.stats()}")
+        finally:
+            await nc.close()
+    except Exception as e:
+        logger.error(f"Error purging abandoned FSM states: {e}")